@@ -2,6 +2,8 @@ from django.contrib import admin
 from .models import (
     Profile,
     Cycle,
+    CycleStats,
+    Prediction,
     FlowDay,
     Symptom,
     Craving,
@@ -16,6 +18,8 @@ from .models import (
 
 admin.site.register(Profile)
 admin.site.register(Cycle)
+admin.site.register(CycleStats)
+admin.site.register(Prediction)
 admin.site.register(FlowDay)
 admin.site.register(Symptom)
 admin.site.register(Craving)
@@ -0,0 +1,45 @@
+from datetime import date
+
+from django.db.models import Count, Min, OuterRef, Q, Subquery
+
+from .models import Symptom, Craving
+
+
+def _counts_query(queryset, field, start=None, end=None):
+    """The GROUP BY query behind ``_counts_by``: one row per label with its count and first appearance."""
+    if start:
+        queryset = queryset.filter(date__gte=start)
+    if end:
+        queryset = queryset.filter(date__lte=end)
+
+    # Same-date ties go by the id of each label's earliest row, not its lowest id overall.
+    # Min() keeps the subquery out of the GROUP BY, which the (profile, label, date) index then serves
+    earliest = queryset.filter(**{field: OuterRef(field)}).order_by('date', 'id').values('id')[:1]
+    return queryset.order_by().values(field).annotate(
+        total=Count('id'),
+        first_date=Min('date'),
+        first_id=Min(Subquery(earliest)),
+        undated=Count('id', filter=Q(date__isnull=True)),
+    )
+
+
+def _counts_by(queryset, field, start=None, end=None):
+    """Group a dated queryset by ``field`` in SQL and return {label: count}.
+
+    Labels come back in order of first appearance by date, which is the order a
+    Counter built from ``queryset.order_by('date')`` would produce.
+    """
+    rows = _counts_query(queryset, field, start, end)
+    # NULL dates sort first in an ascending date ordering
+    rows = sorted(rows, key=lambda r: (0 if r['undated'] else 1, r['first_date'] or date.min, r['first_id']))
+    return {r[field]: r['total'] for r in rows}
+
+
+def mood_counts(profile, start=None, end=None):
+    """Return {mood: count} for a profile's symptoms, optionally within a date range."""
+    return _counts_by(Symptom.objects.filter(profile=profile), 'mood', start, end)
+
+
+def craving_counts(profile, start=None, end=None):
+    """Return {craving_type: count} for a profile's cravings, optionally within a date range."""
+    return _counts_by(Craving.objects.filter(profile=profile), 'craving_type', start, end)
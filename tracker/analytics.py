@@ -0,0 +1,168 @@
+"""Vectorised cycle analytics.
+
+Cycle dates are loaded into NumPy ``datetime64[D]`` arrays and every statistic is
+computed without Python-level loops. ``summarize_cycles`` works on many users at
+once (rows grouped by user id), so the single-user refresh and the batch jobs
+share one implementation and always agree. ``cycle_series`` gives one user's
+per-cycle values for the wellness page.
+"""
+import numpy as np
+
+from .models import Cycle
+
+# A cycle whose length is more than this many days from the user's mean is irregular
+IRREGULAR_TOLERANCE_DAYS = 3
+# Trend slope (days per cycle) beyond which lengths count as changing
+TREND_SLOPE_THRESHOLD = 0.5
+# Cycle lengths needed before a trend is reported
+TREND_MIN_LENGTHS = 3
+ROLLING_WINDOW = 3
+
+EMPTY_SUMMARY = {
+    'cycle_count': 0,
+    'avg_cycle_length': None,
+    'cycle_length_std': None,
+    'avg_period_length': None,
+    'irregular_count': 0,
+    'trend_slope': None,
+    'trend': "Stable",
+    'last_start_date': None,
+    'last_end_date': None,
+}
+
+
+def to_day_array(dates):
+    """Convert a sequence of dates into a datetime64[D] array; None becomes NaT."""
+    return np.array(dates, dtype='datetime64[D]')
+
+
+def load_cycle_arrays(user_ids=None, apps=None):
+    """Load (user_ids, starts, ends) arrays ordered by user then start date.
+
+    ``user_ids`` may be a single id, an iterable of ids, or None for every user.
+    Pass a migration's ``apps`` to use its historical Cycle model.
+    """
+    cycles = apps.get_model('tracker', 'Cycle') if apps else Cycle
+    queryset = cycles.objects.order_by('user_id', 'start_date', 'id')
+    if user_ids is not None:
+        if isinstance(user_ids, int):
+            user_ids = [user_ids]
+        queryset = queryset.filter(user_id__in=list(user_ids))
+    rows = list(queryset.values_list('user_id', 'start_date', 'end_date'))
+    if not rows:
+        return np.empty(0, dtype=np.int64), to_day_array([]), to_day_array([])
+    users, starts, ends = zip(*rows)
+    return np.array(users, dtype=np.int64), to_day_array(starts), to_day_array(ends)
+
+
+def trend_label(slope):
+    if slope is None or np.isnan(slope):
+        return "Stable"
+    if slope > TREND_SLOPE_THRESHOLD:
+        return "Getting longer"
+    if slope < -TREND_SLOPE_THRESHOLD:
+        return "Getting shorter"
+    return "Stable"
+
+
+def _group_mean(index, values, size):
+    counts = np.bincount(index, minlength=size)
+    sums = np.bincount(index, weights=values, minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sums / counts, counts
+
+
+def summarize_cycles(user_ids, starts, ends):
+    """Compute per-user cycle statistics for rows grouped by user and sorted by start date.
+
+    Returns {user_id: {...}} with cycle_count, avg_cycle_length, cycle_length_std,
+    avg_period_length, irregular_count, trend_slope, trend, last_start_date and
+    last_end_date. Cycle length is the start-to-start gap between consecutive cycles;
+    period length is end minus start.
+    """
+    if len(user_ids) == 0:
+        return {}
+
+    users, first_index, cycle_counts = np.unique(user_ids, return_index=True, return_counts=True)
+    size = len(users)
+    row_group = np.searchsorted(users, user_ids)
+
+    # Period durations (end - start) where an end date was logged
+    durations = (ends - starts).astype('timedelta64[D]').astype(float)
+    has_end = ~np.isnat(ends)
+    avg_period, _ = _group_mean(row_group[has_end], durations[has_end], size)
+
+    # Start-to-start cycle lengths, keeping only gaps within the same user
+    same_user = user_ids[1:] == user_ids[:-1]
+    lengths = np.diff(starts.astype(np.int64))[same_user].astype(float)
+    length_group = row_group[1:][same_user]
+    avg_length, length_counts = _group_mean(length_group, lengths, size)
+
+    deviation = lengths - avg_length[length_group]
+    variance, _ = _group_mean(length_group, deviation ** 2, size)
+    irregular = np.bincount(
+        length_group, weights=(np.abs(deviation) > IRREGULAR_TOLERANCE_DAYS), minlength=size
+    ).astype(int)
+
+    # Least-squares slope of cycle length against cycle position, per user
+    position = (np.arange(len(user_ids)) - first_index[row_group])[1:][same_user].astype(float)
+    n = length_counts.astype(float)
+    sum_x = np.bincount(length_group, weights=position, minlength=size)
+    sum_y = np.bincount(length_group, weights=lengths, minlength=size)
+    sum_xy = np.bincount(length_group, weights=position * lengths, minlength=size)
+    sum_xx = np.bincount(length_group, weights=position ** 2, minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = (n * sum_xy - sum_x * sum_y) / (n * sum_xx - sum_x ** 2)
+    slope[length_counts < TREND_MIN_LENGTHS] = np.nan
+
+    last_index = first_index + cycle_counts - 1
+    last_starts = starts[last_index]
+    last_ends = ends[last_index]
+
+    def _int_or_none(value):
+        return None if np.isnan(value) else int(round(value))
+
+    def _float_or_none(value):
+        return None if np.isnan(value) else round(float(value), 2)
+
+    summary = {}
+    for i, user_id in enumerate(users.tolist()):
+        summary[user_id] = {
+            'cycle_count': int(cycle_counts[i]),
+            'avg_cycle_length': _int_or_none(avg_length[i]),
+            'cycle_length_std': _float_or_none(np.sqrt(variance[i])),
+            'avg_period_length': _int_or_none(avg_period[i]),
+            'irregular_count': int(irregular[i]),
+            'trend_slope': _float_or_none(slope[i]),
+            'trend': trend_label(slope[i]),
+            'last_start_date': last_starts[i].item(),
+            'last_end_date': None if np.isnat(last_ends[i]) else last_ends[i].item(),
+        }
+    return summary
+
+
+def cycle_series(starts, ends, window=ROLLING_WINDOW):
+    """Return per-cycle arrays for one user's cycles (sorted by start date).
+
+    Includes cycle lengths, period durations, rolling mean/std of cycle length over
+    ``window`` cycles and an irregularity flag per cycle length.
+    """
+    lengths = np.diff(starts.astype(np.int64)).astype(float)
+    durations = np.where(np.isnat(ends), np.nan, (ends - starts).astype('timedelta64[D]').astype(float))
+
+    if len(lengths) >= window:
+        windows = np.lib.stride_tricks.sliding_window_view(lengths, window)
+        rolling_mean = windows.mean(axis=1)
+        rolling_std = windows.std(axis=1)
+    else:
+        rolling_mean = rolling_std = np.empty(0)
+
+    mean = lengths.mean() if len(lengths) else np.nan
+    return {
+        'cycle_lengths': lengths,
+        'period_durations': durations,
+        'rolling_mean': rolling_mean,
+        'rolling_std': rolling_std,
+        'irregular': np.abs(lengths - mean) > IRREGULAR_TOLERANCE_DAYS,
+    }
+
@@ -0,0 +1,121 @@
+"""Per-user prefix autocomplete for the search and diary filter boxes.
+
+Every user has a small vocabulary (``SearchTerm`` rows) built from their diary
+titles and moods, symptom moods, craving types and answered prompts. Each term
+stores how many entries use it. Signals adjust those counts as entries are
+saved or deleted, so suggestions never need to scan the entries themselves.
+"""
+import re
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import Craving, DiaryEntry, PromptAnswer, SearchTerm, Symptom
+
+# model -> (path to the owning user id, fields that contribute terms)
+AUTOCOMPLETE_SOURCES = {
+    DiaryEntry: ('user_id', ('title', 'mood', 'custom_mood')),
+    Symptom: ('profile__user_id', ('mood',)),
+    Craving: ('profile__user_id', ('craving_type',)),
+    PromptAnswer: ('user_id', ('prompt',)),
+}
+
+MAX_TERM_LENGTH = 100
+MIN_WORD_LENGTH = 3
+SUGGESTION_LIMIT = 8
+WORD_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    return ' '.join((text or '').lower().split())[:MAX_TERM_LENGTH]
+
+
+def extract_terms(values):
+    """Return {term: display} for a row's field values: each whole value plus its longer words."""
+    terms = {}
+    for value in values:
+        display = ' '.join(str(value or '').split())[:MAX_TERM_LENGTH]
+        if not display:
+            continue
+        terms.setdefault(normalize(display), display)
+        for word in WORD_RE.findall(display):
+            if len(word) >= MIN_WORD_LENGTH:
+                terms.setdefault(word.lower(), word)
+    return terms
+
+
+def row_terms(model, pk):
+    """Return (user_id, {term: display}) for a stored row, or (None, {}) if it does not exist."""
+    user_field, fields = AUTOCOMPLETE_SOURCES[model]
+    row = model.objects.filter(pk=pk).values_list(user_field, *fields).first()
+    if row is None:
+        return None, {}
+    return row[0], extract_terms(row[1:])
+
+
+def instance_terms(instance):
+    return extract_terms(getattr(instance, field) for field in AUTOCOMPLETE_SOURCES[type(instance)][1])
+
+
+def add_terms(user_id, terms):
+    """Count one more use of each term ({term: display}), creating new terms."""
+    if not terms:
+        return
+    existing = set(SearchTerm.objects.filter(user_id=user_id, term__in=terms).values_list('term', flat=True))
+    if existing:
+        SearchTerm.objects.filter(user_id=user_id, term__in=existing).update(count=F('count') + 1)
+    SearchTerm.objects.bulk_create(
+        [SearchTerm(user_id=user_id, term=term, display=display, count=1)
+         for term, display in terms.items() if term not in existing],
+        ignore_conflicts=True,
+    )
+
+
+def remove_terms(user_id, terms):
+    """Count one less use of each term, dropping terms nothing uses any more."""
+    if not terms:
+        return
+    SearchTerm.objects.filter(user_id=user_id, term__in=terms, count__gt=0).update(count=F('count') - 1)
+    SearchTerm.objects.filter(user_id=user_id, term__in=terms, count=0).delete()
+
+
+def suggest(user, prefix, limit=SUGGESTION_LIMIT):
+    """Return up to ``limit`` display strings for the user's terms starting with ``prefix``, most used first."""
+    typed = prefix
+    prefix = normalize(typed)
+    if not prefix:
+        return []
+    if typed[-1:].isspace():
+        # A finished word: only suggest longer phrases
+        prefix += ' '
+    # A range on the (user, term) unique index; LIKE 'x%' cannot use it on SQLite
+    matches = SearchTerm.objects.filter(user=user, term__gte=prefix, term__lt=prefix + '\uffff')
+    return list(matches.order_by('-count', 'term').values_list('display', flat=True)[:limit])
+
+
+def rebuild_terms(user_ids=None, apps=None):
+    """Recount every user's vocabulary from scratch. Returns the number of terms stored.
+
+    Pass a migration's ``apps`` to use its historical models.
+    """
+    counts, displays = Counter(), {}
+    term_model = apps.get_model('tracker', 'SearchTerm') if apps else SearchTerm
+    for model, (user_field, fields) in AUTOCOMPLETE_SOURCES.items():
+        queryset = (apps.get_model('tracker', model.__name__) if apps else model).objects.all()
+        if user_ids is not None:
+            queryset = queryset.filter(**{f'{user_field}__in': user_ids})
+        for user_id, *values in queryset.values_list(user_field, *fields).iterator(chunk_size=2000):
+            for term, display in extract_terms(values).items():
+                counts[user_id, term] += 1
+                displays.setdefault((user_id, term), display)
+
+    stale = term_model.objects.all() if user_ids is None else term_model.objects.filter(user_id__in=user_ids)
+    with transaction.atomic():
+        stale.delete()
+        term_model.objects.bulk_create(
+            [term_model(user_id=user_id, term=term, display=displays[user_id, term], count=count)
+             for (user_id, term), count in counts.items()],
+            batch_size=1000,
+        )
+    return len(counts)
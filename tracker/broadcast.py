@@ -0,0 +1,171 @@
+"""In-process fan-out of new community comments to live streams.
+
+Each ASGI process keeps one ``Hub``. An open stream subscribes to a channel
+(``comments`` for the general feed, ``prompt:<id>`` for a prompt's comments) and
+waits on its own small queue, so an idle stream costs no database work at all. A
+new comment is rendered and encoded as a server-sent event once, then handed to
+every subscriber on its channel with one wake-up per event loop.
+
+The hub hears about comments through a channel layer. ``LocalChannelLayer`` only
+reaches the current process, which is all a single ASGI worker needs. With several
+workers, set ``TRACKER_CHANNEL_LAYER`` to a layer with the same two methods that
+relays between processes (Redis pub/sub, for example).
+
+A subscriber more than ``MAX_PENDING`` events behind is cut off. The browser
+reconnects with ``Last-Event-ID`` and the stream replays what it missed.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict, deque
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from . import fragments
+
+MAX_PENDING = 100
+# Comments proxies and load balancers see often enough to keep an idle stream open
+HEARTBEAT_SECONDS = 15
+HEARTBEAT = b': keepalive\n\n'
+RECONNECT_MS = 3000
+
+
+class LocalChannelLayer:
+    """Channel layer stand-in: delivers group messages to receivers in this process only."""
+
+    def __init__(self):
+        self._receivers = []
+
+    def add_receiver(self, receiver):
+        self._receivers.append(receiver)
+
+    def group_send(self, group, message):
+        for receiver in self._receivers:
+            receiver(group, message)
+
+
+class Subscription:
+    """One stream's pending events. Apart from ``Hub`` delivery, only used on its own event loop."""
+
+    def __init__(self, hub, channel, loop):
+        self.hub = hub
+        self.channel = channel
+        self.loop = loop
+        self.pending = deque()
+        self.ready = asyncio.Event()
+        self.ended = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.hub._unsubscribe(self)
+
+    def push(self, event):
+        if len(self.pending) >= MAX_PENDING:
+            self.ended = True
+        else:
+            self.pending.append(event)
+        self.ready.set()
+
+    def end(self):
+        """Make ``next_events`` return None, e.g. because the client went away."""
+        self.ended = True
+        self.ready.set()
+
+    async def next_events(self, timeout=HEARTBEAT_SECONDS):
+        """Wait up to ``timeout`` seconds for events. Returns them ([] on timeout), or None once ended."""
+        if not self.pending and not self.ended:
+            try:
+                await asyncio.wait_for(self.ready.wait(), timeout)
+            except TimeoutError:
+                return []
+        if self.ended:
+            return None
+        self.ready.clear()
+        events = list(self.pending)
+        self.pending.clear()
+        return events
+
+
+def _deliver(subscriptions, event):
+    for subscription in subscriptions:
+        subscription.push(event)
+
+
+class Hub:
+    """Subscribers by channel and event loop, fed from a channel layer."""
+
+    def __init__(self, layer):
+        self.layer = layer
+        self._channels = defaultdict(dict)  # channel -> {loop: set of subscriptions}
+        self._lock = threading.Lock()
+        layer.add_receiver(self._dispatch)
+
+    def subscribe(self, channel):
+        """Return a Subscription to ``channel``; use it as a context manager to unsubscribe."""
+        subscription = Subscription(self, channel, asyncio.get_running_loop())
+        with self._lock:
+            self._channels[channel].setdefault(subscription.loop, set()).add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            loops = self._channels.get(subscription.channel, {})
+            subscriptions = loops.get(subscription.loop, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                loops.pop(subscription.loop, None)
+            if not loops:
+                self._channels.pop(subscription.channel, None)
+
+    def subscriber_count(self, channel=None):
+        with self._lock:
+            channels = [self._channels.get(channel, {})] if channel else list(self._channels.values())
+            return sum(len(subscriptions) for loops in channels for subscriptions in loops.values())
+
+    def publish(self, channel, event):
+        """Send an encoded event to every subscriber of ``channel``; safe to call from any thread."""
+        self.layer.group_send(channel, event)
+
+    def _dispatch(self, channel, event):
+        with self._lock:
+            targets = [(loop, list(subscriptions)) for loop, subscriptions in self._channels.get(channel, {}).items()]
+        for loop, subscriptions in targets:
+            try:
+                loop.call_soon_threadsafe(_deliver, subscriptions, event)
+            except RuntimeError:
+                # The loop has closed; its subscribers are gone
+                pass
+
+
+@lru_cache(maxsize=None)
+def get_hub():
+    """Return this process's hub (cached; call ``get_hub.cache_clear()`` to re-resolve the layer)."""
+    path = getattr(settings, 'TRACKER_CHANNEL_LAYER', 'tracker.broadcast.LocalChannelLayer')
+    return Hub(import_string(path)())
+
+
+# Server-sent event encoding
+def comment_channel(prompt_id=None):
+    return f'prompt:{prompt_id}' if prompt_id else 'comments'
+
+
+def sse_event(name, data, event_id=None):
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines += [f'event: {name}', f'data: {json.dumps(data)}']
+    return ('\n'.join(lines) + '\n\n').encode()
+
+
+def stream_preamble():
+    return f'retry: {RECONNECT_MS}\n\n'.encode()
+
+
+def comment_event(comment):
+    return sse_event('comment', {'id': comment.id, 'html': fragments.comment_card(comment)}, comment.id)
+
+
+def publish_comment(comment):
+    get_hub().publish(comment_channel(comment.prompt_id), comment_event(comment))
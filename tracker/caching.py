@@ -0,0 +1,70 @@
+import hashlib
+from functools import wraps
+
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .models import Profile
+
+# Cached dashboard data lives for at most a day; the key also changes at midnight
+DASHBOARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def bump_data_version(user_id):
+    """Invalidate cached per-user data by incrementing the profile's data version."""
+    Profile.objects.filter(user_id=user_id).update(data_version=F('data_version') + 1, data_changed_at=timezone.now())
+
+
+def dashboard_cache_key(user_id, version, day):
+    return f"dashboard:{user_id}:{version}:{day.isoformat()}"
+
+
+def get_cached(key, build, timeout=DASHBOARD_CACHE_TIMEOUT):
+    """Return the cached value for ``key``, building and storing it on a miss."""
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, timeout)
+    return value
+
+
+# Conditional GET for per-user JSON endpoints
+def _data_version(request):
+    """Return (data_version, data_changed_at) for the requesting user, probed once per request."""
+    if not hasattr(request, '_data_version'):
+        request._data_version = (
+            Profile.objects.filter(user=request.user).values_list('data_version', 'data_changed_at').first()
+            or (0, None)
+        )
+    return request._data_version
+
+
+def _user_data_etag(request, *args, **kwargs):
+    version, _ = _data_version(request)
+    raw = f"{request.user.pk}:{version}:{request.get_full_path()}"
+    return hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+
+
+def _user_data_last_modified(request, *args, **kwargs):
+    return _data_version(request)[1]
+
+
+def user_data_conditional(view):
+    """Serve 304 Not Modified for a per-user JSON view when the user's data version is unchanged.
+
+    The ETag covers the user, their data version and the full request path, so the
+    view body (queries and serialisation) only runs when the response would differ.
+    Apply below ``login_required``.
+    """
+    conditional_view = condition(etag_func=_user_data_etag, last_modified_func=_user_data_last_modified)(view)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = conditional_view(request, *args, **kwargs)
+        # Always revalidate; never serve one user's payload from a shared cache
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    return wrapper
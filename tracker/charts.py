@@ -0,0 +1,99 @@
+"""Chart payloads shared by the per-series JSON endpoints and the batched chart endpoint.
+
+Every builder takes ``(user, profile, start, end)`` so one request can resolve the
+profile once and build any number of series from it. ``start``/``end`` are
+optional dates bounding the series.
+"""
+from . import aggregates
+from .models import Cycle, DiaryEntry, FlowDay, SelfCareEntry
+
+FLOW_INTENSITY = {'Light': 1, 'Medium': 2, 'Heavy': 3}
+FLOW_COLORS = {'Light': '#F4E1D2', 'Medium': '#A18BD0', 'Heavy': '#ECA1A6'}
+
+
+def _in_range(queryset, field, start, end):
+    if start:
+        queryset = queryset.filter(**{f'{field}__gte': start})
+    if end:
+        queryset = queryset.filter(**{f'{field}__lte': end})
+    return queryset
+
+
+def flow_days(user, start=None, end=None):
+    return _in_range(FlowDay.objects.filter(user=user), 'date', start, end).order_by('date').values_list('date', 'intensity')
+
+
+def flow_chart(user, profile, start=None, end=None):
+    rows = list(flow_days(user, start, end))
+    return {
+        'labels': [day.strftime('%Y-%m-%d') for day, _ in rows],
+        'values': [FLOW_INTENSITY.get(intensity, 0) for _, intensity in rows],
+        'colors': [FLOW_COLORS.get(intensity, '#ccc') for _, intensity in rows],
+    }
+
+
+def cycles_chart(user, profile, start=None, end=None):
+    rows = _in_range(Cycle.objects.filter(user=user), 'start_date', start, end)
+    rows = list(rows.order_by('start_date').values_list('start_date', 'end_date', 'flow_type'))
+    return {
+        'labels': [started.strftime('%Y-%m-%d') for started, _, _ in rows],
+        'durations': [(ended - started).days if ended else 0 for started, ended, _ in rows],
+        'flows': [flow or '' for _, _, flow in rows],
+    }
+
+
+def moods_chart(user, profile, start=None, end=None):
+    counts = aggregates.mood_counts(profile, start, end)
+    return {'labels': list(counts.keys()), 'values': list(counts.values())}
+
+
+def cravings_chart(user, profile, start=None, end=None):
+    counts = aggregates.craving_counts(profile, start, end)
+    return {'labels': list(counts.keys()), 'values': list(counts.values())}
+
+
+def mood_cravings_chart(user, profile, start=None, end=None):
+    mood_counts = aggregates.mood_counts(profile, start, end)
+    craving_counts = aggregates.craving_counts(profile, start, end)
+    labels = sorted(set(mood_counts) | set(craving_counts))
+    return {
+        'labels': labels,
+        'moods': [mood_counts.get(label, 0) for label in labels],
+        'cravings': [craving_counts.get(label, 0) for label in labels],
+    }
+
+
+def selfcare_chart(user, profile, start=None, end=None):
+    rows = _in_range(SelfCareEntry.objects.filter(user=user), 'date', start, end)
+    rows = list(rows.order_by('date').values_list('date', 'sleep_hours', 'water_litres', 'steps', 'energy_level'))
+    return {
+        'labels': [day.strftime('%Y-%m-%d') for day, *_ in rows],
+        'sleep_hours': [float(sleep) for _, sleep, _, _, _ in rows],
+        'water_litres': [float(water) for _, _, water, _, _ in rows],
+        'steps': [steps or 0 for _, _, _, steps, _ in rows],
+        'energy': [energy for *_, energy in rows],
+    }
+
+
+def diary_calendar(user, profile, start=None, end=None):
+    rows = _in_range(DiaryEntry.objects.filter(user=user), 'date', start, end)
+    return [
+        {'id': entry_id, 'title': title or 'Diary Entry', 'date': day.strftime('%Y-%m-%d'), 'excerpt': excerpt}
+        for entry_id, title, day, excerpt in rows.order_by('date').values_list('id', 'title', 'date', 'excerpt')
+    ]
+
+
+CHART_SERIES = {
+    'flow': flow_chart,
+    'cycles': cycles_chart,
+    'moods': moods_chart,
+    'cravings': cravings_chart,
+    'mood_cravings': mood_cravings_chart,
+    'selfcare': selfcare_chart,
+    'diary': diary_calendar,
+}
+
+
+def build_charts(user, profile, series, start=None, end=None):
+    """Build the requested chart series; returns {name: payload}."""
+    return {name: CHART_SERIES[name](user, profile, start, end) for name in series}
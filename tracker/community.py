@@ -0,0 +1,30 @@
+"""Activity counters on community prompts.
+
+``CommunityPrompt.comment_count`` and ``last_activity_at`` are denormalised so the
+prompt feeds can order by activity from an index instead of aggregating comments
+on every load. Signals keep them current inside the transaction that writes the
+comment; ``recount_prompt_activity`` rebuilds them from the comments themselves.
+"""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import CommunityComment, CommunityPrompt
+
+
+def record_comment_added(comment):
+    CommunityPrompt.objects.filter(pk=comment.prompt_id).update(
+        comment_count=F('comment_count') + 1, last_activity_at=comment.created_at,
+    )
+
+
+def recount_prompt_activity(prompts=None):
+    """Recompute the counters of ``prompts`` (default: all) in one UPDATE. Returns the number of prompts."""
+    prompts = CommunityPrompt.objects.all() if prompts is None else prompts
+    comments = CommunityComment.objects.filter(prompt=OuterRef('pk')).order_by()
+    count = comments.values('prompt').annotate(n=Count('*')).values('n')
+    latest = comments.order_by('-created_at').values('created_at')[:1]
+    return prompts.update(
+        comment_count=Coalesce(Subquery(count), 0),
+        # A prompt nobody has answered was last active when it was posted
+        last_activity_at=Coalesce(Subquery(latest), F('created_at')),
+    )
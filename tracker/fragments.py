@@ -0,0 +1,111 @@
+"""Shared cache of rendered community fragments.
+
+The community prompt list, the general comment feed and each prompt's comments
+look the same to every viewer, so they are rendered once and cached for everyone.
+Each fragment key carries a version for its scope (``prompts``, ``comments`` or
+``prompt:<id>``). Writes bump a scope's version, which makes the old fragments
+unreachable instead of deleting them.
+
+Versions live in the database (``CommunityPrompt.fragment_version`` and a
+``FragmentVersion`` row per shared scope), not in the cache: the default cache is
+per process, and every worker must see a bump. A bump is an UPDATE in the same
+transaction as the write, so the new version and the new rows commit together.
+
+Edit and delete buttons depend on the viewer. Cached comment HTML holds a marker
+where they belong, and ``with_edit_buttons`` fills in the viewer's own on each
+request.
+"""
+import hashlib
+from collections import namedtuple
+
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .caching import get_cached
+from .models import CommunityComment, CommunityPrompt, FragmentVersion
+from .pagination import KeysetPage, KeysetPaginator
+
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+ACTIONS_MARKER = '<!--comment-actions:{}-->'
+
+# Card markup for the general feed and for a prompt's comments
+COMMUNITY_CARDS = {
+    'card_class': 'card mb-3',
+    'card_style': 'border: 1px solid #d8cbe6; background-color: #fdf9ff; border-radius: 8px;',
+    'empty_class': 'text-muted',
+    'empty_message': 'No comments yet. Be the first to share!',
+}
+PROMPT_CARDS = {
+    'card_class': 'card shadow-sm mb-3',
+    'empty_class': 'text-center',
+    'empty_message': 'No comments yet. Be the first to reply!',
+}
+
+# What the overlay needs to decide whether a viewer may edit a cached comment
+CommentAuthor = namedtuple('CommentAuthor', 'id user_id is_anonymous')
+CommentsFragment = namedtuple('CommentsFragment', 'html page')
+
+
+def _counter(scope):
+    """Return (queryset, field) holding the version of ``scope``."""
+    kind, _, prompt_id = scope.partition(':')
+    if kind == 'prompt':
+        return CommunityPrompt.objects.filter(pk=int(prompt_id)), 'fragment_version'
+    return FragmentVersion.objects.filter(scope=scope), 'version'
+
+
+def version(scope):
+    """Return the current version of ``scope``; None before its first bump, or once its prompt is deleted."""
+    queryset, field = _counter(scope)
+    return queryset.values_list(field, flat=True).first()
+
+
+def bump(*scopes):
+    for scope in scopes:
+        queryset, field = _counter(scope)
+        if not queryset.update(**{field: F(field) + 1}) and not scope.startswith('prompt:'):
+            _, created = FragmentVersion.objects.get_or_create(scope=scope, defaults={'version': 1})
+            if not created:
+                queryset.update(version=F('version') + 1)
+
+
+def fragment_key(scope, *parts, current=None):
+    """Key for a fragment of ``scope``; pass ``current`` when the version is already loaded."""
+    digest = hashlib.md5(':'.join(parts).encode(), usedforsecurity=False).hexdigest()
+    return f"community:{scope}:{version(scope) if current is None else current}:{digest}"
+
+
+def cached_fragment(scope, parts, build, current=None):
+    return get_cached(fragment_key(scope, *parts, current=current), build, FRAGMENT_TIMEOUT)
+
+
+def comments_fragment(scope, queryset, per_page, cursor, template_context, current=None):
+    """Return the CommentsFragment for one keyset page of ``queryset``, rendering it on a miss."""
+    paginator = KeysetPaginator(queryset, ('-created_at', '-id'), per_page)
+    # Invalid cursors all show the first page, so they share its key
+    cursor = paginator.clean_cursor(cursor)
+
+    def build():
+        page = paginator.page(cursor)
+        html = render_to_string('tracker/partials/comment_cards.html', {'comments': page, **template_context})
+        authors = [CommentAuthor(c.id, c.user_id, c.is_anonymous) for c in page]
+        return CommentsFragment(html, KeysetPage(authors, page.next_cursor, page.previous_cursor))
+    return cached_fragment(scope, ('comments', str(per_page), cursor or ''), build, current)
+
+
+def comment_card(comment):
+    """Render one comment's card as it appears in its feed, without edit buttons."""
+    cards = PROMPT_CARDS if comment.prompt_id else COMMUNITY_CARDS
+    return render_to_string('tracker/partials/comment_cards.html', {'comments': [comment], **cards})
+
+
+def with_edit_buttons(fragment, user):
+    """Return the fragment HTML with edit/delete buttons on the comments ``user`` may edit."""
+    html = fragment.html
+    for author in fragment.page:
+        comment = CommunityComment(id=author.id, user_id=author.user_id, is_anonymous=author.is_anonymous)
+        if comment.can_edit(user):
+            actions = render_to_string('tracker/partials/comment_actions.html', {'comment_id': author.id})
+            html = html.replace(ACTIONS_MARKER.format(author.id), actions)
+    return mark_safe(html)
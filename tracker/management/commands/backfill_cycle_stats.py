@@ -0,0 +1,14 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from tracker.stats import refresh_all_cycle_stats
+
+class Command(BaseCommand):
+    help = 'Recompute stored cycle statistics for every user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Users per query/bulk write batch')
+
+    def handle(self, *args, **options):
+        user_ids = User.objects.order_by('id').values_list('id', flat=True)
+        count = refresh_all_cycle_stats(user_ids, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Cycle stats refreshed for {count} users.'))
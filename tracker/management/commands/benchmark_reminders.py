@@ -0,0 +1,171 @@
+import json
+import random
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import time as dt_time, timedelta
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+from tracker import outbox, reminders
+from tracker.models import Profile
+from tracker.predictions import refresh_predictions
+from tracker.utils import queue_period_reminders
+
+# Metrics compared between runs; higher is worse for all of them
+COMPARED = ('seconds', 'queries', 'peak_kb')
+
+
+class QueryCounter:
+    """Database execute wrapper that counts statements without storing them."""
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def synthetic_profiles(users, rng, today):
+    """Yield (User, Profile) pairs with plausible cycle and reminder settings."""
+    for i in range(users):
+        cycle_length = min(35, max(21, round(rng.gauss(28, 3))))
+        profile = Profile(
+            name=f'Bench {i}',
+            cycle_length=cycle_length,
+            last_period_start=today - timedelta(days=rng.randrange(cycle_length)),
+            period_reminder_days_before=rng.choices([None, 1, 2, 3, 5], weights=[10, 25, 40, 15, 10])[0],
+            # Most people who set one take the pill in the morning or before bed
+            pill_reminder_time=(
+                dt_time(rng.choice([7, 7, 8, 8, 9, 21, 22, 22]), rng.choice([0, 0, 15, 30, 45]))
+                if rng.random() < 0.4 else None
+            ),
+            email_reminders_enabled=rng.random() < 0.9,
+        )
+        yield User(username=f'bench{i}', email=f'bench{i}@example.com', password='!'), profile
+
+
+class Command(BaseCommand):
+    help = 'Time the reminder pipeline on synthetic profiles in a throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000, help='Synthetic profiles to seed')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed for the synthetic data')
+        parser.add_argument('--tick-minutes', type=int, default=15, help='Scheduler tick spacing over the simulated day')
+        parser.add_argument('--threads', type=int, default=outbox.THREADS, help='Outbox sender threads')
+        parser.add_argument('--save', metavar='FILE', help='Write the results as JSON')
+        parser.add_argument('--compare', metavar='FILE', help='Compare with results saved by an earlier run')
+        parser.add_argument('--threshold', type=float, default=0.2, help='Allowed slowdown before --compare fails (0.2 = 20%%)')
+
+    def measure(self, name, run):
+        """Run one stage, recording wall time, statements, peak Python memory and messages produced."""
+        counter = QueryCounter()
+        tracemalloc.reset_peak()
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            messages = run()
+        seconds = time.perf_counter() - started
+        self.results[name] = {
+            'messages': messages,
+            'seconds': round(seconds, 4),
+            'queries': counter.count,
+            'peak_kb': tracemalloc.get_traced_memory()[1] // 1024,
+            'msgs_per_sec': round(messages / seconds, 1) if seconds else 0.0,
+        }
+
+    def seed(self, users, rng):
+        today = timezone.now().date()
+        pairs = list(synthetic_profiles(users, rng, today))
+        # bulk_create sends no signals, so profiles, predictions and schedules are built in bulk here
+        created = User.objects.bulk_create([user for user, _ in pairs], batch_size=1000)
+        for user, (_, profile) in zip(created, pairs):
+            profile.user = user
+        Profile.objects.bulk_create([profile for _, profile in pairs], batch_size=1000)
+        user_ids = [user.pk for user in created]
+        for i in range(0, len(user_ids), 1000):
+            refresh_predictions(user_ids[i:i + 1000], today)
+        reminders.rebuild_schedules()
+        return 0
+
+    def simulate_day(self, minutes):
+        """Run scheduler ticks every ``minutes`` over the next 24 hours; returns reminders queued."""
+        queued, now = 0, timezone.now()
+        for step in range(0, 24 * 60, minutes):
+            tick_at = now + timedelta(minutes=step)
+            while True:
+                report = reminders.run_due_reminders(now=tick_at)
+                queued += report.queued
+                if report.due < reminders.TICK_LIMIT:
+                    break
+        return queued
+
+    def send_outbox(self, threads):
+        reports = list(outbox.drain(threads=threads))
+        mail.outbox = []
+        return sum(report.sent for report in reports)
+
+    def run_pipeline(self, options):
+        rng = random.Random(options['seed'])
+        self.measure('seed', lambda: self.seed(options['users'], rng))
+        self.measure('period_reminders', lambda: queue_period_reminders().queued)
+        self.measure('scheduler_day', lambda: self.simulate_day(options['tick_minutes']))
+        self.measure('outbox', lambda: self.send_outbox(options['threads']))
+
+    def compare(self, path, threshold):
+        with open(path) as f:
+            baseline = json.load(f)['stages']
+        regressions = []
+        self.stdout.write(f'\nCompared with {path}:')
+        for stage, metrics in self.results.items():
+            before = baseline.get(stage)
+            if not before:
+                continue
+            changes = []
+            for metric in COMPARED:
+                old, new = before[metric], metrics[metric]
+                change = (new - old) / old if old else 0.0
+                changes.append(f'{metric} {change:+.0%}')
+                # Tiny stages are all noise; judge timings only above 50 ms
+                if change > threshold and (metric != 'seconds' or new > 0.05):
+                    regressions.append(f'{stage} {metric}: {old} -> {new}')
+            self.stdout.write(f'  {stage:<18} ' + ', '.join(changes))
+        return regressions
+
+    @contextmanager
+    def throwaway_database(self):
+        """Run on a fresh test database, so the benchmark never touches real data."""
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def handle(self, *args, **options):
+        self.results = {}
+        tracemalloc.start()
+        try:
+            with self.throwaway_database(), \
+                    override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'):
+                self.run_pipeline(options)
+        finally:
+            tracemalloc.stop()
+
+        self.stdout.write(f"{options['users']} synthetic users (seed {options['seed']}):")
+        for stage, metrics in self.results.items():
+            self.stdout.write(
+                f"  {stage:<18} {metrics['messages']:>7} msgs  {metrics['seconds']:>8.2f}s  "
+                f"{metrics['msgs_per_sec']:>9.1f} msgs/sec  {metrics['queries']:>6} queries  {metrics['peak_kb']:>8} KiB peak"
+            )
+
+        if options['save']:
+            with open(options['save'], 'w') as f:
+                json.dump({'users': options['users'], 'seed': options['seed'], 'stages': self.results}, f, indent=2)
+        if options['compare']:
+            regressions = self.compare(options['compare'], options['threshold'])
+            if regressions:
+                raise CommandError('Regressed: ' + '; '.join(regressions))
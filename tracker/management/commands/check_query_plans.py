@@ -0,0 +1,106 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from tracker import aggregates, charts
+from tracker.models import (
+    Cycle, Symptom, Craving, DiaryEntry, SelfCareEntry,
+    PromptAnswer, GratitudeEntry, CommunityPrompt, CommunityComment, ReminderSchedule,
+    OutboundEmail, Profile,
+)
+from tracker.views import DASHBOARD_DAY_WINDOW, _history_paginator, _history_series
+
+# Placeholder ids: EXPLAIN QUERY PLAN only needs the shape of the query
+USER_ID = PROFILE_ID = PROMPT_ID = 1
+
+
+def dashboard_queries(today):
+    """Return (view, label, queryset) for the dashboard, built by the same helpers the views use."""
+    user, profile = User(pk=USER_ID), Profile(pk=PROFILE_ID, user_id=USER_ID)
+    queries = []
+    for series, (queryset, ordering) in _history_series(user, profile).items():
+        for view, window_day in (('dashboard', today), ('dashboard_history_json', None)):
+            paginator = _history_paginator(series, queryset, ordering, window_day)
+            # Any row will do as the previous page's last row
+            cursor = paginator.cursor_after({field: 1 if field == 'id' else today for field in paginator.fields})
+            queries.append((view, f'{series}_first', paginator.page_queryset()))
+            queries.append((view, f'{series}_next', paginator.page_queryset(cursor)))
+    since = today - timedelta(days=DASHBOARD_DAY_WINDOW)
+    queries.append(('dashboard', 'flow_chart', charts.flow_days(user, since)))
+    for label, queryset, field in (('moods', Symptom.objects.filter(profile=profile), 'mood'),
+                                   ('cravings', Craving.objects.filter(profile=profile), 'craving_type')):
+        queries.append(('dashboard', f'{label}_counts', aggregates._counts_query(queryset, field)))
+        queries.append(('charts_json', f'{label}_counts_range', aggregates._counts_query(queryset, field, since, today)))
+    return queries
+
+
+def view_queries():
+    """Return (view, label, queryset) for the per-user listing queries used by the views."""
+    today = timezone.localdate()
+    return dashboard_queries(today) + [
+        ('dashboard', 'latest_selfcare', SelfCareEntry.objects.filter(user_id=USER_ID).order_by('-date')[:1]),
+        ('cycles_json', 'cycles', Cycle.objects.filter(user_id=USER_ID).order_by('start_date')),
+        # Keyset-paginated listings: first page of (-date/-created_at, -id)
+        ('diary_page', 'entries', DiaryEntry.objects.filter(user_id=USER_ID).order_by('-date', '-id')[:11]),
+        ('diary_page', 'prompt_answers', PromptAnswer.objects.filter(user_id=USER_ID).order_by('-date', '-id')[:11]),
+        ('diary_page', 'gratitude', GratitudeEntry.objects.filter(user_id=USER_ID).order_by('-date', '-id')[:11]),
+        ('selfcare_tracker', 'entries', SelfCareEntry.objects.filter(user_id=USER_ID).order_by('-date', '-id')[:11]),
+        ('wellness_update', 'latest_diary', DiaryEntry.objects.filter(user_id=USER_ID).order_by('-date')[:1]),
+        ('community', 'prompts_active', CommunityPrompt.objects.filter(is_public=True).order_by('-last_activity_at')[:30]),
+        ('community', 'prompts_trending', CommunityPrompt.objects.filter(is_public=True).order_by('-comment_count', '-last_activity_at')[:30]),
+        ('community', 'prompts_new', CommunityPrompt.objects.filter(is_public=True).order_by('-created_at')[:30]),
+        ('community', 'comments', CommunityComment.objects.filter(prompt__isnull=True).order_by('-created_at', '-id')[:11]),
+        ('prompt_directory', 'all', CommunityPrompt.objects.filter(is_public=True).order_by('title_key', 'id')[:26]),
+        ('prompt_directory', 'prefix', CommunityPrompt.objects.filter(is_public=True, title_key__gte='self', title_key__lt='self\uffff')
+            .order_by('title_key', 'id')[:26]),
+        ('prompt_detail', 'comments', CommunityComment.objects.filter(prompt_id=PROMPT_ID).order_by('-created_at', '-id')[:11]),
+        ('send_reminders', 'due', ReminderSchedule.objects.filter(next_due_at__lte=timezone.now())
+            .select_related('user__profile', 'user__prediction').order_by('next_due_at')[:1000]),
+        ('send_outbox', 'claim', OutboundEmail.objects.filter(status='pending', next_attempt_at__lte=timezone.now())
+            .order_by('next_attempt_at').values_list('id', flat=True)[:200]),
+    ]
+
+
+def partial_indexes():
+    """Return the names of partial (WHERE-filtered) indexes; scanning one only reads matching rows."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND sql LIKE '% WHERE %'")
+        return {row[0] for row in cursor.fetchall()}
+
+
+def plan_problems(plan, partial=frozenset()):
+    """Return the plan lines that indicate a full scan or a temp-table sort."""
+    problems = []
+    for line in plan.splitlines():
+        detail = line.split(' ', 3)[-1]
+        if detail.startswith('SCAN '):
+            index = detail.rsplit(' ', 1)[-1] if ' INDEX ' in detail else None
+            if index not in partial:
+                problems.append(detail)
+        elif detail.startswith('USE TEMP B-TREE'):
+            problems.append(detail)
+    return problems
+
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN QUERY PLAN on the views\' queries and fail on full scans or temp sorts'
+
+    def handle(self, *args, **kwargs):
+        if connection.vendor != 'sqlite':
+            raise CommandError('check_query_plans only understands SQLite query plans.')
+
+        partial = partial_indexes()
+        failures = 0
+        for view, label, queryset in view_queries():
+            problems = plan_problems(queryset.explain(), partial)
+            if problems:
+                failures += 1
+                self.stdout.write(self.style.ERROR(f'{view}.{label}: ' + '; '.join(problems)))
+            else:
+                self.stdout.write(f'{view}.{label}: ok')
+
+        if failures:
+            raise CommandError(f'{failures} queries fall back to a full scan or temp sort.')
+        self.stdout.write(self.style.SUCCESS('All query plans use indexes.'))
@@ -0,0 +1,157 @@
+import asyncio
+import resource
+import threading
+import time
+import tracemalloc
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.urls import reverse
+from tracker import broadcast
+from tracker.models import CommunityComment, CommunityPrompt
+from tracker_project.asgi import application
+
+
+class QueryCounter:
+    """Execute wrapper counting statements on every connection it is installed on, from any thread."""
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def install(self, sender, connection, **kwargs):
+        connection.execute_wrappers.append(self)
+
+
+class StreamClient:
+    """One browser tab holding a stream open, talking to the ASGI application directly."""
+    def __init__(self, path, cookie, query=''):
+        self.scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'accept', b'text/event-stream'), (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+        }
+        self.status = None
+        self.body = b''
+        self.requested = False
+        self.closed = asyncio.Event()
+        self.got_comment = asyncio.Event()
+
+    async def receive(self):
+        if not self.requested:
+            self.requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await self.closed.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.status = message['status']
+        else:
+            self.body += message.get('body', b'')
+            if b'event: comment' in self.body:
+                self.got_comment.set()
+
+    async def run(self, app):
+        await app(self.scope, self.receive, self.send)
+
+
+class Command(BaseCommand):
+    help = 'Hold many idle comment streams open in one process and time a broadcast to all of them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=5000, help='Streams to open')
+        parser.add_argument('--idle', type=float, default=5.0, help='Seconds to sit idle before broadcasting')
+        parser.add_argument('--timeout', type=float, default=120.0, help='Give up if a stage takes longer')
+
+    def seed(self):
+        user = User.objects.create_user('loadtest', password='x')
+        prompt = CommunityPrompt.objects.create(user=user, title='What helps on hard days?')
+        client = Client()
+        client.force_login(user)
+        return user, prompt, f"sessionid={client.cookies['sessionid'].value}"
+
+    async def run_load(self, options, user, prompt, cookie):
+        hub = broadcast.get_hub()
+        channel = broadcast.comment_channel(prompt.id)
+        path = reverse('prompt_stream', args=[prompt.id])
+        clients = [StreamClient(path, cookie) for _ in range(options['subscribers'])]
+        timeout = options['timeout']
+
+        # Stage 1: open every stream
+        memory_before = tracemalloc.get_traced_memory()[0]
+        queries_before = self.counter.count
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(client.run(application)) for client in clients]
+        # A stream has opened once its response has started
+        while any(client.status is None for client in clients):
+            if time.perf_counter() - started > timeout:
+                raise CommandError(f'Only {sum(client.status is not None for client in clients)} streams opened')
+            await asyncio.sleep(0.05)
+        self.results['connect'] = {
+            'seconds': time.perf_counter() - started,
+            'queries': self.counter.count - queries_before,
+            'kib_per_stream': (tracemalloc.get_traced_memory()[0] - memory_before) / 1024 / len(clients),
+            'threads': threading.active_count(),
+        }
+        failed = [client.status for client in clients if client.status != 200]
+        if failed or hub.subscriber_count(channel) != len(clients):
+            raise CommandError(f'{len(failed)} streams were refused (status {failed[0] if failed else None})')
+
+        # Stage 2: sit idle; nothing should touch the database
+        queries_before = self.counter.count
+        await asyncio.sleep(options['idle'])
+        self.results['idle'] = {'seconds': options['idle'], 'queries': self.counter.count - queries_before}
+
+        # Stage 3: post one comment and wait for it to reach every stream
+        queries_before = self.counter.count
+        started = time.perf_counter()
+        await sync_to_async(CommunityComment.objects.create, thread_sensitive=False)(
+            prompt=prompt, user=user, content='Going for a slow walk.')
+        await asyncio.wait_for(asyncio.gather(*(client.got_comment.wait() for client in clients)), timeout)
+        self.results['broadcast'] = {'seconds': time.perf_counter() - started, 'queries': self.counter.count - queries_before}
+
+        # Stage 4: close every stream; each must unsubscribe
+        started = time.perf_counter()
+        for client in clients:
+            client.closed.set()
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout)
+        self.results['disconnect'] = {'seconds': time.perf_counter() - started, 'left': hub.subscriber_count(channel)}
+
+    def handle(self, *args, **options):
+        self.results = {}
+        self.counter = QueryCounter()
+        old_name = connection.settings_dict['NAME']
+        # A fresh test database: the load test never touches real data
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        connection_created.connect(self.counter.install)
+        connection.execute_wrappers.append(self.counter)
+        tracemalloc.start()
+        try:
+            user, prompt, cookie = self.seed()
+            asyncio.run(self.run_load(options, user, prompt, cookie))
+        finally:
+            tracemalloc.stop()
+            connection_created.disconnect(self.counter.install)
+            connection.execute_wrappers.remove(self.counter)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        connect, idle, sent, closed = (self.results[stage] for stage in ('connect', 'idle', 'broadcast', 'disconnect'))
+        self.stdout.write(f"{options['subscribers']} streams on one prompt, one process:")
+        self.stdout.write(f"  connect     {connect['seconds']:8.2f}s  {connect['queries']:>6} queries  "
+                          f"{connect['kib_per_stream']:6.1f} KiB/stream  {connect['threads']} threads")
+        self.stdout.write(f"  idle        {idle['seconds']:8.2f}s  {idle['queries']:>6} queries")
+        self.stdout.write(f"  broadcast   {sent['seconds']:8.2f}s  {sent['queries']:>6} queries  (1 comment to every stream)")
+        self.stdout.write(f"  disconnect  {closed['seconds']:8.2f}s  {closed['left']:>6} still subscribed")
+        self.stdout.write(f"  peak RSS    {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024} MiB")
+        if idle['queries'] or closed['left']:
+            raise CommandError('Idle streams queried the database or failed to unsubscribe')
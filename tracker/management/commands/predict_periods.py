@@ -0,0 +1,40 @@
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+from tracker.predictions import refresh_predictions
+
+class Command(BaseCommand):
+    help = 'Recompute next-period predictions for every user in chunked, parallel batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Users per batch')
+        parser.add_argument('--workers', type=int, default=1, help='Batches processed concurrently')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        chunk_size = options['chunk_size']
+        user_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+        chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+
+        def run_chunk(chunk):
+            try:
+                return refresh_predictions(chunk, today)
+            finally:
+                # Each worker thread holds its own connection
+                connection.close()
+
+        started = time.monotonic()
+        if options['workers'] > 1:
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                total = sum(pool.map(run_chunk, chunks))
+        else:
+            total = sum(refresh_predictions(chunk, today) for chunk in chunks)
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Predictions refreshed for {total} users in {len(chunks)} batches ({elapsed:.2f}s).'
+        ))
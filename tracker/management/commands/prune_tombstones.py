@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from tracker.sync import prune_tombstones
+
+class Command(BaseCommand):
+    help = 'Delete sync tombstones older than the retention window'
+
+    def handle(self, *args, **options):
+        count = prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(f'Pruned {count} tombstones.'))
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from tracker.autocomplete import rebuild_terms
+
+class Command(BaseCommand):
+    help = 'Recount the autocomplete vocabulary of every user from their entries'
+
+    def handle(self, *args, **options):
+        count = rebuild_terms()
+        self.stdout.write(self.style.SUCCESS(f'Stored {count} autocomplete terms.'))
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from tracker.reminders import rebuild_schedules
+
+class Command(BaseCommand):
+    help = 'Recompute every user\'s reminder schedule from their profile and prediction'
+
+    def handle(self, *args, **options):
+        count = rebuild_schedules()
+        self.stdout.write(self.style.SUCCESS(f'Scheduled {count} reminders.'))
@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+from tracker.search import get_backend
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index from every searchable entry'
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        started = time.perf_counter()
+        count = backend.rebuild()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{type(backend).__name__}: indexed {count} documents in {elapsed:.2f}s.'
+        ))
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from tracker.community import recount_prompt_activity
+
+class Command(BaseCommand):
+    help = 'Recount comment totals and last activity for every community prompt'
+
+    def handle(self, *args, **options):
+        count = recount_prompt_activity()
+        self.stdout.write(self.style.SUCCESS(f'Activity recounted for {count} prompts.'))
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from tracker.outbox import BATCH_SIZE, THREADS, drain_batches, merge_reports
+from tracker.sharding import add_shard_arguments, run_sharded, shard_options
+
+class Command(BaseCommand):
+    help = 'Deliver queued emails from the outbox with a pool of sender threads'
+
+    def add_arguments(self, parser):
+        add_shard_arguments(parser)
+        parser.add_argument('--threads', type=int, default=THREADS, help='Sender threads per worker, one mail connection each')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Emails claimed per batch')
+        parser.add_argument('--once', action='store_true', help='Drain what is due now and exit')
+        parser.add_argument('--interval', type=int, default=5, help='Seconds to wait when the outbox is empty')
+
+    def drain(self, shard, workers, options):
+        started = time.perf_counter()
+        results = run_sharded(drain_batches, shard, workers, batch_size=options['batch_size'], threads=options['threads'])
+        reports = [report for worker_reports in results for report in worker_reports]
+        for report in reports:
+            self.stdout.write(
+                f'Batch of {report.claimed}: {report.sent} sent, {report.retrying} retrying, '
+                f'{report.failed} failed in {report.elapsed:.2f}s ({report.rate:.1f} msgs/sec)'
+            )
+        if workers > 1 and reports:
+            total = merge_reports(reports, time.perf_counter() - started)
+            self.stdout.write(self.style.SUCCESS(
+                f'{workers} workers: {total.sent} sent, {total.retrying} retrying, {total.failed} failed '
+                f'in {total.elapsed:.2f}s ({total.rate:.1f} msgs/sec)'
+            ))
+
+    def handle(self, *args, **options):
+        shard, workers = shard_options(options)
+        self.drain(shard, workers, options)
+        while not options['once']:
+            time.sleep(options['interval'])
+            self.drain(shard, workers, options)
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+from tracker.sharding import add_shard_arguments, run_sharded, shard_options
+from tracker.utils import queue_period_reminders
+
+class Command(BaseCommand):
+    help = 'Queue emails for users whose period reminder is due today (delivered by send_outbox)'
+
+    def add_arguments(self, parser):
+        add_shard_arguments(parser)
+
+    def handle(self, *args, **options):
+        shard, workers = shard_options(options)
+        started = time.perf_counter()
+        queued = sum(report.queued for report in run_sharded(queue_period_reminders, shard, workers))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Queued {queued} period reminders in {elapsed:.2f}s ({queued / elapsed if elapsed else 0:.1f} msgs/sec).'
+        ))
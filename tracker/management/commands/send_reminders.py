@@ -1,22 +1,35 @@
+import time
+
 from django.core.management.base import BaseCommand
-from django.core.mail import send_mail
-from django.utils.timezone import now
-from tracker.models import Profile
+from django.utils import timezone
+from tracker.reminders import TICK_LIMIT, TickReport, drain_due
+from tracker.sharding import add_shard_arguments, run_sharded, shard_options
 
 class Command(BaseCommand):
-    help = 'Send email reminders to users'
+    help = 'Queue due pill and period reminders, checking the reminder schedule every tick'
+
+    def add_arguments(self, parser):
+        add_shard_arguments(parser)
+        parser.add_argument('--once', action='store_true', help='Run a single tick and exit')
+        parser.add_argument('--interval', type=int, default=60, help='Seconds between ticks')
+        parser.add_argument('--limit', type=int, default=TICK_LIMIT, help='Most reminders read per query')
 
-    def handle(self, *args, **kwargs):
-        current_time = now().time().replace(second=0, microsecond=0)
-        profiles = Profile.objects.filter(email_reminders_enabled=True, reminder_time=current_time)
+    def tick(self, shard, workers, limit):
+        results = run_sharded(drain_due, shard, workers, limit=limit)
+        # Workers run side by side, so the tick took as long as the slowest
+        report = TickReport(*(sum(column) for column in zip(*results)))._replace(elapsed=max(r.elapsed for r in results))
+        if report.due:
+            self.stdout.write(
+                f'{timezone.now():%Y-%m-%d %H:%M:%S} queued {report.queued} of {report.due} due reminders '
+                f'({report.skipped} skipped) in {report.elapsed:.2f}s'
+            )
 
-        for profile in profiles:
-            if profile.user.email:
-                send_mail(
-                    subject="🌸 Luniva Reminder",
-                    message=f"Hi {profile.name or profile.user.username}, this is your gentle reminder to check in with Luniva today 💜",
-                    from_email="noreply@luniva.com",
-                    recipient_list=[profile.user.email],
-                    fail_silently=True
-                )
-        self.stdout.write(self.style.SUCCESS('Reminders sent successfully.'))
+    def handle(self, *args, **options):
+        shard, workers = shard_options(options)
+        if options['once']:
+            self.tick(shard, workers, options['limit'])
+            return
+        interval = options['interval']
+        while True:
+            self.tick(shard, workers, options['limit'])
+            time.sleep(interval - time.time() % interval)
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0028_communitycomment_prompt'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CycleStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cycle_count', models.PositiveIntegerField(default=0)),
+                ('avg_cycle_length', models.IntegerField(blank=True, null=True)),
+                ('most_common_flow', models.CharField(default='Unknown', max_length=20)),
+                ('irregular_count', models.PositiveIntegerField(default=0)),
+                ('trend', models.CharField(default='Stable', max_length=20)),
+                ('avg_gap_length', models.IntegerField(blank=True, null=True)),
+                ('gap_irregular_count', models.PositiveIntegerField(default=0)),
+                ('last_start_date', models.DateField(blank=True, null=True)),
+                ('last_end_date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='cycle_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0029_cyclestats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='communitycomment',
+            index=models.Index(fields=['prompt', '-created_at'], name='comment_prompt_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='communityprompt',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['-created_at'], name='prompt_public_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='craving',
+            index=models.Index(fields=['profile', 'date'], name='craving_profile_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cycle',
+            index=models.Index(fields=['user', '-start_date'], name='cycle_user_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='diaryentry',
+            index=models.Index(fields=['user', 'date'], name='diary_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flowday',
+            index=models.Index(fields=['cycle', 'date'], name='flowday_cycle_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gratitudeentry',
+            index=models.Index(fields=['user', '-date'], name='gratitude_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='promptanswer',
+            index=models.Index(fields=['user', '-date'], name='promptanswer_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='selfcareentry',
+            index=models.Index(fields=['user', '-date'], name='selfcare_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='symptom',
+            index=models.Index(fields=['profile', 'date'], name='symptom_profile_date_idx'),
+        ),
+    ]
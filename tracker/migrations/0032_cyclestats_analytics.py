@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0031_profile_data_version'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='cyclestats',
+            name='avg_gap_length',
+        ),
+        migrations.RemoveField(
+            model_name='cyclestats',
+            name='gap_irregular_count',
+        ),
+        migrations.AddField(
+            model_name='cyclestats',
+            name='avg_period_length',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cyclestats',
+            name='cycle_length_std',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cyclestats',
+            name='trend_slope',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0032_cyclestats_analytics'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Prediction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('current_cycle_start', models.DateField(blank=True, null=True)),
+                ('cycle_length', models.PositiveIntegerField(default=28)),
+                ('next_period_start', models.DateField(blank=True, db_index=True, null=True)),
+                ('source', models.CharField(choices=[('cycles', 'Logged cycles'), ('profile', 'Profile'), ('default', 'Default')], default='default', max_length=10)),
+                ('computed_on', models.DateField()),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='prediction', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0033_prediction'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='data_changed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:40
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+
+def fill_excerpts(apps, schema_editor):
+    DiaryEntry = apps.get_model('tracker', 'DiaryEntry')
+    batch = []
+    for entry in DiaryEntry.objects.only('id', 'content').iterator(chunk_size=500):
+        entry.excerpt = Truncator(' '.join((entry.content or '').split())).chars(140)
+        batch.append(entry)
+        if len(batch) >= 500:
+            DiaryEntry.objects.bulk_update(batch, ['excerpt'])
+            batch = []
+    DiaryEntry.objects.bulk_update(batch, ['excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0035_sync_tracking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='diaryentry',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=140),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0036_diaryentry_excerpt'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='communitycomment',
+            name='comment_prompt_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='cycle',
+            name='cycle_user_start_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='gratitudeentry',
+            name='gratitude_user_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='promptanswer',
+            name='promptanswer_user_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='selfcareentry',
+            name='selfcare_user_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='communitycomment',
+            index=models.Index(fields=['prompt', '-created_at', '-id'], name='comment_prompt_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cycle',
+            index=models.Index(fields=['user', '-start_date', '-id'], name='cycle_user_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gratitudeentry',
+            index=models.Index(fields=['user', '-date', '-id'], name='gratitude_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='promptanswer',
+            index=models.Index(fields=['user', '-date', '-id'], name='promptanswer_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='selfcareentry',
+            index=models.Index(fields=['user', '-date', '-id'], name='selfcare_user_date_idx'),
+        ),
+    ]
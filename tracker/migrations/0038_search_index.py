@@ -0,0 +1,41 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+# Kept in sync with tracker.search.SQLiteFTSBackend; the porter stemmer lets
+# "cramps" find "cramp" and "tired" find "tiring".
+CREATE_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS tracker_search USING fts5(
+    owner, title, body,
+    category UNINDEXED, object_id UNINDEXED, date UNINDEXED,
+    tokenize = 'porter unicode61 remove_diacritics 2'
+)
+"""
+
+
+def create_search_table(apps, schema_editor):
+    # FTS5 is SQLite-only and optional; without it search falls back to the database backend
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(CREATE_SQL)
+    except OperationalError:
+        return
+    # Index the existing entries; search switches to this table as soon as it exists
+    from tracker.search import SQLiteFTSBackend
+    SQLiteFTSBackend().rebuild(apps)
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS tracker_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0037_keyset_index_tiebreak'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
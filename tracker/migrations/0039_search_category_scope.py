@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def add_category_tokens(apps, schema_editor):
+    # Documents gain a per-user, per-category owner token (u<id><category>)
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tracker_search'")
+        if cursor.fetchone():
+            # Documents indexed by 0038 already carry both tokens
+            cursor.execute("UPDATE tracker_search SET owner = owner || ' ' || owner || category WHERE owner NOT LIKE '% %'")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0038_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_category_tokens, migrations.RunPython.noop),
+    ]
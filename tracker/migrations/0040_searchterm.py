@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def count_terms(apps, schema_editor):
+    from tracker.autocomplete import rebuild_terms
+    rebuild_terms(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0039_search_category_scope'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100)),
+                ('display', models.CharField(max_length=100)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'term'), name='searchterm_user_term_uniq')],
+            },
+        ),
+        migrations.RunPython(count_terms, migrations.RunPython.noop),
+    ]
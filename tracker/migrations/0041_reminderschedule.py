@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_schedules(apps, schema_editor):
+    from tracker.predictions import refresh_predictions
+    from tracker.reminders import rebuild_schedules
+    # Period reminders follow the forecast, which is otherwise only stored on a user's first visit
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    missing = list(User.objects.filter(prediction__isnull=True).order_by('id').values_list('id', flat=True))
+    for i in range(0, len(missing), 1000):
+        refresh_predictions(missing[i:i + 1000], apps=apps)
+    rebuild_schedules(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0040_searchterm'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReminderSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('pill', 'Pill'), ('period', 'Period ahead')], max_length=10)),
+                ('next_due_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminder_schedules', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['next_due_at'], name='reminder_due_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'kind'), name='reminder_user_kind_uniq')],
+            },
+        ),
+        migrations.RunPython(build_schedules, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:10
+
+from django.db import migrations, models
+
+
+def fill_author_names(apps, schema_editor):
+    CommunityComment = apps.get_model('tracker', 'CommunityComment')
+    batch = []
+    for comment in CommunityComment.objects.select_related('user').iterator(chunk_size=500):
+        if comment.is_anonymous:
+            comment.author_name = "Anonymous"
+        elif comment.name:
+            comment.author_name = comment.name
+        elif comment.user:
+            full_name = f"{comment.user.first_name} {comment.user.last_name}".strip()
+            comment.author_name = full_name or comment.user.username
+        else:
+            comment.author_name = "Community member"
+        batch.append(comment)
+        if len(batch) >= 500:
+            CommunityComment.objects.bulk_update(batch, ['author_name'])
+            batch = []
+    CommunityComment.objects.bulk_update(batch, ['author_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0042_outboundemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='communitycomment',
+            name='author_name',
+            field=models.CharField(blank=True, editable=False, max_length=150),
+        ),
+        migrations.RunPython(fill_author_names, migrations.RunPython.noop),
+    ]
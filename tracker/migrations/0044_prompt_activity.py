@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:06
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_activity(apps, schema_editor):
+    CommunityPrompt = apps.get_model('tracker', 'CommunityPrompt')
+    CommunityComment = apps.get_model('tracker', 'CommunityComment')
+    comments = CommunityComment.objects.filter(prompt=OuterRef('pk')).order_by()
+    CommunityPrompt.objects.update(
+        comment_count=Coalesce(Subquery(comments.values('prompt').annotate(n=Count('*')).values('n')), 0),
+        last_activity_at=Coalesce(Subquery(comments.order_by('-created_at').values('created_at')[:1]), F('created_at')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0043_communitycomment_author_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='communityprompt',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='communityprompt',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.RunPython(count_activity, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='communityprompt',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['-last_activity_at'], name='prompt_public_activity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='communityprompt',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['-comment_count', '-last_activity_at'], name='prompt_public_trending_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_title_keys(apps, schema_editor):
+    CommunityPrompt = apps.get_model('tracker', 'CommunityPrompt')
+    batch = []
+    for prompt in CommunityPrompt.objects.only('id', 'title').iterator(chunk_size=500):
+        prompt.title_key = ' '.join(prompt.title.casefold().split())
+        batch.append(prompt)
+        if len(batch) >= 500:
+            CommunityPrompt.objects.bulk_update(batch, ['title_key'])
+            batch = []
+    CommunityPrompt.objects.bulk_update(batch, ['title_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0044_prompt_activity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='communityprompt',
+            name='title_key',
+            field=models.CharField(blank=True, editable=False, max_length=200),
+        ),
+        migrations.RunPython(fill_title_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='communityprompt',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['title_key', 'id'], name='prompt_public_title_idx'),
+        ),
+    ]
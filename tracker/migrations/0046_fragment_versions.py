@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0045_communityprompt_title_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FragmentVersion',
+            fields=[
+                ('scope', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='communityprompt',
+            name='fragment_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
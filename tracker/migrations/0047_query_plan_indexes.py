@@ -0,0 +1,44 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_cycle_owners(apps, schema_editor):
+    FlowDay = apps.get_model('tracker', 'FlowDay')
+    Cycle = apps.get_model('tracker', 'Cycle')
+    FlowDay.objects.update(user=Subquery(Cycle.objects.filter(pk=OuterRef('cycle_id')).values('user_id')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0046_fragment_versions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flowday',
+            name='user',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(copy_cycle_owners, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='flowday',
+            name='user',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='flowday',
+            index=models.Index(fields=['user', '-date', '-id'], name='flowday_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='symptom',
+            index=models.Index(fields=['profile', 'mood', 'date'], name='symptom_profile_mood_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='craving',
+            index=models.Index(fields=['profile', 'craving_type', 'date'], name='craving_profile_type_idx'),
+        ),
+    ]
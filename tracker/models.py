@@ -1,8 +1,10 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from datetime import timedelta
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.utils.text import Truncator
 
 # Profile
 class Profile(models.Model):
@@ -45,6 +47,9 @@ class Profile(models.Model):
     last_reminder_sent = models.DateField(null=True, blank=True)
     email_reminders_enabled = models.BooleanField(default=True)
     last_reminder_sent = models.DateField(null=True, blank=True)
+    # Bumped whenever the user's tracked data changes; keys the dashboard cache and JSON ETags
+    data_version = models.PositiveIntegerField(default=0, editable=False)
+    data_changed_at = models.DateTimeField(blank=True, null=True, editable=False)
 
     def __str__(self):
         return self.user.username
@@ -61,6 +66,13 @@ class Cycle(models.Model):
     ])
     flow_type = models.CharField(max_length=20, blank=True)
     notes = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-start_date', '-id'], name='cycle_user_start_idx'),
+            models.Index(fields=['user', 'updated_at'], name='cycle_user_updated_idx'),
+        ]
 
     def duration(self):
         if self.start_date and self.end_date:
@@ -74,17 +86,139 @@ class Cycle(models.Model):
 
     def __str__(self):
         return f"{self.user.username} - {self.start_date} to {self.end_date}"
-    
+
+# Cycle statistics (one row per user, refreshed whenever a Cycle is written)
+class CycleStats(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cycle_stats')
+    cycle_count = models.PositiveIntegerField(default=0)
+    avg_cycle_length = models.IntegerField(blank=True, null=True)  # start-to-start days
+    cycle_length_std = models.FloatField(blank=True, null=True)
+    avg_period_length = models.IntegerField(blank=True, null=True)  # start-to-end days
+    most_common_flow = models.CharField(max_length=20, default="Unknown")
+    irregular_count = models.PositiveIntegerField(default=0)
+    trend_slope = models.FloatField(blank=True, null=True)
+    trend = models.CharField(max_length=20, default="Stable")
+    last_start_date = models.DateField(blank=True, null=True)
+    last_end_date = models.DateField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Cycle stats - {self.user.username}"
+
+# Next-period forecast (one row per user, recomputed nightly and on cycle/profile changes)
+class Prediction(models.Model):
+    SOURCE_CHOICES = [('cycles', 'Logged cycles'), ('profile', 'Profile'), ('default', 'Default')]
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='prediction')
+    current_cycle_start = models.DateField(blank=True, null=True)
+    cycle_length = models.PositiveIntegerField(default=28)
+    next_period_start = models.DateField(blank=True, null=True, db_index=True)
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES, default='default')
+    computed_on = models.DateField()
+
+    def cycle_start_on(self, day):
+        """Return the predicted start of the cycle containing ``day``, rolling forward whole cycles."""
+        start = self.current_cycle_start
+        if start and self.cycle_length and start < day:
+            start += timedelta(days=((day - start).days // self.cycle_length) * self.cycle_length)
+        return start
+
+    def next_start_after(self, day):
+        start = self.cycle_start_on(day)
+        return start + timedelta(days=self.cycle_length) if start else None
+
+    def phase_on(self, day):
+        """Return the predicted cycle phase on ``day``, or None without a known cycle start."""
+        start = self.cycle_start_on(day)
+        if not start:
+            return None
+        days_since_start = (day - start).days
+        if days_since_start < 0:
+            return "Between cycles"
+        elif days_since_start <= 5:
+            return "Menstrual"
+        elif days_since_start <= 13:
+            return "Follicular"
+        elif days_since_start <= 15:
+            return "Ovulation"
+        elif days_since_start <= self.cycle_length:
+            return "Luteal"
+        return "Between cycles"
+
+    def __str__(self):
+        return f"Prediction - {self.user.username} ({self.next_period_start})"
+
+# Next due time of each enabled email reminder (kept current by signals, advanced by send_reminders)
+class ReminderSchedule(models.Model):
+    KIND_CHOICES = [('pill', 'Pill'), ('period', 'Period ahead')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reminder_schedules')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    next_due_at = models.DateTimeField()  # UTC
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'kind'], name='reminder_user_kind_uniq')]
+        indexes = [models.Index(fields=['next_due_at'], name='reminder_due_idx')]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} reminder - {self.user.username} ({self.next_due_at:%Y-%m-%d %H:%M})"
+
+# Email outbox: producers enqueue rows, the send_outbox worker delivers them
+class OutboundEmail(models.Model):
+    PENDING, SENDING, SENT, FAILED = 'pending', 'sending', 'sent', 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (SENDING, 'Sending'), (SENT, 'Sent'), (FAILED, 'Failed')]
+
+    # e.g. "period:<user id>:<date>"; a second enqueue with the same key is ignored
+    idempotency_key = models.CharField(max_length=100, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        # Only undelivered rows are ever polled, so the index stays as small as the backlog
+        indexes = [
+            models.Index(fields=['next_attempt_at'], condition=models.Q(status='pending'), name='outbox_pending_due_idx'),
+            models.Index(fields=['claimed_at'], condition=models.Q(status='sending'), name='outbox_sending_claimed_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to_email} ({self.status})"
+
 # FlowDay
 class FlowDay(models.Model):
     cycle = models.ForeignKey(Cycle, on_delete=models.CASCADE, related_name='flow_days')
+    # The cycle's owner, copied on save so a user's flow days can be read in date order from one index
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', editable=False)
     date = models.DateField()
     intensity = models.CharField(
         max_length=10,
         choices=[('Light', 'Light'), ('Medium', 'Medium'), ('Heavy', 'Heavy')])
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['cycle', 'date'], name='flowday_cycle_date_idx'),
+            models.Index(fields=['cycle', 'updated_at'], name='flowday_cycle_updated_idx'),
+            models.Index(fields=['user', '-date', '-id'], name='flowday_user_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.date} - {self.intensity}"
+
+    def save(self, *args, **kwargs):
+        self.user_id = self.cycle.user_id
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'cycle' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'user'}
+        super().save(*args, **kwargs)
     
 
 class Symptom(models.Model):
@@ -94,6 +228,13 @@ class Symptom(models.Model):
     cramps = models.BooleanField(default=False)
     notes = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['profile', 'date'], name='symptom_profile_date_idx'),
+            # Serves the mood counts' GROUP BY and each mood's earliest row
+            models.Index(fields=['profile', 'mood', 'date'], name='symptom_profile_mood_idx'),
+        ]
+
     def __str__(self):
         return f"{self.date} - {self.mood}"
 
@@ -113,10 +254,22 @@ class Craving(models.Model):
     )
     notes = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['profile', 'date'], name='craving_profile_date_idx'),
+            models.Index(fields=['profile', 'craving_type', 'date'], name='craving_profile_type_idx'),
+        ]
+
     def __str__(self):
         return f"{self.date} - {self.craving_type}"
     
 # Diary
+EXCERPT_LENGTH = 140
+
+def make_excerpt(text, length=EXCERPT_LENGTH):
+    """Collapse whitespace and truncate ``text`` to at most ``length`` characters."""
+    return Truncator(' '.join((text or '').split())).chars(length)
+
 class DiaryEntry(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     title = models.CharField(max_length=100, default="Untitled Entry")
@@ -127,16 +280,63 @@ class DiaryEntry(models.Model):
     short_term = models.TextField(blank=True, null=True)
     medium_term = models.TextField(blank=True, null=True)
     long_term = models.TextField(blank=True, null=True)
+    # Short plain preview of content, kept in sync on save so list views never load content
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date'], name='diary_user_date_idx'),
+            models.Index(fields=['user', 'updated_at'], name='diary_user_updated_idx'),
+        ]
 
     def __str__(self):
         return f"Diary - {self.user.username} ({self.date})"
 
+    def save(self, *args, **kwargs):
+        self.excerpt = make_excerpt(self.content)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'content' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'excerpt'}
+        super().save(*args, **kwargs)
+
+# Tombstone left behind when a synced row is deleted (read by the ?since= delta endpoints)
+class Tombstone(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    model_name = models.CharField(max_length=30)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'model_name', 'deleted_at'], name='tombstone_user_model_idx')]
+
+    def __str__(self):
+        return f"Deleted {self.model_name} #{self.object_id} ({self.deleted_at:%Y-%m-%d %H:%M})"
+
+# Autocomplete vocabulary: one row per distinct term a user has written (kept current by signals)
+class SearchTerm(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='search_terms')
+    term = models.CharField(max_length=100)  # normalised (lowercase) lookup key
+    display = models.CharField(max_length=100)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # Also serves the (user, term >= prefix) range scans behind autocomplete
+        constraints = [models.UniqueConstraint(fields=['user', 'term'], name='searchterm_user_term_uniq')]
+
+    def __str__(self):
+        return f"{self.display} ({self.count})"
+
 # Prompt and Answer
 class PromptAnswer(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     prompt = models.CharField(max_length=255)
     answer = models.TextField()
     date = models.DateField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', '-date', '-id'], name='promptanswer_user_date_idx')]
+
     def __str__(self):
         return f"Prompt - {self.user.username} ({self.date})"
 
@@ -145,6 +345,10 @@ class GratitudeEntry(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     content = models.TextField()
     date = models.DateField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', '-date', '-id'], name='gratitude_user_date_idx')]
+
     def __str__(self):
         return f"Gratitude - {self.user.username} ({self.date})"
 
@@ -172,6 +376,9 @@ class SelfCareEntry(models.Model):
     steps = models.PositiveIntegerField(blank=True, null=True)  # <-- FIXED
     notes = models.TextField(blank=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['user', '-date', '-id'], name='selfcare_user_date_idx')]
+
     def __str__(self):
         return f"Self-Care ({self.date}) - {self.user.username}"
     
@@ -179,42 +386,104 @@ class SelfCareEntry(models.Model):
 
 User = get_user_model()
 
+def make_title_key(title):
+    """Lower-case ``title`` and collapse its whitespace, for prefix search."""
+    return ' '.join((title or '').casefold().split())
+
 class CommunityPrompt(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
     title = models.CharField(max_length=200)
     content = models.TextField(blank=True)
     is_public = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Kept current by signals as comments are posted and deleted (see tracker.community)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    last_activity_at = models.DateTimeField(default=timezone.now, editable=False)
+    # Normalised title, matched by prefix in the prompt directory
+    title_key = models.CharField(max_length=200, blank=True, editable=False)
+    # Version of this prompt's cached fragments (see tracker.fragments); every save bumps it
+    fragment_version = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        # Partial indexes: SQLite renders is_public=True as a bare column test, which
+        # only a matching partial index (not a leading is_public column) can serve
+        indexes = [
+            models.Index(fields=['-created_at'], condition=models.Q(is_public=True), name='prompt_public_created_idx'),
+            models.Index(fields=['-last_activity_at'], condition=models.Q(is_public=True), name='prompt_public_activity_idx'),
+            models.Index(fields=['-comment_count', '-last_activity_at'], condition=models.Q(is_public=True),
+                         name='prompt_public_trending_idx'),
+            models.Index(fields=['title_key', 'id'], condition=models.Q(is_public=True), name='prompt_public_title_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.title_key = make_title_key(self.title)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'title' in update_fields:
+            kwargs['update_fields'] = update_fields = {*update_fields, 'title_key'}
+        if not self._state.adding:
+            # Bumped in the same UPDATE, so a stale instance can never write an old version back
+            self.fragment_version = models.F('fragment_version') + 1
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'fragment_version'}
+        super().save(*args, **kwargs)
+        # Unloaded again: read from the database if asked for, and left out of the next save's fields
+        self.__dict__.pop('fragment_version', None)
+
+# Versions of the shared community fragment scopes ``comments`` and ``prompts``
+# (each prompt's own scope is versioned on the prompt row)
+class FragmentVersion(models.Model):
+    scope = models.CharField(max_length=20, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.scope} v{self.version}"
+
 class CommunityComment(models.Model):
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     prompt = models.ForeignKey(CommunityPrompt, on_delete=models.CASCADE, null=True, blank=True, related_name='comments')
     name = models.CharField(max_length=150, blank=True)
     content = models.TextField()
     is_anonymous = models.BooleanField(default=False)
+    # Resolved display name, stored on save so comment feeds never load the author
+    author_name = models.CharField(max_length=150, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
-    @property
-    def display_name(self):
+    class Meta:
+        indexes = [models.Index(fields=['prompt', '-created_at', '-id'], name='comment_prompt_created_idx')]
+
+    def resolve_author_name(self):
         if self.is_anonymous:
             return "Anonymous"
         if self.name:
             return self.name
-        if self.user:
+        if self.user_id:
             return self.user.get_full_name() or self.user.username
         return "Community member"
 
+    @property
+    def display_name(self):
+        return self.author_name or self.resolve_author_name()
+
     def can_edit(self, user):
         if user.is_staff:
             return True
-        if not self.user:
+        if not self.user_id:
             return False
         if self.is_anonymous:
             return False
-        return self.user == user
+        return self.user_id == user.pk
+
+    def save(self, *args, **kwargs):
+        self.author_name = self.resolve_author_name()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'name', 'is_anonymous', 'user'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'author_name'}
+        # The prompt's activity counters are updated by a post_save receiver; commit both or neither
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Comment by {self.display_name} on {self.created_at.strftime('%Y-%m-%d %H:%M')}"
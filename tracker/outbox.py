@@ -0,0 +1,186 @@
+"""Database-backed email outbox.
+
+Code that wants to send mail builds unsaved ``OutboundEmail`` rows and calls
+``enqueue``; nothing talks to the mail server inside a request or a reminder run.
+The ``send_outbox`` worker claims due rows in batches and sends each batch from a
+thread pool, one mail connection per thread, then records every outcome with a
+single bulk update. A failed message is retried with exponential backoff until
+``MAX_ATTEMPTS``.
+
+Each row carries an idempotency key, and enqueueing a key that already exists does
+nothing, so re-running a producer never mails anyone twice. Delivery itself is at
+least once: a worker killed between sending and recording leaves its claim to
+expire after ``CLAIM_TIMEOUT``, and those messages go out again.
+"""
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import BigIntegerField
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import OutboundEmail
+from .sharding import filter_shard
+
+BATCH_SIZE = 200
+THREADS = 8
+MAX_ATTEMPTS = 6
+RETRY_BASE_DELAY = timedelta(minutes=1)
+RETRY_MAX_DELAY = timedelta(hours=6)
+# A claim older than this belongs to a worker that died mid-batch
+CLAIM_TIMEOUT = timedelta(minutes=15)
+# Keys per IN (...) lookup, well under SQLite's bound-parameter limit
+KEY_CHUNK_SIZE = 500
+
+BatchReport = namedtuple('BatchReport', 'claimed sent retrying failed elapsed rate')
+
+RESULT_FIELDS = ['status', 'attempts', 'next_attempt_at', 'claimed_at', 'last_error', 'sent_at']
+
+
+def enqueue(emails):
+    """Save unsaved OutboundEmail rows, skipping keys already queued. Returns the number added."""
+    new = {}
+    for email in emails:
+        new.setdefault(email.idempotency_key, email)
+    keys = list(new)
+    for i in range(0, len(keys), KEY_CHUNK_SIZE):
+        queued = OutboundEmail.objects.filter(idempotency_key__in=keys[i:i + KEY_CHUNK_SIZE])
+        for key in queued.values_list('idempotency_key', flat=True):
+            del new[key]
+    # ignore_conflicts covers a concurrent producer inserting the same key in between
+    OutboundEmail.objects.bulk_create(new.values(), batch_size=KEY_CHUNK_SIZE, ignore_conflicts=True)
+    return len(new)
+
+
+def retry_delay(attempts):
+    """Backoff before retry number ``attempts``: 1, 2, 4, 8... minutes, capped."""
+    return min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+
+
+def release_stale_claims(now=None):
+    now = now or timezone.now()
+    return (
+        OutboundEmail.objects.filter(status=OutboundEmail.SENDING, claimed_at__lt=now - CLAIM_TIMEOUT)
+        .update(status=OutboundEmail.PENDING, claimed_at=None, next_attempt_at=now)
+    )
+
+
+def claim_batch(limit=BATCH_SIZE, now=None, shard=None):
+    """Mark up to ``limit`` due rows (in ``shard``, if given) as sending and return them."""
+    now = now or timezone.now()
+    due = OutboundEmail.objects.filter(status=OutboundEmail.PENDING, next_attempt_at__lte=now)
+    ids = list(
+        # Mail not tied to a user is spread over the shards by its own id
+        filter_shard(due, shard, Coalesce('user_id', 'id', output_field=BigIntegerField()))
+        .order_by('next_attempt_at').values_list('id', flat=True)[:limit]
+    )
+    if not ids:
+        return []
+    # The status check makes the claim exclusive; the claim time tells this worker's rows apart
+    OutboundEmail.objects.filter(pk__in=ids, status=OutboundEmail.PENDING).update(
+        status=OutboundEmail.SENDING, claimed_at=now,
+    )
+    return list(OutboundEmail.objects.filter(pk__in=ids, status=OutboundEmail.SENDING, claimed_at=now))
+
+
+def _message(email):
+    return EmailMessage(subject=email.subject, body=email.body, to=[email.to_email])
+
+
+def _send_slice(emails, make_connection):
+    """Send ``emails`` over one connection. Returns {id: error message, or None if sent}."""
+    results = {}
+    try:
+        with make_connection() as connection:
+            for email in emails:
+                try:
+                    connection.send_messages([_message(email)])
+                    results[email.pk] = None
+                except Exception as exc:
+                    results[email.pk] = f'{type(exc).__name__}: {exc}'
+    except Exception as exc:
+        # Could not connect (or the close failed): everything not yet sent is retried
+        for email in emails:
+            results.setdefault(email.pk, f'{type(exc).__name__}: {exc}')
+    return results
+
+
+def deliver(emails, threads=THREADS, make_connection=get_connection):
+    """Send ``emails`` from up to ``threads`` threads. Returns {id: error or None}.
+
+    Threads only talk to the mail server; all database work stays on the caller's thread.
+    """
+    slices = [emails[i::threads] for i in range(min(threads, len(emails)))]
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(len(slices), 1)) as pool:
+        for part in pool.map(lambda part: _send_slice(part, make_connection), slices):
+            results.update(part)
+    return results
+
+
+def record_results(emails, results, now=None):
+    """Store send outcomes: sent, back to pending with a backoff delay, or failed for good."""
+    now = now or timezone.now()
+    sent, unsent = [], []
+    for email in emails:
+        error = results.get(email.pk, 'Not sent')
+        email.claimed_at = None
+        if error is None:
+            email.status, email.sent_at, email.last_error = OutboundEmail.SENT, now, ''
+            sent.append(email)
+            continue
+        email.attempts += 1
+        email.last_error = error[:1000]
+        if email.attempts >= MAX_ATTEMPTS:
+            email.status = OutboundEmail.FAILED
+        else:
+            email.status, email.next_attempt_at = OutboundEmail.PENDING, now + retry_delay(email.attempts)
+        unsent.append(email)
+    with transaction.atomic():
+        # Sent rows all get the same values: one plain UPDATE instead of a CASE per row and field
+        OutboundEmail.objects.filter(pk__in=[email.pk for email in sent]).update(
+            status=OutboundEmail.SENT, sent_at=now, claimed_at=None, last_error='',
+        )
+        OutboundEmail.objects.bulk_update(unsent, RESULT_FIELDS, batch_size=KEY_CHUNK_SIZE)
+
+
+def process_batch(batch_size=BATCH_SIZE, threads=THREADS, make_connection=get_connection, shard=None):
+    """Claim, send and record one batch. Returns a BatchReport, or None when nothing is due."""
+    started = time.perf_counter()
+    emails = claim_batch(batch_size, shard=shard)
+    if not emails:
+        return None
+    results = deliver(emails, threads, make_connection)
+    record_results(emails, results)
+
+    statuses = [email.status for email in emails]
+    sent = statuses.count(OutboundEmail.SENT)
+    elapsed = time.perf_counter() - started
+    return BatchReport(len(emails), sent, statuses.count(OutboundEmail.PENDING), statuses.count(OutboundEmail.FAILED),
+                       elapsed, sent / elapsed if elapsed else 0.0)
+
+
+def drain(batch_size=BATCH_SIZE, threads=THREADS, make_connection=get_connection, shard=None):
+    """Process batches until nothing is due, yielding a BatchReport for each."""
+    release_stale_claims()
+    while True:
+        report = process_batch(batch_size, threads, make_connection, shard)
+        if report is None:
+            return
+        yield report
+
+
+def drain_batches(batch_size=BATCH_SIZE, threads=THREADS, shard=None):
+    """``drain`` as a list, for running in a worker process."""
+    return list(drain(batch_size, threads, shard=shard))
+
+
+def merge_reports(reports, elapsed):
+    """Combine BatchReports into one, with the rate over ``elapsed`` wall-clock seconds."""
+    sent = sum(r.sent for r in reports)
+    return BatchReport(sum(r.claimed for r in reports), sent, sum(r.retrying for r in reports),
+                       sum(r.failed for r in reports), elapsed, sent / elapsed if elapsed else 0.0)
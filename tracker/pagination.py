@@ -0,0 +1,150 @@
+import base64
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """Keep full microsecond precision; DjangoJSONEncoder rounds datetimes to milliseconds."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(direction, values):
+    """Pack a page boundary into an opaque, URL-safe token."""
+    raw = json.dumps([direction, list(values)], cls=CursorEncoder)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Unpack a cursor token; returns (direction, values) or None if it is malformed."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, values = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    if direction not in ('next', 'prev') or not isinstance(values, list):
+        return None
+    return direction, values
+
+
+class KeysetPage:
+    """One page of a keyset-paginated queryset. Iterable like a Paginator page."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Seek-method pagination over a queryset ordered by unique ``ordering`` fields.
+
+    Unlike ``django.core.paginator.Paginator`` it never runs COUNT(*) or OFFSET, so a
+    deep page costs the same as the first one. ``ordering`` must end in a unique
+    field (normally ``id``) and must not contain NULLs.
+    """
+
+    def __init__(self, queryset, ordering=('-date', '-id'), per_page=10):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.fields = [f.lstrip('-') for f in self.ordering]
+        self.per_page = per_page
+
+    def _boundary(self, values, forward):
+        """Build a filter selecting rows strictly after (or before) ``values`` in page order."""
+        condition = Q()
+        for i, field in enumerate(self.ordering):
+            descending = field.startswith('-')
+            lookup = 'lt' if descending == forward else 'gt'
+            name = self.fields[i]
+            step = Q(**{f'{name}__{lookup}': values[i]})
+            for prev_name, prev_value in zip(self.fields[:i], values[:i]):
+                step &= Q(**{prev_name: prev_value})
+            condition |= step
+        return condition
+
+    def _values(self, obj):
+        if isinstance(obj, dict):
+            return [obj[name] for name in self.fields]
+        return [getattr(obj, name) for name in self.fields]
+
+    def cursor_after(self, obj):
+        """Return a cursor for the rows that follow ``obj`` in page order."""
+        return encode_cursor('next', self._values(obj))
+
+    def _decode(self, cursor):
+        decoded = decode_cursor(cursor)
+        return decoded if decoded and len(decoded[1]) == len(self.fields) else None
+
+    def page(self, cursor=None):
+        """Return the page after/before the position encoded in ``cursor`` (first page if None or invalid)."""
+        decoded = self._decode(cursor)
+        try:
+            return self._page(decoded)
+        except (ValidationError, ValueError, TypeError):
+            # Cursor values that do not fit the ordering fields
+            return self._page(None)
+
+    def clean_cursor(self, cursor):
+        """Return ``cursor`` in canonical form, or None if ``page`` would treat it as the first page."""
+        decoded = self._decode(cursor)
+        if decoded is None:
+            return None
+        try:
+            # Filtering converts the cursor values, so bad ones fail here without a query
+            self._queryset(decoded)
+        except (ValidationError, ValueError, TypeError):
+            return None
+        return encode_cursor(*decoded)
+
+    def page_queryset(self, cursor=None):
+        """Return the queryset ``page(cursor)`` runs, e.g. to inspect its query plan."""
+        return self._queryset(self._decode(cursor))
+
+    def _queryset(self, decoded):
+        if decoded and decoded[0] == 'prev':
+            reverse = tuple(f[1:] if f.startswith('-') else f'-{f}' for f in self.ordering)
+            return self.queryset.filter(self._boundary(decoded[1], forward=False)).order_by(*reverse)[:self.per_page + 1]
+        queryset = self.queryset.order_by(*self.ordering)
+        if decoded:
+            queryset = queryset.filter(self._boundary(decoded[1], forward=True))
+        return queryset[:self.per_page + 1]
+
+    def _page(self, decoded):
+        rows = list(self._queryset(decoded))
+        if decoded and decoded[0] == 'prev':
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next = True
+        else:
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_previous = decoded is not None
+
+        next_cursor = self.cursor_after(rows[-1]) if has_next and rows else None
+        previous_cursor = encode_cursor('prev', self._values(rows[0])) if has_previous and rows else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
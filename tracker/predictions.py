@@ -0,0 +1,110 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .analytics import load_cycle_arrays, summarize_cycles
+from .models import CycleStats, Prediction, Profile
+
+DEFAULT_CYCLE_LENGTH = 28
+PREDICTION_FIELDS = ['current_cycle_start', 'cycle_length', 'next_period_start', 'source', 'computed_on']
+# Fields whose change can move a reminder; computed_on changes on every run
+FORECAST_FIELDS = PREDICTION_FIELDS[:-1]
+
+# Care tips per predicted phase
+PHASE_CARE_TIPS = {
+    "Menstrual": "Rest, nourish your body, and prioritize gentle self-care.",
+    "Follicular": "Plan, create, and enjoy rising energy.",
+    "Ovulation": "Connect, collaborate, and embrace confidence.",
+    "Luteal": "Slow down, reflect, and support your emotional needs.",
+    "Between cycles": "Track your next cycle start to stay in sync.",
+}
+
+
+def forecast(avg_cycle_length, last_cycle_start, profile_period_start, profile_cycle_length, today):
+    """Return Prediction field values from logged-cycle stats and the profile's own dates.
+
+    Logged cycles win over the profile; the profile wins over the 28-day default.
+    """
+    if avg_cycle_length:
+        cycle_length, source = avg_cycle_length, 'cycles'
+    elif profile_cycle_length:
+        cycle_length, source = profile_cycle_length, 'profile'
+    else:
+        cycle_length, source = DEFAULT_CYCLE_LENGTH, 'default'
+
+    starts = [d for d in (last_cycle_start, profile_period_start) if d]
+    prediction = Prediction(current_cycle_start=max(starts) if starts else None, cycle_length=cycle_length)
+    current_start = prediction.cycle_start_on(today)
+    return {
+        'current_cycle_start': current_start,
+        'cycle_length': cycle_length,
+        'next_period_start': current_start + timedelta(days=cycle_length) if current_start else None,
+        'source': source,
+        'computed_on': today,
+    }
+
+
+def refresh_prediction(user_id, today=None):
+    """Recompute and store one user's prediction from their CycleStats and profile."""
+    today = today or timezone.localdate()
+    stats = CycleStats.objects.filter(user_id=user_id).values('avg_cycle_length', 'last_start_date').first() or {}
+    profile = Profile.objects.filter(user_id=user_id).values('last_period_start', 'cycle_length').first() or {}
+    values = forecast(
+        stats.get('avg_cycle_length'), stats.get('last_start_date'),
+        profile.get('last_period_start'), profile.get('cycle_length'), today,
+    )
+    prediction, _ = Prediction.objects.update_or_create(user_id=user_id, defaults=values)
+    return prediction
+
+
+def refresh_predictions(user_ids, today=None, apps=None):
+    """Recompute predictions for a batch of users with one cycle query and bulk writes.
+
+    Cycle statistics come straight from the vectorised batch analytics rather than
+    CycleStats, so the nightly run also corrects any stale stats-derived forecasts.
+    ``bulk_update`` sends no post_save, so reminders are rescheduled here for every
+    user whose forecast changed. With a migration's ``apps`` the historical models
+    are used and reminders are left to the caller.
+    """
+    # reminders imports utils, which imports this module
+    from .reminders import reschedule_users
+
+    today = today or timezone.localdate()
+    user_ids = list(user_ids)
+    profile_model = apps.get_model('tracker', 'Profile') if apps else Profile
+    prediction_model = apps.get_model('tracker', 'Prediction') if apps else Prediction
+    summary = summarize_cycles(*load_cycle_arrays(user_ids, apps))
+    profiles = {
+        p['user_id']: p
+        for p in profile_model.objects.filter(user_id__in=user_ids).values('user_id', 'last_period_start', 'cycle_length')
+    }
+    existing = {p.user_id: p for p in prediction_model.objects.filter(user_id__in=user_ids)}
+
+    to_create, to_update, changed = [], [], []
+    for user_id in user_ids:
+        stats = summary.get(user_id, {})
+        profile = profiles.get(user_id, {})
+        values = forecast(
+            stats.get('avg_cycle_length'), stats.get('last_start_date'),
+            profile.get('last_period_start'), profile.get('cycle_length'), today,
+        )
+        prediction = existing.get(user_id) or prediction_model(user_id=user_id)
+        if prediction.pk is None or any(getattr(prediction, field) != values[field] for field in FORECAST_FIELDS):
+            changed.append(user_id)
+        for field, value in values.items():
+            setattr(prediction, field, value)
+        (to_update if prediction.pk else to_create).append(prediction)
+
+    prediction_model.objects.bulk_create(to_create)
+    prediction_model.objects.bulk_update(to_update, PREDICTION_FIELDS)
+    if changed and not apps:
+        reschedule_users(changed)
+    return len(user_ids)
+
+
+def get_prediction(user):
+    """Return the stored prediction for a user, computing it on first access."""
+    prediction = Prediction.objects.filter(user=user).first()
+    if prediction is None:
+        prediction = refresh_prediction(user.pk)
+    return prediction
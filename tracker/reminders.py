@@ -0,0 +1,183 @@
+"""Email reminders driven by a due-time schedule.
+
+Every enabled reminder has one ``ReminderSchedule`` row holding its next due time
+in UTC. Signals recompute a user's rows when their profile or prediction changes.
+The ``send_reminders`` loop reads only the rows due in the current tick through the
+``next_due_at`` index, queues their emails in the outbox and moves each row on to
+its following due time, so a tick costs the same whether there are ten users or a
+million.
+"""
+import time
+from collections import namedtuple
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail, Prediction, Profile, ReminderSchedule
+from .outbox import enqueue
+from .sharding import filter_shard
+from .utils import period_reminder_message
+
+# Period-ahead reminders go out at this time (UTC) on the reminder day
+PERIOD_REMINDER_TIME = dt_time(9, 0)
+
+# A reminder more than this late (the scheduler was down) is skipped, not sent
+MAX_LATENESS = timedelta(hours=1)
+
+TICK_LIMIT = 1000
+
+TickReport = namedtuple('TickReport', 'due queued skipped elapsed')
+
+
+def _utc_at(day, at):
+    return datetime.combine(day, at.replace(second=0, microsecond=0), tzinfo=dt_timezone.utc)
+
+
+def next_pill_due(profile, after):
+    """Return the first pill reminder time strictly after ``after``, or None."""
+    if not profile.pill_reminder_time:
+        return None
+    due = _utc_at(after.astimezone(dt_timezone.utc).date(), profile.pill_reminder_time)
+    return due if due > after else due + timedelta(days=1)
+
+
+def next_period_due(profile, prediction, after):
+    """Return the first period-ahead reminder time strictly after ``after``, or None."""
+    days_before = profile.period_reminder_days_before
+    if not prediction or not prediction.cycle_length or days_before is None or days_before <= 0:
+        return None
+    # Walk forward from the predicted start of the current cycle
+    start = prediction.cycle_start_on(after.astimezone(dt_timezone.utc).date())
+    if not start:
+        return None
+    lead = timedelta(days=days_before)
+    while _utc_at(start - lead, PERIOD_REMINDER_TIME) <= after:
+        start += timedelta(days=prediction.cycle_length)
+    return _utc_at(start - lead, PERIOD_REMINDER_TIME)
+
+
+def next_due(kind, profile, prediction, after):
+    if not profile.email_reminders_enabled:
+        return None
+    if kind == 'pill':
+        return next_pill_due(profile, after)
+    return next_period_due(profile, prediction, after)
+
+
+def _due_times(profile, prediction, now):
+    due = {kind: next_due(kind, profile, prediction, now) for kind, _ in ReminderSchedule.KIND_CHOICES}
+    return {kind: due_at for kind, due_at in due.items() if due_at}
+
+
+def schedule_reminders(user_id, now=None):
+    """Recompute one user's ReminderSchedule rows from their profile and prediction."""
+    now = now or timezone.now()
+    profile = Profile.objects.filter(user_id=user_id).select_related('user__prediction').first()
+    wanted = _due_times(profile, getattr(profile.user, 'prediction', None), now) if profile else {}
+    ReminderSchedule.objects.filter(user_id=user_id).exclude(kind__in=wanted).delete()
+    for kind, due_at in wanted.items():
+        ReminderSchedule.objects.update_or_create(user_id=user_id, kind=kind, defaults={'next_due_at': due_at})
+
+
+def _schedule_rows(profiles, now, batch_size, schedule_model=ReminderSchedule):
+    rows = []
+    for profile in profiles.select_related('user__prediction').order_by('id').iterator(chunk_size=batch_size):
+        prediction = getattr(profile.user, 'prediction', None)
+        if prediction is not None and not isinstance(prediction, Prediction):
+            # A migration's historical model, which has none of the date methods
+            prediction = Prediction(current_cycle_start=prediction.current_cycle_start, cycle_length=prediction.cycle_length)
+        for kind, due_at in _due_times(profile, prediction, now).items():
+            rows.append(schedule_model(user_id=profile.user_id, kind=kind, next_due_at=due_at))
+    return rows
+
+
+def reschedule_users(user_ids, now=None, batch_size=2000):
+    """``schedule_reminders`` for many users in three queries. Returns the number of rows stored."""
+    now = now or timezone.now()
+    user_ids = list(user_ids)
+    rows = _schedule_rows(Profile.objects.filter(user_id__in=user_ids), now, batch_size)
+    with transaction.atomic():
+        ReminderSchedule.objects.filter(user_id__in=user_ids).delete()
+        ReminderSchedule.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def rebuild_schedules(now=None, batch_size=2000, apps=None):
+    """Recompute every user's schedule from scratch. Returns the number of rows stored.
+
+    Pass a migration's ``apps`` to use its historical models.
+    """
+    now = now or timezone.now()
+    profile_model = apps.get_model('tracker', 'Profile') if apps else Profile
+    schedule_model = apps.get_model('tracker', 'ReminderSchedule') if apps else ReminderSchedule
+    rows = _schedule_rows(profile_model.objects.all(), now, batch_size, schedule_model)
+    with transaction.atomic():
+        schedule_model.objects.all().delete()
+        schedule_model.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def pill_reminder_message(profile, due_at):
+    return OutboundEmail(
+        idempotency_key=f"pill:{profile.user_id}:{due_at:%Y-%m-%dT%H:%M}",
+        user_id=profile.user_id,
+        to_email=profile.user.email,
+        subject="💊 Pill Reminder",
+        body=f"Hi {profile.name or profile.user.username}, this is your gentle reminder to take your pill today 💜",
+    )
+
+
+def _should_send(row, profile, prediction, now):
+    if not row.user.email or now - row.next_due_at > MAX_LATENESS:
+        return False
+    # Already queued today by send_period_reminders
+    if row.kind == 'period' and profile.last_reminder_sent == row.next_due_at.date():
+        return False
+    # Still due at this time under the current settings and forecast?
+    return next_due(row.kind, profile, prediction, row.next_due_at - timedelta(microseconds=1)) == row.next_due_at
+
+
+def run_due_reminders(now=None, limit=TICK_LIMIT, shard=None):
+    """Queue the reminders due by ``now`` (at most ``limit``, in ``shard`` if given) and advance their schedules.
+
+    Each row is checked against the current profile and prediction before queueing,
+    so a forecast that moved since the row was scheduled is rescheduled instead.
+    """
+    now = now or timezone.now()
+    started = time.perf_counter()
+    due = ReminderSchedule.objects.filter(next_due_at__lte=now)
+    rows = list(
+        filter_shard(due, shard).select_related('user__profile', 'user__prediction')
+        .order_by('next_due_at')[:limit]
+    )
+
+    messages, reminded, advanced, finished = [], [], [], []
+    for row in rows:
+        profile = row.user.profile
+        prediction = getattr(row.user, 'prediction', None)
+        if _should_send(row, profile, prediction, now):
+            messages.append(pill_reminder_message(profile, row.next_due_at) if row.kind == 'pill'
+                            else period_reminder_message(profile, row.next_due_at.date()))
+            if row.kind == 'period':
+                profile.last_reminder_sent = row.next_due_at.date()
+                reminded.append(profile)
+        row.next_due_at = next_due(row.kind, profile, prediction, now)
+        (advanced if row.next_due_at else finished).append(row)
+
+    with transaction.atomic():
+        queued = enqueue(messages)
+        ReminderSchedule.objects.bulk_update(advanced, ['next_due_at'], batch_size=500)
+        ReminderSchedule.objects.filter(pk__in=[row.pk for row in finished]).delete()
+        Profile.objects.bulk_update(reminded, ['last_reminder_sent'], batch_size=500)
+    return TickReport(len(rows), queued, len(rows) - len(messages), time.perf_counter() - started)
+
+
+def drain_due(limit=TICK_LIMIT, shard=None):
+    """Run ticks until fewer than ``limit`` rows were due, so a backlog clears at once. Returns the combined TickReport."""
+    total = TickReport(0, 0, 0, 0.0)
+    while True:
+        report = run_due_reminders(limit=limit, shard=shard)
+        total = TickReport(*(a + b for a, b in zip(total, report)))
+        if report.due < limit:
+            return total
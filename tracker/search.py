@@ -0,0 +1,252 @@
+"""Full-text search over a user's own entries.
+
+Each searchable model is described by a ``SearchSource``. A search backend keeps
+one (title, body) document per source row and answers ranked queries:
+
+* ``SQLiteFTSBackend`` stores documents in an FTS5 virtual table (created and
+  filled by migration 0038) and ranks with bm25, highlighting matches in snippets.
+* ``DatabaseBackend`` needs no index and falls back to ``icontains`` lookups, for
+  databases without FTS5.
+
+Set ``TRACKER_SEARCH_BACKEND`` to a dotted class path to choose one explicitly;
+otherwise FTS5 is used whenever its table exists.
+"""
+import re
+from collections import namedtuple
+from datetime import date
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.module_loading import import_string
+from django.utils.safestring import mark_safe
+from django.utils.text import Truncator
+
+from .models import Craving, Cycle, DiaryEntry, GratitudeEntry, PromptAnswer, SelfCareEntry, Symptom
+
+SearchSource = namedtuple('SearchSource', 'category label model user_field title_fields body_fields date_field')
+# sort_key: JSON-able position of the hit in result order; pass it back as ``after`` for the next page
+SearchHit = namedtuple('SearchHit', 'category object_id title snippet date sort_key')
+
+SEARCH_SOURCES = (
+    SearchSource('diary', 'Diary', DiaryEntry, 'user_id', ('title',), ('content', 'short_term', 'medium_term', 'long_term'), 'date'),
+    SearchSource('prompts', 'Prompt answers', PromptAnswer, 'user_id', ('prompt',), ('answer',), 'date'),
+    SearchSource('gratitude', 'Gratitude', GratitudeEntry, 'user_id', (), ('content',), 'date'),
+    SearchSource('selfcare', 'Self-care', SelfCareEntry, 'user_id', (), ('notes',), 'date'),
+    SearchSource('cycles', 'Cycles', Cycle, 'user_id', ('flow_type',), ('notes',), 'start_date'),
+    SearchSource('symptoms', 'Symptoms', Symptom, 'profile__user_id', ('mood',), ('notes',), 'date'),
+    SearchSource('cravings', 'Cravings', Craving, 'profile__user_id', ('craving_type',), ('notes',), 'date'),
+)
+SOURCES_BY_CATEGORY = {source.category: source for source in SEARCH_SOURCES}
+SOURCES_BY_MODEL = {source.model: source for source in SEARCH_SOURCES}
+
+MAX_QUERY_TERMS = 8
+SNIPPET_WORDS = 16
+TERM_RE = re.compile(r'\w+')
+# Highlight markers; control characters never occur in user text, so escaping stays simple
+MARK_START, MARK_END = '\x02', '\x03'
+
+
+def query_terms(query):
+    """Split a free-text query into lowercase search terms."""
+    return TERM_RE.findall((query or '').lower())[:MAX_QUERY_TERMS]
+
+
+def marked_html(text):
+    """Escape ``text`` and turn highlight markers into <mark> tags."""
+    return mark_safe(escape(text).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+
+def documents(source, queryset=None):
+    """Yield (object_id, user_id, title, body, date) for the rows of ``source``."""
+    queryset = source.model.objects.all() if queryset is None else queryset
+    n_title = len(source.title_fields)
+    fields = ('id', source.user_field, *source.title_fields, *source.body_fields, source.date_field)
+    for row in queryset.values_list(*fields).iterator(chunk_size=1000):
+        title = ' '.join(str(v) for v in row[2:2 + n_title] if v)
+        body = '\n'.join(str(v) for v in row[2 + n_title:-1] if v)
+        yield row[0], row[1], title, body, row[-1]
+
+
+def _hit_title(source, title, day):
+    if title:
+        return title
+    return f"{source.label} ({day})" if day else source.label
+
+
+class SQLiteFTSBackend:
+    """Ranked search over an FTS5 table of (owner, title, body) documents.
+
+    The owner column holds ``u<user id>`` and ``u<user id><category>`` tokens, so a
+    query only walks the posting lists of the requesting user's documents (in one
+    category, if given). Row ids are derived from the source and object id, so
+    updates and deletes are rowid lookups rather than scans.
+    """
+    table = 'tracker_search'
+    batch_size = 1000
+
+    @classmethod
+    def available(cls):
+        if connection.vendor != 'sqlite':
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [cls.table])
+            return cursor.fetchone() is not None
+
+    @staticmethod
+    def rowid(source, object_id):
+        return object_id * len(SEARCH_SOURCES) + SEARCH_SOURCES.index(source)
+
+    def _insert(self, cursor, source, docs):
+        sql = (
+            f"INSERT OR REPLACE INTO {self.table} (rowid, owner, title, body, category, object_id, date) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s)"
+        )
+        count, batch = 0, []
+        for object_id, user_id, title, body, day in docs:
+            owner = f'u{user_id} u{user_id}{source.category}'
+            batch.append((self.rowid(source, object_id), owner, title, body, source.category, object_id,
+                          day.isoformat() if day else None))
+            if len(batch) >= self.batch_size:
+                cursor.executemany(sql, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+            count += len(batch)
+        return count
+
+    def index(self, source, pks):
+        """(Re)index the given rows of ``source``."""
+        with connection.cursor() as cursor:
+            return self._insert(cursor, source, documents(source, source.model.objects.filter(pk__in=pks)))
+
+    def remove(self, source, pks):
+        rowids = [self.rowid(source, pk) for pk in pks]
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid IN ({', '.join(['%s'] * len(rowids))})", rowids)
+
+    def rebuild(self, apps=None):
+        """Drop every document and reindex all sources. Returns the number of documents.
+
+        Pass a migration's ``apps`` to read the entries through its historical models.
+        """
+        count = 0
+        # One transaction: in autocommit mode every inserted row would be its own commit
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            for source in SEARCH_SOURCES:
+                queryset = apps.get_model('tracker', source.model.__name__).objects.all() if apps else None
+                count += self._insert(cursor, source, documents(source, queryset))
+            cursor.execute(f"INSERT INTO {self.table} ({self.table}) VALUES ('optimize')")
+        return count
+
+    def match_expression(self, user, terms, category=None):
+        # Terms are \w+ tokens, so quoting them is enough to neutralise FTS5 syntax;
+        # the last term matches as a prefix so partially typed words still hit.
+        phrases = [f'"{term}"' for term in terms]
+        phrases[-1] += '*'
+        scope = f'u{user.pk}{category}' if category else f'u{user.pk}'
+        return f'owner:"{scope}" AND {{title body}} : ({" AND ".join(phrases)})'
+
+    def search(self, user, query, limit=50, category=None, after=None):
+        """Return up to ``limit`` SearchHits for ``user``, best match first.
+
+        ``category`` restricts hits to one source; ``after`` is the sort_key of the
+        last hit already seen.
+        """
+        terms = query_terms(query)
+        if not terms:
+            return []
+        params = [self.match_expression(user, terms, category)]
+        where = ''
+        if after and len(after) == 2:
+            where = 'WHERE score > %s OR (score = %s AND rowid > %s)'
+            params += [after[0], after[0], after[1]]
+        # bm25 needs the match context, so rank in a subquery and page on (score, rowid)
+        sql = (
+            f"SELECT category, object_id, title, snippet, date, score, rowid FROM ("
+            f"SELECT rowid, category, object_id, date, bm25({self.table}, 0.0, 5.0, 1.0) AS score, "
+            f"highlight({self.table}, 1, char(2), char(3)) AS title, "
+            f"snippet({self.table}, 2, char(2), char(3), '…', {SNIPPET_WORDS}) AS snippet "
+            f"FROM {self.table} WHERE {self.table} MATCH %s"
+            f") {where} ORDER BY score, rowid LIMIT %s"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [*params, limit])
+            rows = cursor.fetchall()
+        hits = []
+        for category, object_id, title, snippet, day, score, rowid in rows:
+            day = date.fromisoformat(day) if day else None
+            hits.append(SearchHit(category, object_id, marked_html(_hit_title(SOURCES_BY_CATEGORY[category], title, day)),
+                                  marked_html(snippet), day, [score, rowid]))
+        return hits
+
+    def count(self, user, query, category=None, cap=1000):
+        """Count matches, stopping at ``cap`` so a common word never counts the whole history."""
+        terms = query_terms(query)
+        if not terms:
+            return 0
+        sql = f"SELECT count(*) FROM (SELECT 1 FROM {self.table} WHERE {self.table} MATCH %s LIMIT %s)"
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [self.match_expression(user, terms, category), cap])
+            return cursor.fetchone()[0]
+
+
+class DatabaseBackend:
+    """Unindexed fallback: icontains lookups per source, most recently created first."""
+
+    def index(self, source, pks):
+        return 0
+
+    def remove(self, source, pks):
+        pass
+
+    def rebuild(self, apps=None):
+        return 0
+
+    def _highlight(self, text, terms):
+        text = Truncator(' '.join(text.split())).words(SNIPPET_WORDS * 2)
+        pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+        return marked_html(pattern.sub(lambda m: f'{MARK_START}{m.group(0)}{MARK_END}', text))
+
+    def _matches(self, source, user, terms):
+        fields = (*source.title_fields, *source.body_fields)
+        condition = Q()
+        for term in terms:
+            condition &= Q(*[Q(**{f'{field}__icontains': term}) for field in fields], _connector=Q.OR)
+        return source.model.objects.filter(condition, **{source.user_field: user.pk})
+
+    def search(self, user, query, limit=50, category=None, after=None):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        sources = [SOURCES_BY_CATEGORY[category]] if category else SEARCH_SOURCES
+        hits = []
+        for source in sources:
+            queryset = self._matches(source, user, terms)
+            if after and len(after) == 1:
+                queryset = queryset.filter(id__lt=after[0])
+            for object_id, _, title, body, day in documents(source, queryset.order_by('-id')[:limit]):
+                hits.append(SearchHit(source.category, object_id,
+                                      self._highlight(_hit_title(source, title, day), terms),
+                                      self._highlight(body, terms), day, [object_id]))
+        return hits[:limit]
+
+    def count(self, user, query, category=None, cap=1000):
+        terms = query_terms(query)
+        if not terms:
+            return 0
+        sources = [SOURCES_BY_CATEGORY[category]] if category else SEARCH_SOURCES
+        return min(cap, sum(self._matches(source, user, terms)[:cap].count() for source in sources))
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    """Return the configured search backend (cached; call ``get_backend.cache_clear()`` to re-resolve)."""
+    path = getattr(settings, 'TRACKER_SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    return SQLiteFTSBackend() if SQLiteFTSBackend.available() else DatabaseBackend()
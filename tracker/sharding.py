@@ -0,0 +1,83 @@
+"""Splitting the reminder jobs across processes and machines.
+
+A shard is ``user_id % count == index``. Commands take ``--shard 3/8`` (the third
+of eight, counted from 1) so each node handles part of the users. They also take
+``--workers N``, which splits that shard N ways and runs each part in a forked
+process with its own database and mail connections. Splitting shard ``i`` of ``c``
+N ways gives shards ``i + c*k`` of ``c*N``, which together cover exactly shard ``i``
+of ``c``.
+"""
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import CommandError
+from django.db import connections
+from django.db.models import F
+
+# Zero-based internally; ``--shard`` is one-based
+Shard = namedtuple('Shard', 'index count')
+
+ALL = Shard(0, 1)
+
+
+def parse_shard(spec):
+    """Parse ``"3/8"`` into Shard(2, 8)."""
+    try:
+        number, count = (int(part) for part in spec.split('/'))
+    except ValueError:
+        raise ValueError(f"Shard must look like 3/8, not {spec!r}")
+    if not 1 <= number <= count:
+        raise ValueError(f"Shard {number} is not between 1 and {count}")
+    return Shard(number - 1, count)
+
+
+def split(shard, parts):
+    return [Shard(shard.index + shard.count * k, shard.count * parts) for k in range(parts)]
+
+
+def filter_shard(queryset, shard, field='user_id'):
+    """Restrict ``queryset`` to ``shard``; ``field`` is a field name or an expression giving the user id."""
+    if not shard or shard.count == 1:
+        return queryset
+    user_id = F(field) if isinstance(field, str) else field
+    return queryset.alias(_shard=user_id % shard.count).filter(_shard=shard.index)
+
+
+def _run_in_worker(func, shard, kwargs):
+    try:
+        return func(shard=shard, **kwargs)
+    finally:
+        connections.close_all()
+
+
+def run_sharded(func, shard=None, workers=1, **kwargs):
+    """Call ``func(shard=..., **kwargs)`` for ``shard`` split ``workers`` ways. Returns the results in shard order.
+
+    With more than one worker each part runs in a forked process; results must pickle.
+    """
+    shard = shard or ALL
+    if workers <= 1:
+        return [func(shard=shard, **kwargs)]
+    parts = split(shard, workers)
+    # Forked children must not share the parent's database connections
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as pool:
+        return list(pool.map(_run_in_worker, [func] * workers, parts, [kwargs] * workers))
+
+
+# Command-line options shared by the reminder commands
+def add_shard_arguments(parser):
+    parser.add_argument('--shard', default='1/1', help='Part of the users to handle, e.g. 3/8 (by user id)')
+    parser.add_argument('--workers', type=int, default=1, help='Processes to split the shard across')
+
+
+def shard_options(options):
+    """Return (shard, workers) from parsed command options."""
+    try:
+        shard = parse_shard(options['shard'])
+    except ValueError as exc:
+        raise CommandError(str(exc))
+    if options['workers'] < 1:
+        raise CommandError("--workers must be at least 1")
+    return shard, options['workers']
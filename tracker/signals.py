@@ -1,7 +1,16 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
+from django.utils import timezone
 from django.contrib.auth.models import User
-from .models import Profile
+from .models import Profile, Prediction, Cycle, FlowDay, Symptom, Craving, DiaryEntry, SelfCareEntry, PromptAnswer, GratitudeEntry, CommunityComment, CommunityPrompt
+from .stats import refresh_cycle_stats
+from .predictions import refresh_prediction
+from .caching import bump_data_version
+from .sync import record_deletion
+from .search import SOURCES_BY_MODEL, get_backend as get_search_backend
+from . import autocomplete, broadcast, community, fragments, reminders
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -11,3 +20,206 @@ def create_user_profile(sender, instance, created, **kwargs):
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
     instance.profile.save()
+
+# Keep CycleStats and the stored prediction current whenever a cycle is written
+@receiver(post_save, sender=Cycle)
+def update_cycle_stats_on_save(sender, instance, **kwargs):
+    refresh_cycle_stats(instance.user_id)
+    refresh_prediction(instance.user_id)
+
+@receiver(post_delete, sender=Cycle)
+def update_cycle_stats_on_delete(sender, instance, origin=None, **kwargs):
+    # Skip cascades from deleting the user; their stats row goes with them
+    if isinstance(origin, User):
+        return
+    refresh_cycle_stats(instance.user_id)
+    refresh_prediction(instance.user_id)
+
+def _profile_changes(instance):
+    """Fields the last save changed (see track_profile_changes); None for a new profile."""
+    return getattr(instance, '_changed_fields', None)
+
+@receiver(post_save, sender=Profile)
+def update_prediction_on_profile_save(sender, instance, **kwargs):
+    changed = _profile_changes(instance)
+    if changed is None or {'last_period_start', 'cycle_length'} & changed:
+        refresh_prediction(instance.user_id)
+
+# Reminder schedules follow the reminder settings and the forecast
+REMINDER_FIELDS = {'pill_reminder_time', 'period_reminder_days_before', 'email_reminders_enabled'}
+
+@receiver(post_save, sender=Profile)
+def reschedule_reminders_on_profile_save(sender, instance, **kwargs):
+    # A new profile gets a prediction above, and that reschedules via the receiver below
+    changed = _profile_changes(instance)
+    if changed is not None and REMINDER_FIELDS & changed:
+        reminders.schedule_reminders(instance.user_id)
+
+@receiver(post_save, sender=Prediction)
+def reschedule_reminders_on_prediction_save(sender, instance, **kwargs):
+    reminders.schedule_reminders(instance.user_id)
+
+# Data versioning for the dashboard cache
+def _owner_id(instance):
+    """Return the user id that owns a tracked row."""
+    if isinstance(instance, (Symptom, Craving)):
+        return Profile.objects.filter(pk=instance.profile_id).values_list('user_id', flat=True).first()
+    return instance.user_id
+
+# Profile fields that change without touching anything the dashboard or the JSON endpoints show
+PROFILE_BOOKKEEPING_FIELDS = {'id', 'user', 'last_reminder_sent', 'data_version', 'data_changed_at'}
+
+@receiver(pre_save, sender=Profile)
+def track_profile_changes(sender, instance, update_fields=None, **kwargs):
+    """Record which fields this save changes, and bump the data version only if any did.
+
+    Every User save (each login included) re-saves the profile unchanged; those
+    saves must leave the dashboard cache, the ETags and the forecast alone.
+    """
+    if instance._state.adding:
+        instance._changed_fields = None
+        return
+    fields = [f.attname for f in Profile._meta.concrete_fields if f.name not in PROFILE_BOOKKEEPING_FIELDS]
+    if update_fields is not None:
+        fields = [name for name in fields if name in set(update_fields)]
+    stored = Profile.objects.filter(pk=instance.pk).values(*fields).first() if fields else {}
+    changed = {name for name in fields if stored is None or stored[name] != getattr(instance, name)}
+    instance._changed_fields = changed
+
+    bump = bool(changed) or (update_fields is not None and 'data_version' in update_fields)
+    # Written in SQL either way, so a stale Profile instance never writes back an old version
+    instance.data_version = F('data_version') + 1 if bump else F('data_version')
+    instance.data_changed_at = timezone.now() if bump else F('data_changed_at')
+
+@receiver(post_save, sender=Profile)
+def reload_profile_data_version(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    # A save with update_fields writes only those fields, leaving the version bump unwritten
+    if update_fields is not None and 'data_version' not in update_fields and _profile_changes(instance):
+        bump_data_version(instance.user_id)
+    # Replace the F() expressions left by track_profile_changes with the stored values
+    instance.refresh_from_db(fields=['data_version', 'data_changed_at'])
+
+@receiver(post_save, sender=Cycle)
+@receiver(post_save, sender=FlowDay)
+@receiver(post_save, sender=Symptom)
+@receiver(post_save, sender=Craving)
+@receiver(post_save, sender=DiaryEntry)
+@receiver(post_save, sender=SelfCareEntry)
+@receiver(post_save, sender=PromptAnswer)
+@receiver(post_save, sender=GratitudeEntry)
+def bump_data_version_on_save(sender, instance, **kwargs):
+    bump_data_version(_owner_id(instance))
+
+@receiver(post_delete, sender=Cycle)
+@receiver(post_delete, sender=FlowDay)
+@receiver(post_delete, sender=Symptom)
+@receiver(post_delete, sender=Craving)
+@receiver(post_delete, sender=DiaryEntry)
+@receiver(post_delete, sender=SelfCareEntry)
+@receiver(post_delete, sender=PromptAnswer)
+@receiver(post_delete, sender=GratitudeEntry)
+def bump_data_version_on_delete(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, (User, Profile, Cycle)) and origin is not instance:
+        return
+    bump_data_version(_owner_id(instance))
+
+# Tombstones for the delta-sync endpoints
+@receiver(post_delete, sender=Cycle)
+@receiver(post_delete, sender=FlowDay)
+@receiver(post_delete, sender=DiaryEntry)
+def record_sync_tombstone(sender, instance, origin=None, **kwargs):
+    # A deleted user takes their tombstones with them
+    if isinstance(origin, User):
+        return
+    # Flow days cascading from a cycle: the owner is known without a query
+    user_id = origin.user_id if isinstance(origin, Cycle) else _owner_id(instance)
+    record_deletion(instance, user_id)
+
+# Keep the full-text search index in step with the searchable models
+@receiver(post_save, sender=DiaryEntry)
+@receiver(post_save, sender=PromptAnswer)
+@receiver(post_save, sender=GratitudeEntry)
+@receiver(post_save, sender=SelfCareEntry)
+@receiver(post_save, sender=Cycle)
+@receiver(post_save, sender=Symptom)
+@receiver(post_save, sender=Craving)
+def index_for_search(sender, instance, **kwargs):
+    get_search_backend().index(SOURCES_BY_MODEL[sender], [instance.pk])
+
+@receiver(post_delete, sender=DiaryEntry)
+@receiver(post_delete, sender=PromptAnswer)
+@receiver(post_delete, sender=GratitudeEntry)
+@receiver(post_delete, sender=SelfCareEntry)
+@receiver(post_delete, sender=Cycle)
+@receiver(post_delete, sender=Symptom)
+@receiver(post_delete, sender=Craving)
+def remove_from_search(sender, instance, **kwargs):
+    get_search_backend().remove(SOURCES_BY_MODEL[sender], [instance.pk])
+
+# Autocomplete vocabulary: diff each row's terms before and after the write
+@receiver(pre_save, sender=DiaryEntry)
+@receiver(pre_save, sender=Symptom)
+@receiver(pre_save, sender=Craving)
+@receiver(pre_save, sender=PromptAnswer)
+def remember_autocomplete_terms(sender, instance, **kwargs):
+    instance._autocomplete_before = autocomplete.row_terms(sender, instance.pk) if instance.pk else (None, {})
+
+@receiver(post_save, sender=DiaryEntry)
+@receiver(post_save, sender=Symptom)
+@receiver(post_save, sender=Craving)
+@receiver(post_save, sender=PromptAnswer)
+def update_autocomplete_terms(sender, instance, **kwargs):
+    user_id, before = getattr(instance, '_autocomplete_before', (None, {}))
+    user_id = user_id or _owner_id(instance)
+    after = autocomplete.instance_terms(instance)
+    autocomplete.add_terms(user_id, {term: display for term, display in after.items() if term not in before})
+    autocomplete.remove_terms(user_id, [term for term in before if term not in after])
+
+@receiver(post_delete, sender=DiaryEntry)
+@receiver(post_delete, sender=Symptom)
+@receiver(post_delete, sender=Craving)
+@receiver(post_delete, sender=PromptAnswer)
+def remove_autocomplete_terms(sender, instance, origin=None, **kwargs):
+    # A deleted user's vocabulary is removed with them
+    if isinstance(origin, User):
+        return
+    autocomplete.remove_terms(_owner_id(instance), list(autocomplete.instance_terms(instance)))
+
+# Prompt activity counters; both receivers run inside the comment write's transaction
+@receiver(post_save, sender=CommunityComment)
+def count_prompt_comment(sender, instance, created, **kwargs):
+    if created and instance.prompt_id:
+        community.record_comment_added(instance)
+
+@receiver(post_delete, sender=CommunityComment)
+def uncount_prompt_comment(sender, instance, origin=None, **kwargs):
+    # Comments deleted along with their prompt need no counting
+    if isinstance(origin, CommunityPrompt) or not instance.prompt_id:
+        return
+    community.recount_prompt_activity(CommunityPrompt.objects.filter(pk=instance.prompt_id))
+
+# Community fragment cache versions, bumped in the write's own transaction
+@receiver(post_save, sender=CommunityComment)
+@receiver(post_delete, sender=CommunityComment)
+def bump_comment_fragments(sender, instance, origin=None, **kwargs):
+    if instance.prompt_id:
+        # The prompt list shows comment counts and sorts by activity. Comments deleted
+        # along with their prompt need nothing: the prompt's own delete bumps the list
+        if not isinstance(origin, CommunityPrompt):
+            fragments.bump(f'prompt:{instance.prompt_id}', 'prompts')
+    else:
+        fragments.bump('comments')
+
+# A prompt's own scope is bumped by CommunityPrompt.save, and a deleted prompt has no version
+@receiver(post_save, sender=CommunityPrompt)
+@receiver(post_delete, sender=CommunityPrompt)
+def bump_prompt_fragments(sender, instance, **kwargs):
+    fragments.bump('prompts')
+
+# Live comment streams hear about a comment once it is committed
+@receiver(post_save, sender=CommunityComment)
+def broadcast_new_comment(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: broadcast.publish_comment(instance))
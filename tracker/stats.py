@@ -0,0 +1,71 @@
+from collections import Counter
+from itertools import groupby
+
+import numpy as np
+
+from .analytics import EMPTY_SUMMARY, summarize_cycles, to_day_array
+from .models import Cycle, CycleStats
+
+EMPTY_STATS = {**EMPTY_SUMMARY, 'most_common_flow': "Unknown"}
+
+
+def compute_cycle_stats(rows):
+    """Compute CycleStats values per user from (user_id, start_date, end_date, flow_type) rows.
+
+    Rows must be ordered by user id, then start date.
+    """
+    if not rows:
+        return {}
+    users, starts, ends, _ = zip(*rows)
+    summary = summarize_cycles(np.array(users, dtype=np.int64), to_day_array(starts), to_day_array(ends))
+
+    for user_id, user_rows in groupby(rows, key=lambda r: r[0]):
+        # Most recent cycle wins ties, as it always has on the dashboard
+        flow_types = [flow for _, _, _, flow in reversed(list(user_rows)) if flow]
+        summary[user_id]['most_common_flow'] = Counter(flow_types).most_common(1)[0][0] if flow_types else "Unknown"
+    return summary
+
+
+def _cycle_rows(queryset):
+    return list(queryset.order_by('user_id', 'start_date', 'id').values_list('user_id', 'start_date', 'end_date', 'flow_type'))
+
+
+def refresh_cycle_stats(user_id):
+    """Recompute and store the CycleStats row for a single user.
+
+    Runs on every cycle write. It re-summarises the user's whole history rather than
+    adjusting the stored values: the deviation, irregular count and trend all depend
+    on the mean of every cycle length. That costs one indexed four-column query.
+    """
+    values = compute_cycle_stats(_cycle_rows(Cycle.objects.filter(user_id=user_id))).get(user_id, EMPTY_STATS)
+    stats, _ = CycleStats.objects.update_or_create(user_id=user_id, defaults=values)
+    return stats
+
+
+def refresh_all_cycle_stats(user_ids, batch_size=500):
+    """Recompute CycleStats for many users, one cycle query and one bulk write per batch."""
+    user_ids = list(user_ids)
+    total = 0
+    for i in range(0, len(user_ids), batch_size):
+        batch = user_ids[i:i + batch_size]
+        computed = compute_cycle_stats(_cycle_rows(Cycle.objects.filter(user_id__in=batch)))
+        existing = {s.user_id: s for s in CycleStats.objects.filter(user_id__in=batch)}
+        to_create, to_update = [], []
+        for user_id in batch:
+            values = computed.get(user_id, EMPTY_STATS)
+            stats = existing.get(user_id) or CycleStats(user_id=user_id)
+            for field, value in values.items():
+                setattr(stats, field, value)
+            (to_update if stats.pk else to_create).append(stats)
+        CycleStats.objects.bulk_create(to_create)
+        CycleStats.objects.bulk_update(to_update, list(EMPTY_STATS))
+        total += len(batch)
+    return total
+
+
+def get_cycle_stats(user):
+    """Return the stored CycleStats for a user, computing it on first access."""
+    stats = CycleStats.objects.filter(user=user).first()
+    if stats is None:
+        stats = refresh_cycle_stats(user.pk)
+    return stats
@@ -0,0 +1,129 @@
+"""Live comment streams as server-sent events, served straight from ASGI.
+
+``tracker_project.asgi`` hands the ``community_stream`` and ``prompt_stream`` URLs
+to ``comment_stream`` instead of to Django's request handler. That handler keeps a
+worker thread for every open request, and an idle stream stays open for as long as
+the page does; here a stream is only a coroutine waiting on its
+``tracker.broadcast`` subscription. The database is used once, as a stream opens,
+to check the session and prompt and to replay comments the client missed.
+
+Under WSGI (``runserver``) the same URLs reach ``views.comment_stream``, which
+answers 204 so browsers stop reconnecting.
+"""
+import asyncio
+from functools import lru_cache
+from importlib import import_module
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import close_old_connections
+from django.http import HttpRequest, parse_cookie
+from django.urls import Resolver404, URLResolver
+from django.urls.resolvers import RegexPattern
+
+from . import broadcast
+from .models import CommunityComment, CommunityPrompt
+from .views import COMMENT_FEED_FIELDS
+
+STREAM_URL_NAMES = {'community_stream', 'prompt_stream'}
+# Most comments replayed after a reconnect; anything older is on the next page load
+REPLAY_LIMIT = 50
+
+STREAM_HEADERS = [
+    (b'content-type', b'text/event-stream'),
+    (b'cache-control', b'no-cache'),
+    # Tell nginx not to buffer the stream
+    (b'x-accel-buffering', b'no'),
+]
+
+
+def _open_stream(cookie, prompt_id, after):
+    """Check the viewer and prompt, and load comments after id ``after``. Returns (status, events)."""
+    try:
+        request = HttpRequest()
+        request.COOKIES = parse_cookie(cookie)
+        session_store = import_module(settings.SESSION_ENGINE).SessionStore
+        request.session = session_store(request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+        if not get_user(request).is_authenticated:
+            return 403, []
+        comments = CommunityComment.objects.filter(prompt__isnull=True)
+        if prompt_id is not None:
+            if not CommunityPrompt.objects.filter(id=prompt_id, is_public=True).exists():
+                return 404, []
+            comments = CommunityComment.objects.filter(prompt_id=prompt_id)
+        if after is None:
+            return 200, []
+        missed = comments.filter(id__gt=after).only(*COMMENT_FEED_FIELDS).order_by('id')[:REPLAY_LIMIT]
+        return 200, [broadcast.comment_event(comment) for comment in missed]
+    finally:
+        # Runs on a shared pool thread, outside any request that would close the connection
+        close_old_connections()
+
+
+async def _watch_disconnect(receive, subscription):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+    subscription.end()
+
+
+async def comment_stream(scope, receive, send, prompt_id=None):
+    """ASGI endpoint pushing new comments on the general feed (or one prompt) as ``comment`` events.
+
+    Replays comments after the ``Last-Event-ID`` header, or ``?after=`` on the first connect.
+    """
+    headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+    after = headers.get('last-event-id') or parse_qs(scope.get('query_string', b'').decode()).get('after', [''])[0]
+    after = int(after) if after.isdigit() else None
+
+    # Subscribe before the replay query so nothing posted in between is lost; a comment
+    # can then arrive twice, and clients skip ids they already show
+    with broadcast.get_hub().subscribe(broadcast.comment_channel(prompt_id)) as subscription:
+        status, replay = await sync_to_async(_open_stream, thread_sensitive=False)(
+            headers.get('cookie', ''), prompt_id, after)
+        if status != 200:
+            await send({'type': 'http.response.start', 'status': status, 'headers': [(b'content-type', b'text/plain')]})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        await send({'type': 'http.response.start', 'status': 200, 'headers': STREAM_HEADERS})
+        watcher = asyncio.create_task(_watch_disconnect(receive, subscription))
+        try:
+            body = broadcast.stream_preamble() + b''.join(replay)
+            while True:
+                await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+                events = await subscription.next_events()
+                if events is None:
+                    break
+                body = b''.join(events) or broadcast.HEARTBEAT
+            if not watcher.done():
+                # Cut off for falling behind: end the response and let the client reconnect
+                await send({'type': 'http.response.body', 'body': b''})
+        except OSError:
+            # The server reports a vanished client as a failed send
+            pass
+        finally:
+            watcher.cancel()
+
+
+@lru_cache(maxsize=None)
+def stream_resolver():
+    """A resolver for the stream URLs alone; scanning the whole URLconf would block the event loop."""
+    from . import urls  # tracker.urls is mounted at the site root
+    return URLResolver(RegexPattern(r'^/'), [pattern for pattern in urls.urlpatterns
+                                             if getattr(pattern, 'name', None) in STREAM_URL_NAMES])
+
+
+def route_streams(django_application):
+    """Wrap the Django ASGI application so the stream URLs are served by ``comment_stream``."""
+    async def application(scope, receive, send):
+        if scope['type'] == 'http' and scope['method'] == 'GET' and scope['path'].endswith('/stream/'):
+            try:
+                match = stream_resolver().resolve(scope['path'])
+            except Resolver404:
+                pass
+            else:
+                return await comment_stream(scope, receive, send, **match.kwargs)
+        return await django_application(scope, receive, send)
+    return application
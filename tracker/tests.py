@@ -1,3 +1,1076 @@
-from django.test import TestCase
+import asyncio
+import json
+import socketserver
+import tempfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from io import StringIO
+from unittest import mock
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from tracker_project.asgi import application
+
+from . import analytics, autocomplete, broadcast, community, fragments, outbox, pagination, predictions, reminders, search, sharding, utils
+from .aggregates import mood_counts, craving_counts
+from .management.commands import benchmark_reminders
+from .management.commands.check_query_plans import view_queries
+from .management.commands.load_test_comment_stream import StreamClient
+from .views import DASHBOARD_CYCLE_WINDOW, DASHBOARD_DAY_WINDOW, DASHBOARD_PAGE_SIZE, SEARCH_TOP_N
+from .models import CommunityComment, CommunityPrompt, Cycle, CycleStats, Craving, DiaryEntry, FlowDay, OutboundEmail, Prediction, Profile, PromptAnswer, ReminderSchedule, SearchTerm, SelfCareEntry, Symptom
+
+
+class CycleStatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('iris', password='secret')
+        self.starts = [date(2024, 1, 1), date(2024, 1, 29), date(2024, 2, 26)]
+
+    def add_cycles(self):
+        return [Cycle.objects.create(user=self.user, start_date=start, end_date=start + timedelta(days=5),
+                                     flow='medium', flow_type='Medium') for start in self.starts]
+
+    def test_saves_and_deletes_refresh_stats(self):
+        cycles = self.add_cycles()
+        stats = CycleStats.objects.get(user=self.user)
+        self.assertEqual((stats.cycle_count, stats.avg_cycle_length, stats.avg_period_length), (3, 28, 5))
+        self.assertEqual(stats.last_start_date, date(2024, 2, 26))
+
+        cycles[-1].delete()
+        stats.refresh_from_db()
+        self.assertEqual((stats.cycle_count, stats.last_start_date), (2, date(2024, 1, 29)))
+
+    def test_deleting_the_user_skips_the_refresh(self):
+        self.add_cycles()
+        with mock.patch('tracker.signals.refresh_cycle_stats') as refresh:
+            self.user.delete()
+        refresh.assert_not_called()
+        self.assertFalse(CycleStats.objects.exists())
+
+    def test_backfill_command(self):
+        # bulk_create sends no signals, so only the backfill fills in the stats
+        Cycle.objects.bulk_create(Cycle(user=self.user, start_date=start, flow='light') for start in self.starts)
+        other = User.objects.create_user('june', password='secret')
+        CycleStats.objects.all().delete()
+        call_command('backfill_cycle_stats', stdout=StringIO())
+        self.assertEqual(CycleStats.objects.get(user=self.user).cycle_count, 3)
+        self.assertEqual(CycleStats.objects.get(user=other).cycle_count, 0)
+
+
+class CycleAnalyticsTests(TestCase):
+    def arrays(self, rows):
+        users, starts, ends = zip(*rows)
+        return np.array(users, dtype=np.int64), analytics.to_day_array(starts), analytics.to_day_array(ends)
+
+    def cycles(self, user_id, first, lengths, period=5):
+        """Rows for cycles starting ``first`` and spaced by ``lengths``."""
+        starts = [first]
+        for length in lengths:
+            starts.append(starts[-1] + timedelta(days=length))
+        return [(user_id, start, start + timedelta(days=period)) for start in starts]
+
+    def test_summaries_are_grouped_per_user(self):
+        # User 2's history starts before user 1's ends; the gap between them is not a cycle
+        rows = self.cycles(1, date(2024, 1, 1), [28, 28, 28, 36]) + self.cycles(2, date(2023, 6, 1), [30, 31], period=4)
+        summary = analytics.summarize_cycles(*self.arrays(rows))
+        self.assertEqual(set(summary), {1, 2})
+        self.assertEqual(summary[1]['cycle_count'], 5)
+        self.assertEqual(summary[1]['avg_cycle_length'], 30)
+        self.assertEqual(summary[1]['avg_period_length'], 5)
+        self.assertEqual(summary[1]['irregular_count'], 1)
+        self.assertEqual(summary[1]['trend'], "Getting longer")
+        self.assertEqual(summary[1]['last_start_date'], date(2024, 4, 30))
+        self.assertEqual(summary[2]['cycle_count'], 3)
+        self.assertEqual(summary[2]['avg_cycle_length'], 30)
+        self.assertEqual(summary[2]['avg_period_length'], 4)
+        self.assertEqual(summary[2]['cycle_length_std'], 0.5)
+        # Two lengths are too few for a trend
+        self.assertIsNone(summary[2]['trend_slope'])
+        self.assertEqual(summary[2]['trend'], "Stable")
+
+    def test_cycles_without_an_end_date(self):
+        rows = self.cycles(1, date(2024, 1, 1), [28, 28], period=6)
+        rows[-1] = (1, rows[-1][1], None)
+        summary = analytics.summarize_cycles(*self.arrays(rows))[1]
+        self.assertEqual(summary['avg_cycle_length'], 28)
+        self.assertEqual(summary['avg_period_length'], 6)
+        self.assertIsNone(summary['last_end_date'])
+        series = analytics.cycle_series(*self.arrays(rows)[1:])
+        self.assertEqual(series['period_durations'][:2].tolist(), [6, 6])
+        self.assertTrue(np.isnan(series['period_durations'][2]))
+
+    def test_a_single_cycle_has_no_lengths(self):
+        summary = analytics.summarize_cycles(*self.arrays(self.cycles(7, date(2024, 3, 3), [])))[7]
+        self.assertEqual(summary, {**analytics.EMPTY_SUMMARY, 'cycle_count': 1, 'avg_period_length': 5,
+                                   'last_start_date': date(2024, 3, 3), 'last_end_date': date(2024, 3, 8)})
+        series = analytics.cycle_series(*self.arrays(self.cycles(7, date(2024, 3, 3), []))[1:])
+        self.assertEqual((len(series['cycle_lengths']), len(series['rolling_mean']), len(series['irregular'])), (0, 0, 0))
+
+    def test_irregular_means_more_than_the_tolerance_from_the_mean(self):
+        tolerance = analytics.IRREGULAR_TOLERANCE_DAYS
+        at_limit = self.cycles(1, date(2024, 1, 1), [30 - tolerance, 30 + tolerance])
+        past_limit = self.cycles(2, date(2024, 1, 1), [29 - tolerance, 31 + tolerance])
+        summary = analytics.summarize_cycles(*self.arrays(at_limit + past_limit))
+        self.assertEqual((summary[1]['irregular_count'], summary[2]['irregular_count']), (0, 2))
+        self.assertEqual(analytics.cycle_series(*self.arrays(at_limit)[1:])['irregular'].tolist(), [False, False])
+        self.assertEqual(analytics.cycle_series(*self.arrays(past_limit)[1:])['irregular'].tolist(), [True, True])
+
+    def test_rolling_series(self):
+        series = analytics.cycle_series(*self.arrays(self.cycles(1, date(2024, 1, 1), [28, 28, 28, 36]))[1:], window=3)
+        self.assertEqual(series['cycle_lengths'].tolist(), [28, 28, 28, 36])
+        self.assertEqual(series['rolling_mean'].round(2).tolist(), [28.0, 30.67])
+        self.assertEqual(series['rolling_std'].round(2).tolist(), [0.0, 3.77])
+        self.assertEqual(series['irregular'].tolist(), [False, False, False, True])
+
+    def test_wellness_update_shows_the_rolling_figures(self):
+        user = User.objects.create_user('juno', password='secret')
+        for _, start, end in self.cycles(user.pk, date(2024, 1, 1), [28, 28, 28, 36]):
+            Cycle.objects.create(user=user, start_date=start, end_date=end, flow='medium', flow_type='Medium')
+        self.client.force_login(user)
+        response = self.client.get(reverse('wellness_update'))
+        self.assertEqual((response.context['recent_cycle_length'], response.context['recent_cycle_std']), (30.7, 3.8))
+        self.assertTrue(response.context['latest_irregular'])
+        self.assertContains(response, 'Last 3 Cycles:')
+
+
+class MoodCravingAggregationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('luna', 'luna@example.com', 'secret')
+        self.profile = self.user.profile
+        self.client.force_login(self.user)
+        today = date.today()
+        for i, mood in enumerate(['Tired', 'Happy', 'Tired', 'Sad', 'Happy', 'Tired']):
+            Symptom.objects.create(profile=self.profile, date=today - timedelta(days=10 - i), mood=mood)
+        for i, craving in enumerate(['Sweet', 'Salty', 'Sweet', 'Chocolate']):
+            Craving.objects.create(profile=self.profile, date=today - timedelta(days=10 - i), craving_type=craving)
+
+    def test_counts_match_counter_order(self):
+        symptoms = Symptom.objects.filter(profile=self.profile).order_by('date')
+        cravings = Craving.objects.filter(profile=self.profile).order_by('date')
+        self.assertEqual(list(mood_counts(self.profile).items()), list(Counter(s.mood for s in symptoms).items()))
+        self.assertEqual(list(craving_counts(self.profile).items()), list(Counter(c.craving_type for c in cravings).items()))
+
+    def test_same_date_ties_follow_the_earliest_rows(self):
+        day = date.today() - timedelta(days=30)
+        # Calm has the lower id overall, but Proud's row comes first on the shared first date
+        Symptom.objects.create(profile=self.profile, date=day + timedelta(days=2), mood='Calm')
+        Symptom.objects.create(profile=self.profile, date=day, mood='Proud')
+        Symptom.objects.create(profile=self.profile, date=day, mood='Calm')
+        symptoms = Symptom.objects.filter(profile=self.profile).order_by('date', 'id')
+        self.assertEqual(list(mood_counts(self.profile)), list(Counter(s.mood for s in symptoms)))
+        self.assertEqual(list(mood_counts(self.profile))[:2], ['Proud', 'Calm'])
+
+    def test_date_range(self):
+        start = date.today() - timedelta(days=7)
+        self.assertEqual(mood_counts(self.profile, start=start), {'Sad': 1, 'Happy': 1, 'Tired': 1})
+
+    def test_single_query_regardless_of_rows(self):
+        with self.assertNumQueries(1):
+            mood_counts(self.profile)
+        Symptom.objects.bulk_create(
+            Symptom(profile=self.profile, date=date.today(), mood='Calm') for _ in range(200)
+        )
+        with self.assertNumQueries(1):
+            counts = mood_counts(self.profile)
+        self.assertEqual(counts['Calm'], 200)
+
+    def test_mood_cravings_json(self):
+        response = self.client.get(reverse('mood_cravings_json'))
+        self.assertEqual(response.json(), {
+            'labels': ['Chocolate', 'Happy', 'Sad', 'Salty', 'Sweet', 'Tired'],
+            'moods': [0, 2, 1, 0, 0, 3],
+            'cravings': [1, 0, 0, 1, 2, 0],
+        })
+
+
+class QueryPlanTests(TestCase):
+    def test_every_view_query_uses_an_index(self):
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[-1], 'All query plans use indexes.')
+        self.assertEqual(len(lines) - 1, len(view_queries()))
+        self.assertTrue(all(line.endswith(': ok') for line in lines[:-1]), lines)
+
+        for view, label, queryset in view_queries():
+            for line in queryset.explain().splitlines():
+                # Subquery headers are followed by their own SEARCH lines
+                if 'SUBQUERY' in line:
+                    continue
+                self.assertRegex(line, r'USING (COVERING )?INDEX|USING INTEGER PRIMARY KEY', f'{view}.{label}')
+
+    def test_dashboard_queries_come_from_the_views(self):
+        labels = {f'{view}.{label}' for view, label, _ in view_queries()}
+        for series in ('cycles', 'symptoms', 'cravings', 'flow_days', 'diary'):
+            self.assertIn(f'dashboard.{series}_first', labels)
+            self.assertIn(f'dashboard_history_json.{series}_next', labels)
+        self.assertIn('dashboard.moods_counts', labels)
+
+
+class DashboardHistoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('wren', password='secret')
+        self.client.force_login(self.user)
+        today = date.today()
+        # Two symptoms a day for 60 days (more than a window page) and more well outside the 90-day window
+        days = list(range(60)) + list(range(150, 200, 5))
+        Symptom.objects.bulk_create(
+            Symptom(profile=self.user.profile, date=today - timedelta(days=d), mood='Calm') for d in days for _ in range(2)
+        )
+        Cycle.objects.bulk_create(
+            Cycle(user=self.user, start_date=today - timedelta(days=28 * i), flow='light') for i in range(15)
+        )
+
+    def follow(self, series, cursor):
+        """Fetch load-more pages from ``cursor`` to the end; return the ids in page order."""
+        ids = []
+        while cursor:
+            data = self.client.get(reverse('dashboard_history_json', args=[series]), {'cursor': cursor}).json()
+            self.assertLessEqual(len(data['items']), DASHBOARD_PAGE_SIZE)
+            ids += [item['id'] for item in data['items']]
+            cursor = data['next']
+        return ids
+
+    def test_window_then_load_more_covers_everything_once(self):
+        response = self.client.get(reverse('dashboard'))
+        cursors = response.context['history_cursors']
+        for series, queryset, ordering, window_size in [
+            ('symptoms', Symptom.objects.filter(profile=self.user.profile), ('-date', '-id'), DASHBOARD_PAGE_SIZE),
+            ('cycles', Cycle.objects.filter(user=self.user), ('-start_date', '-id'), DASHBOARD_CYCLE_WINDOW),
+        ]:
+            window = [row['id'] for row in response.context['history'][series]]
+            self.assertEqual(len(window), window_size)
+            ids = window + self.follow(series, cursors[series])
+            self.assertEqual(ids, list(queryset.order_by(*ordering).values_list('id', flat=True)), series)
+
+    def test_window_stops_at_the_day_bound(self):
+        Symptom.objects.filter(profile=self.user.profile, date__gt=date.today() - timedelta(days=50)).delete()
+        response = self.client.get(reverse('dashboard'))
+        since = date.today() - timedelta(days=DASHBOARD_DAY_WINDOW)
+        window = response.context['history']['symptoms']
+        # 20 rows are left inside the window; the older 20 are only reachable through load more
+        self.assertEqual(len(window), 20)
+        self.assertTrue(all(row['date'] >= since for row in window))
+        self.assertEqual(len(self.follow('symptoms', response.context['history_cursors']['symptoms'])), 20)
+
+        # Nothing recent at all: no cursor, so load more starts from the newest row
+        Symptom.objects.filter(profile=self.user.profile, date__gte=since).delete()
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual((response.context['history']['symptoms'], response.context['history_cursors']['symptoms']), ([], None))
+        data = self.client.get(reverse('dashboard_history_json', args=['symptoms'])).json()
+        self.assertEqual(len(data['items']), 20)
+
+
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('sol', 'sol@example.com', 'secret')
+        self.client.force_login(self.user)
+
+    def test_signals_invalidate_cached_dashboard(self):
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['combined_chart_data']['labels'], [])
+
+        Symptom.objects.create(profile=self.user.profile, date=date.today(), mood='Calm')
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['combined_chart_data']['labels'], ['Calm'])
+
+    def test_login_leaves_the_data_version_alone(self):
+        profile = Profile.objects.get(user=self.user)
+        with mock.patch('tracker.signals.refresh_prediction') as refresh:
+            self.assertTrue(self.client.login(username='sol', password='secret'))
+        refresh.assert_not_called()
+        self.assertEqual(Profile.objects.get(user=self.user).data_version, profile.data_version)
+
+        before = profile.data_version
+        profile.cycle_length = 30
+        profile.save()
+        # The saved instance holds the new stored value, not an SQL expression
+        self.assertEqual(profile.data_version, before + 1)
+        self.assertEqual(Profile.objects.get(user=self.user).data_version, before + 1)
+        self.assertEqual(Prediction.objects.get(user=self.user).cycle_length, 30)
+
+    def test_partial_profile_save_bumps_the_data_version(self):
+        profile = Profile.objects.get(user=self.user)
+        before = profile.data_version
+        profile.cycle_length = 31
+        profile.save(update_fields=['cycle_length'])
+        self.assertEqual(profile.data_version, before + 1)
+        self.assertEqual(Profile.objects.get(user=self.user).data_version, before + 1)
+        # Unchanged fields in update_fields are not a change
+        profile.save(update_fields=['cycle_length'])
+        self.assertEqual(Profile.objects.get(user=self.user).data_version, before + 1)
+
+    def test_cache_hit_skips_data_queries(self):
+        self.client.get(reverse('dashboard'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('dashboard'))
+        tables = ' '.join(q['sql'] for q in queries)
+        self.assertNotIn('tracker_symptom', tables)
+        self.assertNotIn('tracker_flowday', tables)
+
+
+class ConditionalJsonTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('nova', 'nova@example.com', 'secret')
+        self.client.force_login(self.user)
+
+    def test_not_modified_until_data_changes(self):
+        url = reverse('symptom_json')
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('no-cache', first['Cache-Control'])
+
+        with CaptureQueriesContext(connection) as queries:
+            repeat = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+        self.assertFalse(any('tracker_symptom' in q['sql'] for q in queries))
+
+        Symptom.objects.create(profile=self.user.profile, date=date.today(), mood='Calm')
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()['labels'], ['Calm'])
+
+
+class DeltaSyncTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('iris', 'iris@example.com', 'secret')
+        self.client.force_login(self.user)
+        self.cycle = Cycle.objects.create(user=self.user, start_date=date.today() - timedelta(days=30))
+        self.flow_day = FlowDay.objects.create(cycle=self.cycle, date=self.cycle.start_date, intensity='Light')
+        self.kept = DiaryEntry.objects.create(user=self.user, title='Old', date=date.today(), content='...')
+        self.removed = DiaryEntry.objects.create(user=self.user, title='Gone', date=date.today(), content='...')
+        # Pretend everything was last synced an hour ago
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        for model in (Cycle, FlowDay, DiaryEntry):
+            model.objects.update(updated_at=an_hour_ago)
+        self.since = (an_hour_ago + timedelta(minutes=30)).isoformat()
+
+    def test_full_sync_without_cursor(self):
+        data = self.client.get(reverse('diary_entries_json'), {'since': ''}).json()
+        self.assertTrue(data['full'])
+        self.assertEqual({row['id'] for row in data['changed']}, {self.kept.id, self.removed.id})
+        self.assertTrue(data['cursor'])
+
+    def test_only_changes_since_cursor(self):
+        added = DiaryEntry.objects.create(user=self.user, title='New', date=date.today(), content='...')
+        removed_id = self.removed.id
+        self.removed.delete()
+        data = self.client.get(reverse('diary_entries_json'), {'since': self.since}).json()
+        self.assertEqual([row['id'] for row in data['changed']], [added.id])
+        self.assertEqual(data['deleted'], [removed_id])
+
+    def test_cycle_delete_tombstones_flow_days(self):
+        cycle_id, flow_day_id = self.cycle.id, self.flow_day.id
+        self.cycle.delete()
+        cycles = self.client.get(reverse('api_cycles'), {'since': self.since}).json()
+        flow_days = self.client.get(reverse('api_flow_days'), {'since': self.since}).json()
+        self.assertEqual((cycles['changed'], cycles['deleted']), ([], [cycle_id]))
+        self.assertEqual((flow_days['changed'], flow_days['deleted']), ([], [flow_day_id]))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('api_cycles'), {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+
+class BatchedChartsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('sol', 'sol@example.com', 'secret')
+        self.client.force_login(self.user)
+        cycle = Cycle.objects.create(user=self.user, start_date=date(2025, 1, 1), end_date=date(2025, 1, 5), flow_type='Medium')
+        FlowDay.objects.create(cycle=cycle, date=date(2025, 1, 2), intensity='Heavy')
+        Symptom.objects.create(profile=self.user.profile, date=date(2025, 1, 3), mood='Calm')
+        Craving.objects.create(profile=self.user.profile, date=date(2025, 1, 3), craving_type='Salty')
+
+    def test_matches_single_series_endpoints(self):
+        data = self.client.get(reverse('charts_json'), {'series': 'flow,cycles,mood_cravings,moods'}).json()
+        self.assertEqual(set(data), {'flow', 'cycles', 'mood_cravings', 'moods'})
+        self.assertEqual(data['flow'], self.client.get(reverse('flow_day_json')).json())
+        self.assertEqual(data['cycles'], self.client.get(reverse('cycles_json')).json())
+        self.assertEqual(data['mood_cravings'], self.client.get(reverse('mood_cravings_json')).json())
+        self.assertEqual(data['moods'], self.client.get(reverse('symptom_json')).json())
+
+    def test_one_profile_lookup_for_all_series(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('charts_json'))
+        self.assertEqual(set(response.json()), {'flow', 'cycles', 'moods', 'cravings', 'mood_cravings', 'selfcare', 'diary'})
+        profile_queries = [q for q in queries if 'FROM "tracker_profile"' in q['sql']]
+        # One for the conditional-GET version probe, one shared by every series
+        self.assertEqual(len(profile_queries), 2)
+
+    def test_date_range_and_unknown_series(self):
+        data = self.client.get(reverse('charts_json'), {'series': 'flow', 'start': '2025-02-01'}).json()
+        self.assertEqual(data['flow']['labels'], [])
+        self.assertEqual(self.client.get(reverse('charts_json'), {'series': 'flow,weather'}).status_code, 400)
+
+
+class DiaryJsonTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('wren', 'wren@example.com', 'secret')
+        self.client.force_login(self.user)
+        self.january = DiaryEntry.objects.create(user=self.user, title='Jan', date=date(2025, 1, 10), content='word ' * 100)
+        self.february = DiaryEntry.objects.create(user=self.user, title='Feb', date=date(2025, 2, 10), content='Short  and\nsweet')
+
+    def test_summaries_for_range_without_content(self):
+        data = self.client.get(reverse('diary_entries_json'), {'start': '2025-02-01', 'end': '2025-02-28'}).json()
+        self.assertEqual(data['next'], None)
+        self.assertEqual(data['entries'], [{'id': self.february.id, 'title': 'Feb', 'date': '2025-02-10', 'excerpt': 'Short and sweet'}])
+        self.assertLessEqual(len(DiaryEntry.objects.get(pk=self.january.pk).excerpt), 140)
+
+    def test_entry_detail_is_per_user(self):
+        self.assertEqual(self.client.get(reverse('diary_entry_json', args=[self.january.id])).json()['content'], 'word ' * 100)
+        other = User.objects.create_user('moss', 'moss@example.com', 'secret')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse('diary_entry_json', args=[self.january.id])).status_code, 404)
+
+    def test_export_streams_ndjson(self):
+        response = self.client.get(reverse('diary_export'))
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['title'] for line in lines], ['Jan', 'Feb'])
+
+
+class KeysetListingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('ash', 'ash@example.com', 'secret')
+        self.client.force_login(self.user)
+
+    def walk(self, url, context_key, param='page'):
+        """Follow next cursors to the end; return (ids seen, queries per page)."""
+        seen, per_page, cursor = [], [], None
+        while True:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, {param: cursor} if cursor else {})
+            page = response.context[context_key]
+            seen.extend(obj.id for obj in page)
+            per_page.append(queries)
+            if not page.has_next():
+                return seen, per_page
+            cursor = page.next_cursor
+
+    def test_diary_pages_cover_every_entry_without_counting(self):
+        for i in range(20):
+            DiaryEntry.objects.create(user=self.user, title=f'E{i}', date=date(2025, 1, 1) + timedelta(days=i // 3), content='...')
+        seen, per_page = self.walk(reverse('diary_page'), 'entries')
+        expected = list(DiaryEntry.objects.order_by('-date', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertFalse(any('COUNT(' in q['sql'] for queries in per_page for q in queries))
+        self.assertEqual(len(per_page[0]), len(per_page[-1]))
+
+    def test_comments_created_in_the_same_millisecond(self):
+        # created_at values this close together only page correctly with full-precision cursors
+        for i in range(7):
+            CommunityComment.objects.create(content=f'c{i}', name='x')
+        seen, _ = self.walk(reverse('community'), 'comments')
+        self.assertEqual(sorted(seen), sorted(CommunityComment.objects.values_list('id', flat=True)))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_selfcare_tracker_is_paginated(self):
+        for i in range(20):
+            SelfCareEntry.objects.create(user=self.user, date=date(2025, 1, 1) + timedelta(days=i), sleep_hours=7, water_litres=2)
+        response = self.client.get(reverse('selfcare_tracker'))
+        self.assertEqual(len(response.context['entries']), 14)
+        seen, _ = self.walk(reverse('selfcare_tracker'), 'entries')
+        self.assertEqual(len(seen), 20)
+
+
+class SiteSearchTests(TestCase):
+    def setUp(self):
+        search.get_backend.cache_clear()
+        self.user = User.objects.create_user('fern', 'fern@example.com', 'secret')
+        self.client.force_login(self.user)
+        self.entry = DiaryEntry.objects.create(
+            user=self.user, title='Heavy day', date=date(2025, 3, 1), content='So tired, cramps all <b>afternoon</b>.')
+        Symptom.objects.create(profile=self.user.profile, date=date(2025, 3, 2), mood='Tired', notes='bad cramps')
+        other = User.objects.create_user('reed', 'reed@example.com', 'secret')
+        DiaryEntry.objects.create(user=other, title='Cramps', date=date(2025, 3, 1), content='cramps cramps')
+
+    def tearDown(self):
+        search.get_backend.cache_clear()
+
+    def test_ranked_highlighted_results_for_own_entries(self):
+        self.assertIsInstance(search.get_backend(), search.SQLiteFTSBackend)
+        response = self.client.get(reverse('site_search'), {'q': 'cramp'})
+        sections = {section['label']: section['results'] for section in response.context['sections']}
+        self.assertEqual(set(sections), {'Diary', 'Symptoms'})
+        diary_hit = sections['Diary'][0]['hit']
+        self.assertEqual(diary_hit.object_id, self.entry.id)
+        self.assertIn('<mark>cramps</mark>', diary_hit.snippet)
+        self.assertIn('&lt;b&gt;', diary_hit.snippet)
+        self.assertEqual(sections['Diary'][0]['url'], reverse('edit_diary', args=[self.entry.id]))
+
+    def test_index_follows_edits_and_deletes(self):
+        backend = search.get_backend()
+        self.entry.content = 'Calm and rested'
+        self.entry.save()
+        self.assertEqual([h.category for h in backend.search(self.user, 'cramps')], ['symptoms'])
+        self.assertEqual([h.object_id for h in backend.search(self.user, 'rested')], [self.entry.id])
+        self.entry.delete()
+        self.assertEqual(backend.search(self.user, 'rested'), [])
+
+    def test_rebuild_and_syntax_characters(self):
+        backend = search.get_backend()
+        self.assertEqual(backend.rebuild(), 3)
+        self.assertEqual(len(backend.search(self.user, 'cramps" OR owner:*')), 0)
+        self.assertEqual(len(backend.search(self.user, 'tire')), 2)
+
+    @override_settings(TRACKER_SEARCH_BACKEND='tracker.search.DatabaseBackend')
+    def test_database_fallback(self):
+        search.get_backend.cache_clear()
+        hits = search.get_backend().search(self.user, 'cramps')
+        self.assertEqual({h.category for h in hits}, {'diary', 'symptoms'})
+
+
+class SearchPagingTests(TestCase):
+    def setUp(self):
+        search.get_backend.cache_clear()
+        self.user = User.objects.create_user('lark', 'lark@example.com', 'secret')
+        self.client.force_login(self.user)
+        for i in range(30):
+            DiaryEntry.objects.create(user=self.user, title=f'Day {i}', date=date(2025, 1, 1) + timedelta(days=i), content='tired again')
+        Craving.objects.create(profile=self.user.profile, date=date(2025, 1, 2), craving_type='Sweet', notes='tired, wanted cake')
+
+    def tearDown(self):
+        search.get_backend.cache_clear()
+
+    def test_top_n_per_category_with_more_count(self):
+        sections = {s['category']: s for s in self.client.get(reverse('site_search'), {'q': 'tired'}).context['sections']}
+        self.assertEqual(len(sections['diary']['results']), SEARCH_TOP_N)
+        self.assertEqual(sections['diary']['more'], 30 - SEARCH_TOP_N)
+        self.assertEqual((len(sections['cravings']['results']), sections['cravings']['more']), (1, 0))
+
+    def test_json_pages_through_one_category(self):
+        seen, cursor = [], None
+        while True:
+            params = {'q': 'tired', 'category': 'diary', **({'cursor': cursor} if cursor else {})}
+            data = self.client.get(reverse('search_json'), params).json()
+            seen += [item['id'] for item in data['items']]
+            cursor = data['next']
+            if not cursor:
+                break
+        self.assertEqual(sorted(seen), sorted(DiaryEntry.objects.values_list('id', flat=True)))
+        self.assertEqual(self.client.get(reverse('search_json'), {'q': 'tired', 'category': 'weather'}).status_code, 400)
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('vale', 'vale@example.com', 'secret')
+        self.client.force_login(self.user)
+
+    def suggestions(self, prefix):
+        return self.client.get(reverse('autocomplete_json'), {'q': prefix}).json()['suggestions']
+
+    def test_terms_follow_saves_edits_and_deletes(self):
+        entry = DiaryEntry.objects.create(user=self.user, title='Morning walk', date=date.today(), content='...')
+        DiaryEntry.objects.create(user=self.user, title='Evening walk', date=date.today(), content='...')
+        Craving.objects.create(profile=self.user.profile, date=date.today(), craving_type='Chocolate')
+        self.assertEqual(self.suggestions('wa'), ['walk'])
+        self.assertEqual(self.suggestions('mor'), ['Morning', 'Morning walk'])
+        self.assertEqual(self.suggestions('CHOC'), ['Chocolate'])
+
+        entry.title = 'Morning yoga'
+        entry.save()
+        self.assertEqual(self.suggestions('morning '), ['Morning yoga'])
+        entry.delete()
+        self.assertEqual(self.suggestions('mor'), [])
+        self.assertEqual(self.suggestions('walk'), ['walk'])
+
+    def test_rebuild_matches_incremental_counts(self):
+        DiaryEntry.objects.create(user=self.user, title='Rest day', date=date.today(), content='...')
+        PromptAnswer.objects.create(user=self.user, prompt='What made you rest today?', answer='...')
+        incremental = sorted(SearchTerm.objects.values_list('term', 'count'))
+        autocomplete.rebuild_terms()
+        self.assertEqual(sorted(SearchTerm.objects.values_list('term', 'count')), incremental)
+
+
+class PeriodReminderTests(TestCase):
+    def make_user(self, name, days_until_period, **profile_fields):
+        user = User.objects.create_user(name, f'{name}@example.com', 'secret')
+        profile = user.profile
+        profile.name = name.title()
+        profile.cycle_length = 28
+        profile.last_period_start = timezone.now().date() + timedelta(days=days_until_period - 28)
+        for field, value in profile_fields.items():
+            setattr(profile, field, value)
+        profile.save()
+        return user
+
+    def test_due_reminders_queued_in_bulk(self):
+        for i in range(5):
+            self.make_user(f'due{i}', 2)
+        self.make_user('later', 10)
+        self.make_user('optedout', 2, email_reminders_enabled=False)
+
+        with self.assertNumQueries(4):
+            report = utils.queue_period_reminders()
+        self.assertEqual(report.queued, 5)
+        queued = OutboundEmail.objects.order_by('to_email')
+        self.assertEqual([e.to_email for e in queued], [f'due{i}@example.com' for i in range(5)])
+        self.assertIn('Hi Due0,', queued[0].body)
+        self.assertEqual(Profile.objects.filter(last_reminder_sent=timezone.now().date()).count(), 5)
+
+        # Already reminded today: a second run queues nothing
+        self.assertEqual(utils.queue_period_reminders().queued, 0)
+        self.assertEqual(OutboundEmail.objects.count(), 5)
+
+
+class ReminderScheduleTests(TestCase):
+    def setUp(self):
+        self.today = timezone.now().date()
+        self.user = User.objects.create_user('ines', 'ines@example.com', 'secret')
+        profile = self.user.profile
+        profile.cycle_length = 28
+        profile.last_period_start = self.today + timedelta(days=3 - 28)  # next period in 3 days
+        profile.period_reminder_days_before = 2
+        profile.save()
+
+    def at(self, days, hour, minute=0):
+        return datetime.combine(self.today + timedelta(days=days), time(hour, minute), tzinfo=dt_timezone.utc)
+
+    def schedule(self):
+        return dict(ReminderSchedule.objects.filter(user=self.user).values_list('kind', 'next_due_at'))
+
+    def test_schedule_follows_profile_changes(self):
+        self.assertEqual(self.schedule(), {'period': self.at(1, 9)})
+        profile = Profile.objects.get(user=self.user)
+        profile.pill_reminder_time = time(8, 30)
+        profile.save(update_fields=['pill_reminder_time'])
+        self.assertEqual(self.schedule()['pill'].time(), time(8, 30))
+        profile.email_reminders_enabled = False
+        profile.save(update_fields=['email_reminders_enabled'])
+        self.assertEqual(self.schedule(), {})
+
+    def test_tick_queues_only_due_rows_and_advances_them(self):
+        for i in range(3):
+            User.objects.create_user(f'other{i}', f'other{i}@example.com', 'secret')
+        self.assertEqual(reminders.run_due_reminders(now=self.at(1, 8)).due, 0)
+
+        with self.assertNumQueries(7):
+            report = reminders.run_due_reminders(now=self.at(1, 9, 1))
+        self.assertEqual((report.due, report.queued), (1, 1))
+        self.assertEqual(OutboundEmail.objects.get().to_email, 'ines@example.com')
+        # Next reminder is two days before the following predicted period
+        self.assertEqual(self.schedule(), {'period': self.at(29, 9)})
+        self.assertEqual(reminders.run_due_reminders(now=self.at(1, 9, 2)).due, 0)
+
+
+class PredictionTests(TestCase):
+    def test_forecast_prefers_cycles_then_profile_then_default(self):
+        today = date(2024, 3, 10)
+        values = predictions.forecast(30, date(2024, 3, 1), date(2024, 2, 1), 26, today)
+        self.assertEqual((values['cycle_length'], values['source']), (30, 'cycles'))
+        self.assertEqual((values['current_cycle_start'], values['next_period_start']), (date(2024, 3, 1), date(2024, 3, 31)))
+        # The later of the two known starts wins, whichever it comes from
+        values = predictions.forecast(None, date(2024, 2, 1), date(2024, 3, 5), 26, today)
+        self.assertEqual((values['cycle_length'], values['source'], values['current_cycle_start']), (26, 'profile', date(2024, 3, 5)))
+        values = predictions.forecast(None, None, None, None, today)
+        self.assertEqual((values['cycle_length'], values['source']), (predictions.DEFAULT_CYCLE_LENGTH, 'default'))
+        self.assertIsNone(values['next_period_start'])
+
+    def test_cycle_start_rolls_forward_whole_cycles(self):
+        prediction = Prediction(current_cycle_start=date(2024, 1, 1), cycle_length=28)
+        self.assertEqual(prediction.cycle_start_on(date(2023, 12, 25)), date(2024, 1, 1))
+        self.assertEqual(prediction.cycle_start_on(date(2024, 1, 28)), date(2024, 1, 1))
+        self.assertEqual(prediction.cycle_start_on(date(2024, 1, 29)), date(2024, 1, 29))
+        self.assertEqual(prediction.cycle_start_on(date(2024, 3, 1)), date(2024, 2, 26))
+        self.assertEqual(prediction.next_start_after(date(2024, 3, 1)), date(2024, 3, 25))
+        self.assertIsNone(Prediction(cycle_length=28).cycle_start_on(date(2024, 3, 1)))
+
+    def test_phase_boundaries(self):
+        start = date(2024, 1, 1)
+        prediction = Prediction(current_cycle_start=start, cycle_length=28)
+        phases = {days: prediction.phase_on(start + timedelta(days=days)) for days in (0, 5, 6, 13, 14, 15, 16, 27, 28)}
+        self.assertEqual(phases, {
+            0: "Menstrual", 5: "Menstrual", 6: "Follicular", 13: "Follicular", 14: "Ovulation",
+            15: "Ovulation", 16: "Luteal", 27: "Luteal", 28: "Menstrual",
+        })
+        self.assertEqual(prediction.phase_on(start - timedelta(days=1)), "Between cycles")
+        self.assertIsNone(Prediction(cycle_length=28).phase_on(start))
+
+    def test_batch_refresh_updates_forecasts_and_reschedules_reminders(self):
+        today = timezone.now().date()
+        users = [User.objects.create_user(f'rhea{i}', f'rhea{i}@example.com', 'secret') for i in range(3)]
+        for user in users:
+            Profile.objects.filter(user=user).update(cycle_length=28, last_period_start=today + timedelta(days=3 - 28),
+                                                     period_reminder_days_before=2)
+        # Queryset updates skip the signals: nothing is stored or scheduled yet
+        Prediction.objects.filter(user=users[0]).delete()
+        self.assertFalse(ReminderSchedule.objects.exists())
+        ids = [user.pk for user in users]
+
+        self.assertEqual(predictions.refresh_predictions(ids, today), 3)
+        self.assertEqual(list(Prediction.objects.filter(user__in=users).values_list('next_period_start', flat=True)),
+                         [today + timedelta(days=3)] * 3)
+        due = datetime.combine(today + timedelta(days=1), time(9, 0), tzinfo=dt_timezone.utc)
+        self.assertEqual(list(ReminderSchedule.objects.values_list('next_due_at', flat=True)), [due] * 3)
+
+        # Only the user whose forecast moved is rescheduled
+        Profile.objects.filter(user=users[1]).update(cycle_length=35)
+        with mock.patch('tracker.reminders.reschedule_users', wraps=reminders.reschedule_users) as reschedule:
+            predictions.refresh_predictions(ids, today)
+        reschedule.assert_called_once_with([users[1].pk])
+        self.assertEqual(ReminderSchedule.objects.get(user=users[1]).next_due_at, due + timedelta(days=7))
+
+
+class InPlaceBenchmark(benchmark_reminders.Command):
+    """The benchmark on the test database, rolled back after each run."""
+
+    @contextmanager
+    def throwaway_database(self):
+        with transaction.atomic():
+            yield
+            transaction.set_rollback(True)
+
+
+class BenchmarkRemindersTests(TestCase):
+    def run_benchmark(self, **options):
+        out = StringIO()
+        call_command(InPlaceBenchmark(), users=40, seed=3, tick_minutes=60, threads=2, stdout=out, **options)
+        return out.getvalue()
+
+    def test_save_then_compare(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            saved = f'{tmp}/baseline.json'
+            self.run_benchmark(save=saved)
+            with open(saved) as f:
+                baseline = json.load(f)
+            self.assertEqual((baseline['users'], baseline['seed']), (40, 3))
+            stages = baseline['stages']
+            self.assertEqual(list(stages), ['seed', 'period_reminders', 'scheduler_day', 'outbox'])
+            # Everything queued goes out through the locmem backend, and nothing outlives the run
+            self.assertGreater(stages['outbox']['messages'], 0)
+            self.assertEqual(stages['outbox']['messages'], stages['period_reminders']['messages'] + stages['scheduler_day']['messages'])
+            self.assertEqual(mail.outbox, [])
+            self.assertFalse(User.objects.filter(username__startswith='bench').exists())
+
+            # The same run again is within any sane threshold of itself
+            self.assertIn('Compared with', self.run_benchmark(compare=saved, threshold=10))
+
+            # A baseline that needed far fewer queries makes the comparison fail
+            stages['outbox']['queries'] = 1
+            with open(saved, 'w') as f:
+                json.dump(baseline, f)
+            with self.assertRaisesMessage(CommandError, 'outbox queries'):
+                self.run_benchmark(compare=saved)
+
+
+class StandInSMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for Django's backend; refuses recipients at bounce.example.com."""
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 stand-in ready')
+        recipients = []
+        while line := self.rfile.readline().decode().strip():
+            command = line[:4].upper()
+            if command in ('EHLO', 'HELO'):
+                self.reply('250 stand-in')
+            elif command == 'RCPT':
+                refused = 'bounce.example.com' in line
+                recipients += [] if refused else [line.split(':', 1)[1].strip(' <>')]
+                self.reply('451 try later' if refused else '250 ok')
+            elif command == 'DATA':
+                self.reply('354 go ahead')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                self.server.delivered += recipients
+                self.reply('250 queued')
+            elif command == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:  # MAIL, RSET, NOOP
+                recipients = [] if command in ('MAIL', 'RSET') else recipients
+                self.reply('250 ok')
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), StandInSMTPHandler)
+        self.server.daemon_threads = True
+        self.server.connections, self.server.delivered = 0, []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        smtp = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend', EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=self.server.server_address[1], EMAIL_USE_TLS=False, EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+        )
+        smtp.enable()
+        self.addCleanup(smtp.disable)
+
+    def email(self, key, to):
+        return OutboundEmail(idempotency_key=key, to_email=to, subject='Hello', body='Hi there')
+
+    def test_enqueue_is_idempotent(self):
+        self.assertEqual(outbox.enqueue([self.email('a', 'a@example.com'), self.email('a', 'a@example.com')]), 1)
+        self.assertEqual(outbox.enqueue([self.email('a', 'a@example.com'), self.email('b', 'b@example.com')]), 1)
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+
+    def test_worker_pool_delivers_and_backs_off_failures(self):
+        outbox.enqueue([self.email(f'm{i}', f'user{i}@example.com') for i in range(9)])
+        outbox.enqueue([self.email('bounce', 'someone@bounce.example.com')])
+
+        reports = list(outbox.drain(batch_size=4, threads=2))
+        self.assertEqual([r.claimed for r in reports], [4, 4, 2])
+        self.assertEqual(sum(r.sent for r in reports), 9)
+        self.assertEqual(sorted(self.server.delivered), sorted(f'user{i}@example.com' for i in range(9)))
+        self.assertLessEqual(self.server.connections, 6)  # one per thread per batch
+
+        bounced = OutboundEmail.objects.get(idempotency_key='bounce')
+        self.assertEqual((bounced.status, bounced.attempts), (OutboundEmail.PENDING, 1))
+        self.assertGreater(bounced.next_attempt_at, timezone.now() + timedelta(seconds=50))
+        self.assertIn('451', bounced.last_error)
+        # Not due again until the backoff passes
+        self.assertEqual(list(outbox.drain()), [])
+        self.assertEqual(outbox.retry_delay(3), timedelta(minutes=4))
+
+
+class ShardingTests(TestCase):
+    def test_shards_partition_users(self):
+        users = [User.objects.create_user(f'shard{i}', f'shard{i}@example.com', 'secret') for i in range(10)]
+        self.assertEqual(sharding.parse_shard('3/8'), sharding.Shard(2, 8))
+        with self.assertRaises(ValueError):
+            sharding.parse_shard('9/8')
+
+        profiles = Profile.objects.filter(user__in=users)
+        node = sharding.parse_shard('2/3')
+        parts = [set(sharding.filter_shard(profiles, part).values_list('user_id', flat=True))
+                 for part in sharding.split(node, 2)]
+        self.assertFalse(parts[0] & parts[1])
+        self.assertEqual(parts[0] | parts[1], {u.pk for u in users if u.pk % 3 == 1})
+
+
+class CommentFeedQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('noor', 'noor@example.com', 'secret')
+        self.client.force_login(self.user)
+        self.prompt = CommunityPrompt.objects.create(title='What helps on hard days?')
+
+    def add_comments(self, count):
+        for i in range(count):
+            author = User.objects.create_user(f'author{CommunityComment.objects.count()}', first_name='Sam', password='x')
+            CommunityComment.objects.create(prompt=self.prompt, user=author, content=f'c{i}', is_anonymous=i % 3 == 0)
+        CommunityComment.objects.create(prompt=self.prompt, user=self.user, content='mine')
+
+    def page_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('prompt_detail', args=[self.prompt.id]))
+        return response, len(queries)
+
+    def test_queries_do_not_grow_with_page_size(self):
+        self.add_comments(1)
+        _, few = self.page_queries()
+        self.add_comments(8)
+        response, full_page = self.page_queries()
+        self.assertEqual(len(response.context['comments']), 10)
+        self.assertEqual(few, full_page)
+
+        html = response.context['comments_html']
+        self.assertIn('<strong>noor</strong>', html)
+        self.assertIn('<strong>Anonymous</strong>', html)
+        self.assertIn('<strong>Sam</strong>', html)
+        # Only this user's own two comments are editable
+        self.assertEqual(html.count('>Edit</a>'), 2)
+
+    def test_fragment_cache_is_shared_and_invalidated_by_writes(self):
+        self.add_comments(3)
+        _, cold = self.page_queries()
+        response, warm = self.page_queries()
+        self.assertLess(warm, cold)
+
+        # Another viewer gets the cached comments without this user's edit buttons
+        other = User.objects.create_user('kai', password='x')
+        self.client.force_login(other)
+        with CaptureQueriesContext(connection) as queries:
+            html = self.client.get(reverse('prompt_detail', args=[self.prompt.id])).context['comments_html']
+        self.assertEqual(len(queries), warm)
+        self.assertNotIn('>Edit</a>', html)
+
+        self.client.post(reverse('prompt_detail', args=[self.prompt.id]), {'content': 'fresh reply'})
+        response, _ = self.page_queries()
+        self.assertIn('fresh reply', response.context['comments_html'])
+        self.assertEqual(response.context['comments_html'].count('>Edit</a>'), 1)
+
+
+    def test_invalid_cursors_share_the_first_page_key(self):
+        self.add_comments(12)
+        bad_values = pagination.encode_cursor('next', ['not a time', 'x'])
+        first = self.client.get(reverse('prompt_detail', args=[self.prompt.id])).context['comments']
+        with mock.patch('tracker.fragments.get_cached', wraps=fragments.get_cached) as get_cached:
+            for cursor in ('junk', bad_values, pagination.encode_cursor('next', [1])):
+                response = self.client.get(reverse('prompt_detail', args=[self.prompt.id]), {'page': cursor})
+                self.assertEqual(response.context['comments'].next_cursor, first.next_cursor)
+            self.client.get(reverse('prompt_detail', args=[self.prompt.id]), {'page': first.next_cursor})
+            for cursor in ('junk', bad_values):
+                self.client.get(reverse('prompt_directory_json'), {'cursor': cursor})
+            self.client.get(reverse('prompt_directory_json'))
+        keys = [call.args[0] for call in get_cached.call_args_list]
+        # One key for the first comments page, one for the second, one for the directory
+        self.assertEqual(len(set(keys)), 3)
+
+    def test_fragment_versions_live_in_the_database(self):
+        scope = f'prompt:{self.prompt.id}'
+        key = fragments.fragment_key(scope, 'comments')
+        # A cache without the version (another worker's) builds the same key
+        cache.clear()
+        self.assertEqual(fragments.fragment_key(scope, 'comments'), key)
+
+        stale = CommunityPrompt.objects.get(pk=self.prompt.pk)
+        CommunityComment.objects.create(prompt=self.prompt, content='hi', name='a')
+        self.assertEqual(fragments.version(scope), 1)
+        # Saving an instance loaded before that bump still moves the version on
+        stale.content = 'More detail'
+        stale.save()
+        stale.save(update_fields=['content'])
+        self.assertEqual(fragments.version(scope), 3)
+
+        self.assertIsNone(fragments.version('comments'))
+        CommunityComment.objects.create(content='general', name='b')
+        self.assertEqual(fragments.version('comments'), 1)
+        prompts = fragments.version('prompts')
+        self.prompt.delete()
+        self.assertIsNone(fragments.version(scope))
+        self.assertEqual(fragments.version('prompts'), prompts + 1)
+
+
+class PromptActivityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('ria', 'ria@example.com', 'secret')
+        self.client.force_login(self.user)
+        self.quiet = CommunityPrompt.objects.create(title='Quiet')
+        self.busy = CommunityPrompt.objects.create(title='Busy')
+
+    def test_counters_follow_comments(self):
+        first = CommunityComment.objects.create(prompt=self.busy, content='one', name='a')
+        latest = CommunityComment.objects.create(prompt=self.busy, content='two', name='b')
+        self.busy.refresh_from_db()
+        self.assertEqual((self.busy.comment_count, self.busy.last_activity_at), (2, latest.created_at))
+
+        latest.delete()
+        self.busy.refresh_from_db()
+        self.assertEqual((self.busy.comment_count, self.busy.last_activity_at), (1, first.created_at))
+
+        response = self.client.get(reverse('community'), {'prompts': 'trending'})
+        html = response.context['prompts_html']
+        self.assertLess(html.index('Busy'), html.index('Quiet'))
+
+    def test_prompt_directory_pages_and_prefix_search(self):
+        CommunityPrompt.objects.bulk_create(
+            [CommunityPrompt(title=f'Self  care idea {i:02}', title_key=f'self care idea {i:02}') for i in range(12)]
+            + [CommunityPrompt(title='Self doubt', title_key='self doubt', is_public=False)]
+        )
+        url = reverse('prompt_directory_json')
+        titles, cursor = [], None
+        while True:
+            data = self.client.get(url, {'q': 'SELF care', **({'cursor': cursor} if cursor else {})}).json()
+            titles += [title for _, title in data['prompts']]
+            cursor = data['next']
+            if not cursor:
+                break
+        self.assertEqual(titles, [f'Self  care idea {i:02}' for i in range(12)])
+
+        response = self.client.get(reverse('prompt_directory'))
+        self.assertEqual([p.title for p in response.context['prompts']][:2], ['Busy', 'Quiet'])
+        # A new prompt shows up straight away despite the cached directory
+        self.client.post(reverse('add_community_prompt'), {'title': 'Bedtime routines', 'content': ''})
+        data = self.client.get(url, {'q': 'bed'}).json()
+        self.assertEqual([title for _, title in data['prompts']], ['Bedtime routines'])
+
+    def test_recount_repairs_drift(self):
+        CommunityComment.objects.create(prompt=self.quiet, content='hi', name='a')
+        CommunityPrompt.objects.update(comment_count=7)
+        community.recount_prompt_activity()
+        self.assertEqual(dict(CommunityPrompt.objects.values_list('title', 'comment_count')), {'Quiet': 1, 'Busy': 0})
+
+
+class CommentStreamTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('mia', password='secret')
+        self.prompt = CommunityPrompt.objects.create(title='Rest days')
+        self.client.force_login(self.user)
+        self.cookie = f"sessionid={self.client.cookies['sessionid'].value}"
+
+    def test_new_comments_reach_subscribed_streams(self):
+        earlier = CommunityComment.objects.create(prompt=self.prompt, user=self.user, content='Slept in')
+
+        async def scenario():
+            hub = broadcast.get_hub()
+            tabs = [
+                StreamClient(reverse('prompt_stream', args=[self.prompt.id]), self.cookie),
+                StreamClient(reverse('prompt_stream', args=[self.prompt.id]), self.cookie, query=f'after={earlier.id - 1}'),
+                StreamClient(reverse('community_stream'), self.cookie),
+                StreamClient(reverse('community_stream'), ''),
+            ]
+            tasks = [asyncio.create_task(tab.run(application)) for tab in tabs]
+            await asyncio.wait_for(tasks[-1], 5)
+            while hub.subscriber_count() < 3 or any(tab.status is None for tab in tabs):
+                await asyncio.sleep(0.01)
+            await sync_to_async(CommunityComment.objects.create)(prompt=self.prompt, user=self.user, content='Naps count')
+            await asyncio.wait_for(asyncio.gather(tabs[0].got_comment.wait(), tabs[1].got_comment.wait()), 5)
+            for tab in tabs:
+                tab.closed.set()
+            await asyncio.wait_for(asyncio.gather(*tasks), 5)
+            return tabs, hub.subscriber_count()
+
+        (live, replayed, general, stranger), left = async_to_sync(scenario)()
+        self.assertEqual([tab.status for tab in (live, replayed, general, stranger)], [200, 200, 200, 403])
+        self.assertIn(b'Naps count', live.body)
+        self.assertNotIn(b'Slept in', live.body)
+        # Reconnecting after an earlier id replays what was missed before going live
+        self.assertLess(replayed.body.index(b'Slept in'), replayed.body.index(b'Naps count'))
+        self.assertFalse(general.got_comment.is_set())
+        self.assertEqual(left, 0)
+
+
+class BackfillMigrationTests(TransactionTestCase):
+    """Migrations that add a derived table fill it from the entries already stored."""
+    before = [('tracker', '0037_keyset_index_tiebreak')]
+
+    def setUp(self):
+        self.executor = MigrationExecutor(connection)
+        self.executor.migrate(self.before)
+        apps = self.executor.loader.project_state(self.before).apps
+        user = apps.get_model('auth', 'User').objects.create(username='opal', password='!')
+        apps.get_model('tracker', 'Profile').objects.create(
+            user_id=user.pk, name='Opal', cycle_length=28, last_period_start=date.today() - timedelta(days=25),
+            period_reminder_days_before=2, pill_reminder_time=time(8, 0))
+        apps.get_model('tracker', 'DiaryEntry').objects.create(
+            user_id=user.pk, title='Morning walk', date=date(2024, 5, 1), mood='Calm', content='Cramps eased after walking')
+        self.user = User(pk=user.pk)
+        # Back to the latest state for the test body and for the next test
+        self.executor.loader.build_graph()
+        self.executor.migrate(self.executor.loader.graph.leaf_nodes())
+
+    def test_search_index_is_filled(self):
+        hits = search.SQLiteFTSBackend().search(self.user, 'cramp')
+        self.assertEqual([hit.category for hit in hits], ['diary'])
+        self.assertEqual(search.SQLiteFTSBackend().search(self.user, 'walk', category='diary')[0].object_id,
+                         DiaryEntry.objects.get().pk)
+
+    def test_autocomplete_terms_are_counted(self):
+        self.assertEqual(autocomplete.suggest(self.user, 'mor'), ['Morning', 'Morning walk'])
+        self.assertEqual(autocomplete.suggest(self.user, 'ca'), ['Calm'])
+
+    def test_reminders_are_scheduled(self):
+        self.assertEqual(Prediction.objects.get(user_id=self.user.pk).next_period_start, date.today() + timedelta(days=3))
+        schedule = dict(ReminderSchedule.objects.filter(user_id=self.user.pk).values_list('kind', 'next_due_at'))
+        self.assertEqual(schedule['period'], datetime.combine(date.today() + timedelta(days=1), time(9, 0), tzinfo=dt_timezone.utc))
+        self.assertEqual(schedule['pill'].time(), time(8, 0))
@@ -13,6 +13,7 @@ urlpatterns = [
     path('welcome/', views.welcome, name='welcome'),
 
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('api/dashboard/<str:series>/', views.dashboard_history_json, name='dashboard_history_json'),
     path('wellness-update/', views.wellness_update, name='wellness_update'),
     path('cycle-phases/', views.cycle_phases, name='cycle_phases'),
 
@@ -26,6 +27,7 @@ urlpatterns = [
     path('cycles_json/', views.cycles_json, name='cycles_json'),
     path('api/cycles/', views.cycles_json, name='api_cycles'),
     path('api/mood-cravings/', views.mood_cravings_json, name='mood_cravings_json'),
+    path('api/charts/', views.charts_json, name='charts_json'),
 
     path('add_symptom/', views.add_symptom, name='add_symptom'),
     path('symptom_json/', views.symptom_json, name='symptom_json'),
@@ -38,6 +40,8 @@ urlpatterns = [
     path('diary/delete/<int:entry_id>/', views.delete_diary, name='delete_diary'),
     path('diary/history/', views.diary_history, name='diary_history'),
     path('diary_entries_json/', views.diary_entries_json, name='diary_entries_json'),
+    path('diary/<int:entry_id>/json/', views.diary_entry_json, name='diary_entry_json'),
+    path('diary/export/', views.diary_export, name='diary_export'),
 
     path('diary/log-mood/', views.log_mood_checkin, name='log_mood_checkin'),
     path('diary/log-gratitude/', views.log_gratitude, name='log_gratitude'),
@@ -56,10 +60,16 @@ urlpatterns = [
     path('selfcare/delete/<int:entry_id>/', views.delete_selfcare, name='delete_selfcare'),
 
     path('search/', views.site_search, name='site_search'),
+    path('search/json/', views.search_json, name='search_json'),
+    path('api/autocomplete/', views.autocomplete_json, name='autocomplete_json'),
 
     path('community/', views.community, name='community'),
     path('community/add_prompt/', views.add_community_prompt, name='add_community_prompt'),
     path('community/prompt/<int:prompt_id>/', views.prompt_detail, name='prompt_detail'),
+    path('community/prompts/', views.prompt_directory, name='prompt_directory'),
+    path('community/stream/', views.comment_stream, name='community_stream'),
+    path('community/prompt/<int:prompt_id>/stream/', views.comment_stream, name='prompt_stream'),
+    path('api/community/prompts/', views.prompt_directory_json, name='prompt_directory_json'),
     path('community/comment/edit/<int:comment_id>/', views.edit_comment, name='edit_comment'),
     path('community/comment/delete/<int:comment_id>/', views.delete_comment, name='delete_comment'),
 ]
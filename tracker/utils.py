@@ -1,38 +1,36 @@
-from django.core.mail import send_mail
-from django.utils import timezone
+import time
+from collections import namedtuple
 from datetime import timedelta
-from tracker.models import Profile
+
+from django.utils import timezone
+from tracker.models import OutboundEmail, Profile
+from tracker.outbox import enqueue
+from tracker.sharding import filter_shard
+from tracker.stats import get_cycle_stats
+from tracker.predictions import get_prediction
 
 def get_avg_cycle_length(user):
-    return 28  # Replace with real logic
+    """Average start-to-start cycle length in days, or None before two cycles are logged."""
+    return get_cycle_stats(user).avg_cycle_length
 
 def get_most_common_flow(user):
-    return "Medium"  # Replace with real logic
+    return get_cycle_stats(user).most_common_flow
 
 def get_irregular_count(user):
-    return 2  # Replace with real logic
+    return get_cycle_stats(user).irregular_count
 
 def get_cycle_trend(user):
-    return "Stable"  # Replace with real logic
+    return get_cycle_stats(user).trend
 
 def get_affirmation():
     return "You are in tune with your body 💜"
 
-from datetime import date
-
-def predict_phase(target_date):
-    """Return predicted cycle phase based on day of cycle."""
-    day = target_date.day % 28  # Simplified 28-day cycle
-    if 1 <= day <= 5:
-        return "Menstrual Phase"
-    elif 6 <= day <= 13:
-        return "Follicular Phase"
-    elif 14 <= day <= 16:
-        return "Ovulation Phase"
-    elif 17 <= day <= 28:
-        return "Luteal Phase"
-    else:
-        return "Unknown"
+def predict_phase(user, target_date):
+    """Return the predicted cycle phase on target_date from the user's stored prediction."""
+    phase = get_prediction(user).phase_on(target_date)
+    if phase in ("Menstrual", "Follicular", "Ovulation", "Luteal"):
+        return f"{phase} Phase"
+    return "Unknown"
 
 def get_tip_for_phase(phase):
     """Return a wellness tip based on cycle phase."""
@@ -45,22 +43,52 @@ def get_tip_for_phase(phase):
     }
     return tips.get(phase, "Take care of yourself today.")
 
-def send_period_reminders():
+# Period reminders
+ReminderReport = namedtuple('ReminderReport', 'queued elapsed rate')
+
+
+def period_reminder_message(profile, day):
+    return OutboundEmail(
+        idempotency_key=f"period:{profile.user_id}:{day.isoformat()}",
+        user_id=profile.user_id,
+        to_email=profile.user.email,
+        subject="🌸 Period Reminder",
+        body=f"Hi {profile.name}, just a gentle reminder that your period is expected soon.",
+    )
+
+
+def due_period_reminders(today, shard=None):
+    """Return the profiles (in ``shard``, if given) whose period reminder falls on ``today`` and has not been sent yet."""
+    profiles = (
+        Profile.objects.filter(email_reminders_enabled=True, period_reminder_days_before__gt=0)
+        .exclude(user__email='')
+        .exclude(last_reminder_sent=today)
+        .select_related('user', 'user__prediction')
+    )
+    due = []
+    for profile in filter_shard(profiles, shard).iterator(chunk_size=2000):
+        prediction = getattr(profile.user, 'prediction', None)
+        next_period = prediction.next_start_after(today) if prediction else None
+        if next_period and next_period - timedelta(days=profile.period_reminder_days_before) == today:
+            due.append(profile)
+    return due
+
+
+def queue_period_reminders(shard=None):
+    """Queue an email for every profile whose period reminder is due today.
+
+    The messages are built up front and enqueued in bulk; the outbox worker sends
+    them. ``last_reminder_sent`` is recorded with a single bulk update. Returns a
+    ReminderReport.
+    """
     today = timezone.now().date()
-    profiles = Profile.objects.filter(email_reminders_enabled=True).exclude(period_reminder_days_before__isnull=True)
-
-    for profile in profiles:
-        if profile.last_period_start and profile.period_reminder_days_before:
-            reminder_date = profile.last_period_start - timedelta(days=profile.period_reminder_days_before)
-            if reminder_date == today:
-                send_mail(
-                    subject="🌸 Period Reminder",
-                    message=f"Hi {profile.name}, just a gentle reminder that your period is expected soon.",
-                    from_email=None,
-                    recipient_list=[profile.user.email],
-                    fail_silently=False,
-                )
-                profile.last_reminder_sent = today
-                profile.save()
-                print(f"Sent period reminder to {profile.user.email}")
+    started = time.perf_counter()
+    due = due_period_reminders(today, shard)
+    queued = enqueue(period_reminder_message(profile, today) for profile in due)
+    for profile in due:
+        profile.last_reminder_sent = today
+    # bulk_update skips save(): no data version bump or prediction refresh for a bookkeeping date
+    Profile.objects.bulk_update(due, ['last_reminder_sent'], batch_size=500)
 
+    elapsed = time.perf_counter() - started
+    return ReminderReport(queued, elapsed, queued / elapsed if elapsed else 0.0)
@@ -3,17 +3,34 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db.models import Q
-from .models import Cycle, Symptom, Profile, FlowDay, Craving, DiaryEntry, SelfCareEntry, GratitudeEntry, MoodCheckin, PromptAnswer, CommunityComment, CommunityPrompt
+from .models import Cycle, Symptom, Profile, FlowDay, Craving, DiaryEntry, SelfCareEntry, GratitudeEntry, MoodCheckin, PromptAnswer, CommunityComment, CommunityPrompt, make_title_key
+from .analytics import ROLLING_WINDOW, cycle_series, load_cycle_arrays
+from .stats import get_cycle_stats
+from .predictions import PHASE_CARE_TIPS, get_prediction
+from . import aggregates, autocomplete, charts, fragments, search
+from .caching import dashboard_cache_key, get_cached, user_data_conditional
+from .pagination import KeysetPaginator, decode_cursor, encode_cursor
+from .sync import InvalidCursor, changes_since, parse_since
 from .forms import ProfileForm, CycleForm, SymptomForm, FlowDayForm, CravingForm, DiaryForm, SelfCareForm, SignUpForm, GratitudeForm, PromptAnswerForm, CommunityCommentForm, CommunityPromptForm
-from statistics import mean
+import json
 import random
 from datetime import datetime, timedelta, date
-from collections import Counter
-from django.core.paginator import Paginator
 from django.http import HttpResponseRedirect
+from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils.dateparse import parse_date
+
+def date_range(request):
+    """Read optional ?start=YYYY-MM-DD&end=YYYY-MM-DD filters from the query string."""
+    def _parse(value):
+        try:
+            return parse_date(value) if value else None
+        except ValueError:
+            return None
+    return _parse(request.GET.get('start')), _parse(request.GET.get('end'))
 
 # Public pages
 def home(request):
@@ -51,97 +68,76 @@ def sign_up(request):
     return render(request, 'tracker/registration/sign_up.html', {'form': form})
 
 # Dashboard - Main display
-@login_required
-def dashboard(request):
-    """ Render the main dashboard for the logged-in user."""
-    profile = Profile.objects.get(user=request.user)
+DASHBOARD_CYCLE_WINDOW = 6
+DASHBOARD_DAY_WINDOW = 90
+DASHBOARD_PAGE_SIZE = 30
+
+def _history_series(user, profile):
+    """Per-series (values queryset, keyset ordering) used by the dashboard window and its load-more endpoint."""
+    return {
+        'cycles': (
+            Cycle.objects.filter(user=user).values('id', 'start_date', 'end_date', 'flow_type'),
+            ('-start_date', '-id'),
+        ),
+        'symptoms': (
+            Symptom.objects.filter(profile=profile, date__isnull=False).values('id', 'date', 'mood', 'cramps'),
+            ('-date', '-id'),
+        ),
+        'cravings': (
+            Craving.objects.filter(profile=profile).values('id', 'date', 'craving_type'),
+            ('-date', '-id'),
+        ),
+        'flow_days': (
+            FlowDay.objects.filter(user=user).values('id', 'date', 'intensity'),
+            ('-date', '-id'),
+        ),
+        'diary': (
+            DiaryEntry.objects.filter(user=user).values('id', 'date', 'title', 'mood'),
+            ('-date', '-id'),
+        ),
+    }
 
-    # Fetch user-specific data (explicitly filtered)
-    cycles = Cycle.objects.filter(user=request.user).order_by('-start_date')
-    symptoms = Symptom.objects.filter(profile=profile).order_by('-date')
-    cravings = Craving.objects.filter(profile=profile).order_by('-date')
-    flow_days = FlowDay.objects.filter(cycle__user=request.user).order_by('date')
-    diary_entries = DiaryEntry.objects.filter(user=request.user).order_by('date')
-    latest_selfcare = SelfCareEntry.objects.filter(user=request.user).order_by('-date').first()
-
-    # Cycle calculations: collect durations and compute average cycle length
-    cycle_lengths = [c.duration() for c in cycles if c.duration()]
-    avg_cycle_length = int(mean(cycle_lengths)) if cycle_lengths else getattr(profile, 'cycle_length', None)
-
-    # Flow types & irregular count
-    flow_types = [c.flow_type for c in cycles if c.flow_type]
-    most_common_flow = Counter(flow_types).most_common(1)[0][0] if flow_types else "Unknown"
-    irregular_count = sum(1 for c in cycles if c.flow_type == "Irregular")
-
-    # Simple trend detection (compare first half vs second half)
-    trend = "Stable"
-    if len(cycle_lengths) >= 4:
-        mid = len(cycle_lengths) // 2
-        first_half = cycle_lengths[:mid]
-        second_half = cycle_lengths[mid:]
-        if mean(second_half) > mean(first_half) + 1:
-            trend = "Getting longer"
-        elif mean(second_half) < mean(first_half) - 1:
-            trend = "Getting shorter"
-
-    # Cycle Predictions
-    next_period_date = predicted_phase = care_tip = None
-
-    # Only attempt predictions when we have at least 2 cycles and an avg length
-    if len(cycles) >= 2 and avg_cycle_length:
-        # Sort cycles by start_date descending (most recent first), guard against None
-        cycles = sorted(cycles, key=lambda c: c.start_date or date.min, reverse=True)
-        last_cycle = cycles[0]
-
-        reference_date = last_cycle.end_date or last_cycle.start_date
-        if reference_date and last_cycle.start_date:
-            try:
-                days_to_add = int(avg_cycle_length)
-            except Exception:
-                days_to_add = avg_cycle_length or 28
-
-            next_period_date = reference_date + timedelta(days=days_to_add)
-            today = date.today()
-            days_since_last_start = (today - last_cycle.start_date).days
-
-            if days_since_last_start < 0:
-                predicted_phase = "Between cycles"
-            elif days_since_last_start <= 5:
-                predicted_phase = "Menstrual"
-            elif 6 <= days_since_last_start <= 13:
-                predicted_phase = "Follicular"
-            elif 14 <= days_since_last_start <= 15:
-                predicted_phase = "Ovulation"
-            elif 16 <= days_since_last_start <= days_to_add:
-                predicted_phase = "Luteal"
-            else:
-                predicted_phase = "Between cycles"
-
-            # Care tips per phase
-            phase_care_tips = {
-                "Menstrual": "Rest, nourish your body, and prioritize gentle self-care.",
-                "Follicular": "Plan, create, and enjoy rising energy.",
-                "Ovulation": "Connect, collaborate, and embrace confidence.",
-                "Luteal": "Slow down, reflect, and support your emotional needs.",
-                "Between cycles": "Track your next cycle start to stay in sync."
-            }
-            care_tip = phase_care_tips.get(predicted_phase, "Listen to your body and rest as needed.")
-        else:
-            next_period_date = predicted_phase = care_tip = None
+def _history_paginator(series, queryset, ordering, today=None):
+    """Paginate one history series: the dashboard's recent window when ``today`` is given, else the load-more pages."""
+    if today is None:
+        return KeysetPaginator(queryset, ordering, DASHBOARD_PAGE_SIZE)
+    if series == 'cycles':
+        return KeysetPaginator(queryset, ordering, DASHBOARD_CYCLE_WINDOW)
+    since = today - timedelta(days=DASHBOARD_DAY_WINDOW)
+    return KeysetPaginator(queryset.filter(**{f"{ordering[0].lstrip('-')}__gte": since}), ordering, DASHBOARD_PAGE_SIZE)
+
+def _dashboard_data(user, profile, today):
+    """Compute the data-dependent part of the dashboard (cached per data version)."""
+    # Only a bounded recent window is rendered; older rows load from dashboard_history_json
+    history = {}
+    history_cursors = {}
+    for series, (queryset, ordering) in _history_series(user, profile).items():
+        paginator = _history_paginator(series, queryset, ordering, today)
+        window = paginator.page().object_list
+        history[series] = window
+        history_cursors[series] = paginator.cursor_after(window[-1]) if window else None
 
-    # Flow chart data for client-side charting (user-scoped)
-    intensity_map = {'Light': 1, 'Medium': 2, 'Heavy': 3}
-    color_map = {'Light': '#F4E1D2', 'Medium': '#A18BD0', 'Heavy': '#ECA1A6'}
+    latest_selfcare = SelfCareEntry.objects.filter(user=user).order_by('-date').first()
 
-    flow_chart_data = {
-        'labels': [fd.date.strftime('%Y-%m-%d') for fd in flow_days],
-        'values': [intensity_map.get(fd.intensity, 0) for fd in flow_days],
-        'colors': [color_map.get(fd.intensity, '#cccccc') for fd in flow_days]
-    }
+    # Cycle statistics are precomputed whenever a cycle is saved or deleted
+    stats = get_cycle_stats(user)
+    avg_cycle_length = stats.avg_cycle_length if stats.avg_cycle_length is not None else getattr(profile, 'cycle_length', None)
+    most_common_flow = stats.most_common_flow
+    irregular_count = stats.irregular_count
+    trend = stats.trend
+
+    # Cycle predictions are read from the stored forecast (see tracker.predictions)
+    prediction = get_prediction(user)
+    next_period_date = prediction.next_start_after(today)
+    predicted_phase = prediction.phase_on(today)
+    care_tip = PHASE_CARE_TIPS.get(predicted_phase, "Listen to your body and rest as needed.") if predicted_phase else None
+
+    # Flow chart data for client-side charting (user-scoped)
+    flow_chart_data = charts.flow_chart(user, profile, today - timedelta(days=DASHBOARD_DAY_WINDOW))
 
-    # Combined Mood and Craving data
-    mood_counts = Counter([s.mood for s in symptoms])
-    craving_counts = Counter([c.craving_type for c in cravings])
+    # Combined Mood and Craving data (grouped in SQL)
+    mood_counts = aggregates.mood_counts(profile)
+    craving_counts = aggregates.craving_counts(profile)
     combined_labels = list(set(mood_counts.keys()) | set(craving_counts.keys()))
     combined_chart_data = {
         'labels': combined_labels,
@@ -149,6 +145,33 @@ def dashboard(request):
         'cravings': [craving_counts.get(label, 0) for label in combined_labels]
     }
 
+    return {
+        'avg_cycle_length': avg_cycle_length,
+        'next_period_date': next_period_date,
+        'predicted_phase': predicted_phase,
+        'care_tip': care_tip,
+        'most_common_flow': most_common_flow,
+        'irregular_count': irregular_count,
+        'cycle_trend': trend,
+        'flow_chart_data': flow_chart_data,
+        'combined_chart_data': combined_chart_data,
+        'latest_selfcare': latest_selfcare,
+        'history': history,
+        'history_cursors': history_cursors,
+    }
+
+@login_required
+def dashboard(request):
+    """ Render the main dashboard for the logged-in user."""
+    profile = Profile.objects.get(user=request.user)
+    today = date.today()
+
+    # Charts, stats, predictions and the recent-history window only change when the user's data does
+    data = get_cached(
+        dashboard_cache_key(request.user.pk, profile.data_version, today),
+        lambda: _dashboard_data(request.user, profile, today),
+    )
+
     # Daily affirmation and reminders
     affirmations = [
         "You are strong, capable, and radiant.",
@@ -175,18 +198,13 @@ def dashboard(request):
     ]
     daily_affirmation = random.choice(affirmations)
 
-    today = date.today()
     now = datetime.now().time()
     show_period_reminder = False
     show_pill_reminder = False
 
-    if getattr(profile, "last_period_start", None) and getattr(profile, "cycle_length", None):
-        try:
-            next_period = profile.last_period_start + timedelta(days=profile.cycle_length)
-            reminder_day = next_period - timedelta(days=profile.period_reminder_days_before or 0)
-            show_period_reminder = today == reminder_day
-        except Exception:
-            show_period_reminder = False
+    if data['next_period_date']:
+        reminder_day = data['next_period_date'] - timedelta(days=profile.period_reminder_days_before or 0)
+        show_period_reminder = today == reminder_day
 
     if getattr(profile, "pill_reminder_time", None):
         if now.hour == profile.pill_reminder_time.hour and abs(now.minute - profile.pill_reminder_time.minute) <= 5:
@@ -194,28 +212,31 @@ def dashboard(request):
 
     context = {
         'profile': profile,
-        'cycles': cycles,
-        'symptoms': symptoms,
-        'cravings': cravings,
-        'flow_days': flow_days,
-        'diary_entries': diary_entries,
-        'avg_cycle_length': avg_cycle_length,
-        'next_period_date': next_period_date,
-        'predicted_phase': predicted_phase,
-        'care_tip': care_tip,
-        'most_common_flow': most_common_flow,
-        'irregular_count': irregular_count,
-        'cycle_trend': trend,
-        'flow_chart_data': flow_chart_data,
-        'combined_chart_data': combined_chart_data,
+        'cycles': data['history']['cycles'],
+        'symptoms': data['history']['symptoms'],
+        'cravings': data['history']['cravings'],
+        'flow_days': data['history']['flow_days'],
+        'diary_entries': data['history']['diary'],
         'daily_affirmation': daily_affirmation,
         'show_period_reminder': show_period_reminder,
         'show_pill_reminder': show_pill_reminder,
-        'latest_selfcare': latest_selfcare,
+        **data,
     }
 
     return render(request, 'tracker/main/dashboard.html', context)
 
+@login_required
+@user_data_conditional
+def dashboard_history_json(request, series):
+    """Return the next keyset page of one dashboard series, older than ?cursor=.
+    JSON: { items: [...], next: cursor-or-null }"""
+    profile = Profile.objects.get(user=request.user)
+    all_series = _history_series(request.user, profile)
+    if series not in all_series:
+        return JsonResponse({'error': 'Unknown series.'}, status=404)
+    page = _history_paginator(series, *all_series[series]).page(request.GET.get('cursor'))
+    return JsonResponse({'items': page.object_list, 'next': page.next_cursor})
+
 # Profile
 @login_required
 def profile(request):
@@ -244,44 +265,90 @@ def profile(request):
     })
 
 # Site search
+SEARCH_TOP_N = 5
+SEARCH_PAGE_SIZE = 20
+# "n more" counts stop here, so a very common word never counts a whole history
+SEARCH_COUNT_CAP = 500
+# Where a search hit links to, by category; categories without an edit page are not linked
+SEARCH_RESULT_URLS = {
+    'diary': 'edit_diary',
+    'prompts': 'edit_prompt',
+    'gratitude': 'edit_gratitude',
+    'selfcare': 'edit_selfcare',
+}
+
+def _search_result(hit):
+    url_name = SEARCH_RESULT_URLS.get(hit.category)
+    return {'hit': hit, 'url': reverse(url_name, args=[hit.object_id]) if url_name else None}
+
 @login_required
 def site_search(request):
-    """Search across different models for the logged-in user."""
-    query = request.GET.get('q')
-    if not query:
-        return render(request, 'tracker/search_results.html', {'query': '', 'results': {}})
-
-    results = {
-        'diary': DiaryEntry.objects.filter(
-            Q(title__icontains=query) |
-            Q(content__icontains=query) |
-            Q(short_term__icontains=query) |
-            Q(medium_term__icontains=query) |
-            Q(long_term__icontains=query)
-        ).filter(user=request.user),
-        'cycles': Cycle.objects.filter(
-            Q(notes__icontains=query) |
-            Q(flow_type__icontains=query)
-        ).filter(user=request.user),
-        'symptoms': Symptom.objects.filter(
-            Q(symptom_type__icontains=query) | Q(notes__icontains=query)
-        ).filter(profile__user=request.user),
-        'cravings': Craving.objects.filter(
-            Q(craving_type__icontains=query) | Q(notes__icontains=query)
-        ).filter(profile__user=request.user),
-        'flow_days': FlowDay.objects.filter(
-            Q(intensity__icontains=query) | Q(notes__icontains=query)
-        ).filter(cycle__user=request.user),
-        'selfcare': SelfCareEntry.objects.filter(Q(notes__icontains=query)).filter(user=request.user),
-        'gratitude': GratitudeEntry.objects.filter(Q(content__icontains=query)).filter(user=request.user),
-        'prompts': PromptAnswer.objects.filter(Q(prompt__icontains=query) | Q(answer__icontains=query)).filter(user=request.user),
-    }
-
-    return render(request, 'tracker/search_results.html', {
+    """ Full-text search across the logged-in user's entries.
+    Shows the best SEARCH_TOP_N hits per category with a bounded "n more" count;
+    further hits load a page at a time from search_json."""
+    query = request.GET.get('q', '').strip()
+    sections = []
+    if query:
+        backend = search.get_backend()
+        for source in search.SEARCH_SOURCES:
+            hits = backend.search(request.user, query, limit=SEARCH_TOP_N + 1, category=source.category)
+            if not hits:
+                continue
+            more = 0
+            if len(hits) > SEARCH_TOP_N:
+                hits = hits[:SEARCH_TOP_N]
+                more = backend.count(request.user, query, source.category, cap=SEARCH_COUNT_CAP) - SEARCH_TOP_N
+            sections.append({
+                'category': source.category,
+                'label': source.label,
+                'results': [_search_result(hit) for hit in hits],
+                'more': more,
+                'more_capped': more + SEARCH_TOP_N >= SEARCH_COUNT_CAP,
+                'next': encode_cursor('next', hits[-1].sort_key) if more else None,
+            })
+    return render(request, 'tracker/pages/search_results.html', {
         'query': query,
-        'results': results,
+        'sections': sections,
     })
 
+@login_required
+@user_data_conditional
+def search_json(request):
+    """ Page through the search hits of one category.
+    ?q=<query>&category=<category>&cursor=<next from the previous page>
+    JSON: { items: [{id, title, snippet, date, url}, ...], next: cursor|null }
+    title and snippet are escaped HTML with matches wrapped in <mark>."""
+    query = request.GET.get('q', '').strip()
+    category = request.GET.get('category')
+    if category not in search.SOURCES_BY_CATEGORY:
+        return JsonResponse({'error': f"Unknown category: {category}"}, status=400)
+    decoded = decode_cursor(request.GET.get('cursor'))
+    after = decoded[1] if decoded else None
+
+    try:
+        hits = search.get_backend().search(request.user, query, limit=SEARCH_PAGE_SIZE + 1, category=category, after=after)
+    except (TypeError, ValueError):
+        return JsonResponse({'error': "Invalid cursor"}, status=400)
+    next_cursor = encode_cursor('next', hits[SEARCH_PAGE_SIZE - 1].sort_key) if len(hits) > SEARCH_PAGE_SIZE else None
+    items = []
+    for result in map(_search_result, hits[:SEARCH_PAGE_SIZE]):
+        hit = result['hit']
+        items.append({
+            'id': hit.object_id,
+            'title': hit.title,
+            'snippet': hit.snippet,
+            'date': hit.date.strftime('%Y-%m-%d') if hit.date else None,
+            'url': result['url'],
+        })
+    return JsonResponse({'items': items, 'next': next_cursor})
+
+@login_required
+@user_data_conditional
+def autocomplete_json(request):
+    """ Suggest completions for ?q=<prefix> from the user's own terms (titles, moods, cravings, prompts).
+    JSON: { suggestions: ["...", ...] }"""
+    return JsonResponse({'suggestions': autocomplete.suggest(request.user, request.GET.get('q', ''))})
+
 # Cycle and FlowDay creation
 @login_required
 def add_cycle(request):
@@ -373,24 +440,48 @@ def add_flow_day(request):
 
     return render(request, 'tracker/pages/add_flow_day.html', {'form': form})
 
+# Delta sync (?since=) for the JSON data endpoints
+def _delta_response(request, queryset, serialize):
+    """Answer a ?since=<cursor> sync request with the changed rows, deleted ids and a new cursor."""
+    try:
+        since = parse_since(request.GET.get('since'))
+    except InvalidCursor as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    changed, deleted, cursor = changes_since(queryset, request.user, since)
+    return JsonResponse({
+        'changed': [serialize(row) for row in changed],
+        'deleted': deleted,
+        'cursor': cursor,
+        'full': since is None,
+    })
+
 @login_required
+@user_data_conditional
 def flow_day_json(request):
-    flow_days = FlowDay.objects.filter(cycle__user=request.user).order_by('date')
-    intensity_map = {'Light': 1, 'Medium': 2, 'Heavy': 3}
-    color_map = {'Light': '#F4E1D2', 'Medium': '#A18BD0', 'Heavy': '#ECA1A6'}
-    labels = [fd.date.strftime('%Y-%m-%d') for fd in flow_days]
-    values = [intensity_map.get(fd.intensity, 0) for fd in flow_days]
-    colors = [color_map.get(fd.intensity, '#ccc') for fd in flow_days]
-    return JsonResponse({'labels': labels, 'values': values, 'colors': colors})
+    """Return flow days for the chart, or the changes since a cursor with ?since=."""
+    if 'since' in request.GET:
+        return _delta_response(
+            request, FlowDay.objects.filter(cycle__user=request.user).order_by('date', 'id'),
+            lambda fd: {'id': fd.id, 'cycle_id': fd.cycle_id, 'date': fd.date.strftime('%Y-%m-%d'), 'intensity': fd.intensity},
+        )
+    return JsonResponse(charts.flow_chart(request.user, None, *date_range(request)))
 
 @login_required
+@user_data_conditional
 def cycles_json(request):
-    """Return cycles data as JSON for charting/overview."""
-    cycles = Cycle.objects.filter(user=request.user).order_by('start_date')
-    labels = [c.start_date.strftime('%Y-%m-%d') for c in cycles]
-    durations = [c.duration() or 0 for c in cycles]
-    flows = [c.flow_type or '' for c in cycles]
-    return JsonResponse({'labels': labels, 'durations': durations, 'flows': flows})
+    """Return cycles data as JSON for charting/overview, or the changes since a cursor with ?since=."""
+    if 'since' in request.GET:
+        return _delta_response(
+            request, Cycle.objects.filter(user=request.user).order_by('start_date', 'id'),
+            lambda c: {
+                'id': c.id,
+                'start_date': c.start_date.strftime('%Y-%m-%d'),
+                'end_date': c.end_date.strftime('%Y-%m-%d') if c.end_date else None,
+                'duration': c.duration() or 0,
+                'flow_type': c.flow_type or '',
+            },
+        )
+    return JsonResponse(charts.cycles_chart(request.user, None, *date_range(request)))
 
 # Symptoms
 @login_required
@@ -413,12 +504,11 @@ def add_symptom(request):
     return render(request, 'tracker/pages/add_symptom.html', {'form': form})
 
 @login_required
+@user_data_conditional
 def symptom_json(request):
-    """ Return mood counts as JSON for charting."""
+    """ Return mood counts as JSON for charting. Accepts optional ?start=&end= dates."""
     profile = Profile.objects.get(user=request.user)
-    symptoms = Symptom.objects.filter(profile=profile).order_by('date')
-    mood_counts = Counter(s.mood for s in symptoms)
-    return JsonResponse({'labels': list(mood_counts.keys()), 'values': list(mood_counts.values())})
+    return JsonResponse(charts.moods_chart(request.user, profile, *date_range(request)))
 
 # Cravings
 @login_required
@@ -438,28 +528,34 @@ def add_craving(request):
     return render(request, 'tracker/pages/add_craving.html', {'form': form})
 
 @login_required
+@user_data_conditional
 def craving_json(request):
-    """Return craving counts as JSON for charting."""
+    """Return craving counts as JSON for charting. Accepts optional ?start=&end= dates."""
     profile = Profile.objects.get(user=request.user)
-    cravings = Craving.objects.filter(profile=profile).order_by('date')
-    craving_counts = Counter(c.craving_type for c in cravings)
-    return JsonResponse({'labels': list(craving_counts.keys()), 'values': list(craving_counts.values())})
+    return JsonResponse(charts.cravings_chart(request.user, profile, *date_range(request)))
 
 @login_required
+@user_data_conditional
 def mood_cravings_json(request):
     """ Return combined counts for moods and cravings for the current user.
+    Accepts optional ?start=&end= dates.
     JSON: { labels: [...], moods: [...], cravings: [...] }"""
     profile = Profile.objects.get(user=request.user)
-    symptoms = Symptom.objects.filter(profile=profile).order_by('date')
-    cravings = Craving.objects.filter(profile=profile).order_by('date')
-
-    mood_counts = Counter(s.mood for s in symptoms)
-    craving_counts = Counter(c.craving_type for c in cravings)
-    labels = list(sorted(set(mood_counts.keys()) | set(craving_counts.keys())))
-    moods = [mood_counts.get(l, 0) for l in labels]
-    cravings_values = [craving_counts.get(l, 0) for l in labels]
+    return JsonResponse(charts.mood_cravings_chart(request.user, profile, *date_range(request)))
 
-    return JsonResponse({'labels': labels, 'moods': moods, 'cravings': cravings_values})
+@login_required
+@user_data_conditional
+def charts_json(request):
+    """ Return several chart series in one response, sharing one profile lookup.
+    ?series=flow,cycles,moods,cravings,mood_cravings,selfcare,diary (default: all)
+    plus optional ?start=&end= dates applied to every series.
+    JSON: { <series>: <same payload as the single-series endpoint>, ... }"""
+    requested = list(dict.fromkeys(s.strip() for s in request.GET.get('series', '').split(',') if s.strip()))
+    unknown = [s for s in requested if s not in charts.CHART_SERIES]
+    if unknown:
+        return JsonResponse({'error': f"Unknown series: {', '.join(unknown)}"}, status=400)
+    profile = Profile.objects.get(user=request.user)
+    return JsonResponse(charts.build_charts(request.user, profile, requested or charts.CHART_SERIES, *date_range(request)))
 
 # Prompt of the day
 def get_prompt_of_the_day():
@@ -536,10 +632,7 @@ def diary_page(request):
             Q(long_term__icontains=query)
         )
 
-    entries = entries.order_by('-date')
-    paginator = Paginator(entries, 6)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = KeysetPaginator(entries, ('-date', '-id'), 6).page(request.GET.get('page'))
 
     # Add mood emoji to each entry
     MOOD_EMOJI = {
@@ -550,16 +643,12 @@ def diary_page(request):
         entry.mood_icon = MOOD_EMOJI.get(entry.mood, "📝")
 
     # Paginate prompt answers
-    prompt_qs = PromptAnswer.objects.filter(user=request.user).order_by('-date')
-    prompt_pag = Paginator(prompt_qs, 2)
-    prompt_page = request.GET.get('prompt_page')
-    prompt_answers = prompt_pag.get_page(prompt_page)
+    prompt_qs = PromptAnswer.objects.filter(user=request.user)
+    prompt_answers = KeysetPaginator(prompt_qs, ('-date', '-id'), 2).page(request.GET.get('prompt_page'))
 
     # Paginate gratitude entries
-    gratitude_qs = GratitudeEntry.objects.filter(user=request.user).order_by('-date')
-    gratitude_pag = Paginator(gratitude_qs, 2)
-    gratitude_page = request.GET.get('gratitude_page')
-    gratitude_entries = gratitude_pag.get_page(gratitude_page)
+    gratitude_qs = GratitudeEntry.objects.filter(user=request.user)
+    gratitude_entries = KeysetPaginator(gratitude_qs, ('-date', '-id'), 2).page(request.GET.get('gratitude_page'))
 
     return render(request, 'tracker/main/diary_page.html', {
         'entries': page_obj,
@@ -595,7 +684,7 @@ def delete_diary(request, entry_id):
 def diary_history(request):
     """View paginated diary history with optional date filtering."""
 
-    entries = DiaryEntry.objects.filter(user=request.user).order_by('-date')
+    entries = DiaryEntry.objects.filter(user=request.user)
 
     # Optional date filtering
     start = request.GET.get('start_date')
@@ -605,9 +694,7 @@ def diary_history(request):
     if end:
         entries = entries.filter(date__lte=end)
 
-    paginator = Paginator(entries, 5)  # Show 5 entries per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = KeysetPaginator(entries, ('-date', '-id'), 5).page(request.GET.get('page'))  # Show 5 entries per page
 
     return render(request, 'tracker/pages/diary_history.html', {'entries': page_obj})
 
@@ -719,17 +806,72 @@ def delete_gratitude(request, pk):
     return redirect('diary_page')
 
 # Calendar and JSON endpoints
-@login_required
-def diary_entries_json(request):
-    """Return diary entries as JSON for calendar usage."""
-    entries = DiaryEntry.objects.filter(user=request.user).order_by('date')
-    data = [{
+DIARY_CALENDAR_PAGE_SIZE = 200
+DIARY_EXPORT_FIELDS = ('id', 'date', 'title', 'mood', 'custom_mood', 'content', 'short_term', 'medium_term', 'long_term')
+
+def _diary_entry_data(entry):
+    return {
         'id': entry.id,
         'title': entry.title or 'Diary Entry',
         'date': entry.date.strftime('%Y-%m-%d'),
         'content': entry.content
-    } for entry in entries]
-    return JsonResponse(data, safe=False)
+    }
+
+@login_required
+@user_data_conditional
+def diary_entries_json(request):
+    """ Return diary entry summaries for the calendar, without content.
+    Accepts ?start=&end= dates (the visible range) and ?cursor= from the previous
+    response's "next". Full entries come from diary_entry_json.
+    With ?since= returns full entries changed since a sync cursor instead.
+    JSON: { entries: [{id, title, date, excerpt}, ...], next: cursor|null }"""
+    entries = DiaryEntry.objects.filter(user=request.user)
+    if 'since' in request.GET:
+        return _delta_response(request, entries.order_by('date', 'id'), _diary_entry_data)
+
+    start, end = date_range(request)
+    if start:
+        entries = entries.filter(date__gte=start)
+    if end:
+        entries = entries.filter(date__lte=end)
+    summaries = entries.values_list('id', 'title', 'date', 'excerpt', named=True)
+    page = KeysetPaginator(summaries, ('date', 'id'), DIARY_CALENDAR_PAGE_SIZE).page(request.GET.get('cursor'))
+    return JsonResponse({
+        'entries': [{
+            'id': entry.id,
+            'title': entry.title or 'Diary Entry',
+            'date': entry.date.strftime('%Y-%m-%d'),
+            'excerpt': entry.excerpt,
+        } for entry in page],
+        'next': page.next_cursor,
+    })
+
+@login_required
+@user_data_conditional
+def diary_entry_json(request, entry_id):
+    """Return one diary entry in full."""
+    entry = get_object_or_404(DiaryEntry, id=entry_id, user=request.user)
+    data = _diary_entry_data(entry)
+    data.update({
+        'mood': entry.custom_mood or entry.mood,
+        'short_term': entry.short_term,
+        'medium_term': entry.medium_term,
+        'long_term': entry.long_term,
+    })
+    return JsonResponse(data)
+
+@login_required
+def diary_export(request):
+    """Stream every diary entry as NDJSON (one JSON object per line) in constant memory."""
+    entries = DiaryEntry.objects.filter(user=request.user).order_by('date', 'id').values(*DIARY_EXPORT_FIELDS)
+
+    def lines():
+        for entry in entries.iterator(chunk_size=500):
+            yield json.dumps(entry, cls=DjangoJSONEncoder) + '\n'
+
+    response = StreamingHttpResponse(lines(), content_type='application/x-ndjson')
+    response['Content-Disposition'] = 'attachment; filename="diary.ndjson"'
+    return response
 
 # Self-care
 @login_required
@@ -752,10 +894,14 @@ def selfcare(request):
 
     return render(request, "tracker/pages/selfcare.html", {"form": form})
 
+SELFCARE_PAGE_SIZE = 14
+
 @login_required
 def selfcare_tracker(request):
-    """List self-care entries."""
-    entries = SelfCareEntry.objects.filter(user=request.user).order_by('-date')
+    """List self-care entries, newest first, a page at a time."""
+    entries = KeysetPaginator(
+        SelfCareEntry.objects.filter(user=request.user), ('-date', '-id'), SELFCARE_PAGE_SIZE
+    ).page(request.GET.get('page'))
     return render(request, "tracker/pages/selfcare_tracker.html", {"entries": entries})
 
 @login_required
@@ -803,23 +949,25 @@ def wellness_update(request):
     daily_affirmation = "You are strong, capable, and beautifully in tune with your body."
     latest_diary = DiaryEntry.objects.filter(user=user).order_by('-date').first()
     latest_selfcare = SelfCareEntry.objects.filter(user=user).order_by('-date').first()
-    cycles = Cycle.objects.filter(user=user).order_by('-start_date')
+    stats = get_cycle_stats(user)
 
-    avg_cycle_length = None
-    most_common_flow = None
+    avg_cycle_length = most_common_flow = recent_cycle_length = recent_cycle_std = None
     irregular_count = 0
     cycle_trend = "Stable"
-
-    if len(cycles) >= 2:
-        # Calculate cycle lengths from start dates differences
-        lengths = [(cycles[i].start_date - cycles[i+1].start_date).days for i in range(len(cycles)-1)]
-        avg_cycle_length = sum(lengths) // len(lengths) if lengths else None
-        irregular_count = sum(1 for l in lengths if abs(l - avg_cycle_length) > 3) if avg_cycle_length else 0
-        cycle_trend = "Irregular" if irregular_count > 1 else "Stable"
-        flow_types = [c.flow_type for c in cycles if c.flow_type]
-        most_common_flow = Counter(flow_types).most_common(1)[0][0] if flow_types else "Unknown"
-    else:
-        avg_cycle_length = most_common_flow = None
+    latest_irregular = False
+
+    if stats.cycle_count >= 2:
+        avg_cycle_length = stats.avg_cycle_length
+        irregular_count = stats.irregular_count
+        cycle_trend = stats.trend
+        most_common_flow = stats.most_common_flow
+        _, starts, ends = load_cycle_arrays(user.pk)
+        series = cycle_series(starts, ends)
+        latest_irregular = bool(series['irregular'][-1])
+        # Rolling figures over the last ROLLING_WINDOW cycle lengths, once there are that many
+        if len(series['rolling_mean']):
+            recent_cycle_length = round(float(series['rolling_mean'][-1]), 1)
+            recent_cycle_std = round(float(series['rolling_std'][-1]), 1)
 
     context = {
         'profile': profile,
@@ -830,6 +978,10 @@ def wellness_update(request):
         'most_common_flow': most_common_flow,
         'irregular_count': irregular_count,
         'cycle_trend': cycle_trend,
+        'recent_cycle_length': recent_cycle_length,
+        'recent_cycle_std': recent_cycle_std,
+        'rolling_window': ROLLING_WINDOW,
+        'latest_irregular': latest_irregular,
     }
 
     return render(request, 'tracker/main/wellness_update.html', context)
@@ -867,10 +1019,21 @@ def get_diary_prompts():
     ]
 
 # Community Page
+# What a comment feed renders; the author's name is stored on the comment, so no user join
+COMMENT_FEED_FIELDS = ('id', 'user', 'prompt', 'author_name', 'content', 'is_anonymous', 'created_at')
+
+# Prompt feed orderings, each served by a partial index on public prompts
+PROMPT_FEEDS = {
+    'active': ('-last_activity_at',),
+    'trending': ('-comment_count', '-last_activity_at'),
+    'new': ('-created_at',),
+}
+PROMPT_FEED_SIZE = 30
+
 @login_required
 def community(request):
     form = CommunityCommentForm()
-    prompts = CommunityPrompt.objects.filter(is_public=True).order_by('-created_at')
+    prompt_feed = request.GET.get('prompts') if request.GET.get('prompts') in PROMPT_FEEDS else 'active'
     static_prompts = get_diary_prompts()
 
     # Handle general comment submission
@@ -889,28 +1052,26 @@ def community(request):
             messages.success(request, "Comment posted.")
             return redirect('community')
 
-    # Paginate general comments
-    all_comments = CommunityComment.objects.filter(prompt__isnull=True).order_by('-created_at')
-    paginator = Paginator(all_comments, 3)
-    page_number = request.GET.get('page')
-    comments_page = paginator.get_page(page_number)
-
-    for comment in comments_page:
-        comment.can_edit_flag = (
-            request.user.is_staff or
-            (comment.user == request.user and not comment.is_anonymous)
-        )
+    # Prompt list and general comments come from the shared fragment cache
+    prompts = CommunityPrompt.objects.filter(is_public=True).order_by(*PROMPT_FEEDS[prompt_feed])[:PROMPT_FEED_SIZE]
+    prompts_html = fragments.cached_fragment('prompts', (prompt_feed,), lambda: render_to_string(
+        'tracker/partials/prompt_buttons.html', {'prompts': prompts}))
+    all_comments = CommunityComment.objects.filter(prompt__isnull=True).only(*COMMENT_FEED_FIELDS)
+    comments = fragments.comments_fragment('comments', all_comments, 3, request.GET.get('page'), fragments.COMMUNITY_CARDS)
 
     return render(request, 'tracker/main/community.html', {
         'form': form,
-        'prompts': prompts,
+        'prompts_html': prompts_html,
+        'prompt_feed': prompt_feed,
         'static_prompts': static_prompts,
-        'comments': comments_page,
+        'comments': comments.page,
+        'comments_html': fragments.with_edit_buttons(comments, request.user),
     })
 
 # Prompt Detail Page
 @login_required
 def prompt_detail(request, prompt_id):
+    # One query for the prompt and its fragment version
     prompt = get_object_or_404(CommunityPrompt, id=prompt_id, is_public=True)
 
     if request.method == 'POST':
@@ -930,21 +1091,14 @@ def prompt_detail(request, prompt_id):
     else:
         form = CommunityCommentForm()
 
-    all_comments = prompt.comments.order_by('-created_at')
-    paginator = Paginator(all_comments, 10)
-    page_number = request.GET.get('page')
-    comments = paginator.get_page(page_number)
-
-    for comment in comments:
-        comment.can_edit_flag = (
-            request.user.is_staff or
-            (comment.user == request.user and not comment.is_anonymous)
-        )
+    comments = fragments.comments_fragment(f'prompt:{prompt.id}', prompt.comments.only(*COMMENT_FEED_FIELDS), 10,
+                                           request.GET.get('page'), fragments.PROMPT_CARDS, prompt.fragment_version)
 
     return render(request, 'tracker/actions/prompt_detail.html', {
         'prompt': prompt,
         'form': form,
-        'comments': comments,
+        'comments': comments.page,
+        'comments_html': fragments.with_edit_buttons(comments, request.user),
     })
 
 
@@ -992,12 +1146,11 @@ def delete_comment(request, comment_id):
 @login_required
 def add_community_prompt(request):
     form = CommunityPromptForm()
-    all_prompts = CommunityPrompt.objects.filter(is_public=True).order_by('-created_at')
     diary_prompts = get_diary_prompts()
 
     if request.method == 'POST':
         selected_id = request.POST.get('selected_prompt')
-        if selected_id:
+        if selected_id and selected_id.isdigit():
             return redirect('prompt_detail', prompt_id=selected_id)
 
         form = CommunityPromptForm(request.POST)
@@ -1011,10 +1164,49 @@ def add_community_prompt(request):
 
     return render(request, 'tracker/actions/add_community_prompt.html', {
         'form': form,
-        'all_prompts': all_prompts,
         'diary_prompts': diary_prompts,
     })
 
+# Live comment streams: under ASGI these URLs are served by tracker.streams before reaching Django
+def comment_stream(request, prompt_id=None):
+    """ Answer stream requests that arrive over WSGI; 204 tells EventSource not to reconnect."""
+    return HttpResponse(status=204)
+
+# Prompt Directory
+# Public prompts A-Z, optionally only titles starting with ?q=; both served by prompt_public_title_idx
+PROMPT_DIRECTORY_PAGE_SIZE = 25
+PROMPT_PICKER_SIZE = 8
+
+def _prompt_directory_page(query, cursor, per_page):
+    """Return a keyset page of (id, title, comment_count, title_key) rows, cached until a prompt changes."""
+    prefix = make_title_key(query)
+    prompts = CommunityPrompt.objects.filter(is_public=True)
+    if prefix:
+        # A range on the title index; LIKE 'x%' cannot use it on SQLite
+        prompts = prompts.filter(title_key__gte=prefix, title_key__lt=prefix + '\uffff')
+    rows = prompts.values_list('id', 'title', 'comment_count', 'title_key', named=True)
+    paginator = KeysetPaginator(rows, ('title_key', 'id'), per_page)
+    # Invalid cursors all show the first page, so they share its key
+    cursor = paginator.clean_cursor(cursor)
+    return fragments.cached_fragment('prompts', ('directory', prefix, str(per_page), cursor or ''),
+                                     lambda: paginator.page(cursor))
+
+@login_required
+def prompt_directory(request):
+    query = request.GET.get('q', '')
+    return render(request, 'tracker/main/prompt_directory.html', {
+        'prompts': _prompt_directory_page(query, request.GET.get('page'), PROMPT_DIRECTORY_PAGE_SIZE),
+        'query': query,
+    })
+
+@login_required
+def prompt_directory_json(request):
+    """ Public prompts whose titles start with ?q=, A-Z, for the prompt picker.
+    Accepts ?cursor= from the previous response's "next".
+    JSON: { prompts: [[id, title], ...], next: cursor|null }"""
+    page = _prompt_directory_page(request.GET.get('q', ''), request.GET.get('cursor'), PROMPT_PICKER_SIZE)
+    return JsonResponse({'prompts': [[prompt.id, prompt.title] for prompt in page], 'next': page.next_cursor})
+
 # Goodbye Page
 def goodbye(request):
     affirmations = [
@@ -2,6 +2,9 @@
 ASGI config for tracker_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The live comment streams are served from here, ahead of Django's handler
+(see tracker.streams), so run the site under an ASGI server such as
+``uvicorn tracker_project.asgi:application`` for them to work.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +16,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tracker_project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up: the streams use the ORM and the URLconf
+from tracker.streams import route_streams  # noqa: E402
+
+application = route_streams(django_application)